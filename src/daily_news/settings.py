@@ -113,6 +113,113 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
 
+# LLM provider calls. Clients are reused per worker process; transient errors
+# (429/5xx/timeouts) are retried with exponential backoff. If a fallback
+# provider is configured it is used when the primary fails, or raced against
+# it after LLM_HEDGE_AFTER seconds when that is set. The 'fake' provider
+# answers locally after LLM_FAKE_LATENCY seconds, for development and load tests.
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 60))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', 1))
+LLM_FALLBACK_PROVIDER = os.getenv('LLM_FALLBACK_PROVIDER', '')
+LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', 0))
+LLM_FAKE_LATENCY = float(os.getenv('LLM_FAKE_LATENCY', 0.5))
+# Per-provider requests and tokens per minute, enforced per worker process.
+LLM_RATE_LIMITS = {
+    'openai': {'rpm': 500, 'tpm': 200000},
+    'anthropic': {'rpm': 50, 'tpm': 50000},
+    'google': {'rpm': 15, 'tpm': 1000000},
+}
+
+# Prompt budgeting for LLM summarization, in (locally estimated) tokens.
+# Articles are truncated to the per-article budget; if they still don't fit
+# in one prompt they are summarized individually, LLM_MAP_WORKERS at a time.
+LLM_MAX_PROMPT_TOKENS = int(os.getenv('LLM_MAX_PROMPT_TOKENS', 12000))
+LLM_ARTICLE_TOKEN_BUDGET = int(os.getenv('LLM_ARTICLE_TOKEN_BUDGET', 2000))
+LLM_MAP_WORKERS = int(os.getenv('LLM_MAP_WORKERS', 4))
+
+# Most tokens of article text summarized for one digest. Candidates are
+# ranked locally (relevance, recency, source variety) and the best ones that
+# fit are summarized.
+DIGEST_ARTICLE_TOKEN_BUDGET = int(os.getenv('DIGEST_ARTICLE_TOKEN_BUDGET', 20000))
+
+# Per-article summaries are kept in the cache for ARTICLE_SUMMARY_CACHE_TTL
+# seconds and in the database for ARTICLE_SUMMARY_RETENTION_DAYS.
+ARTICLE_SUMMARY_CACHE_TTL = int(os.getenv('ARTICLE_SUMMARY_CACHE_TTL', 24 * 60 * 60))
+ARTICLE_SUMMARY_RETENTION_DAYS = int(os.getenv('ARTICLE_SUMMARY_RETENTION_DAYS', 30))
+
+# Scraped article text is stored compressed with ARTICLE_CONTENT_COMPRESSION:
+# 'zlib', or 'zstd' (needs the zstandard package). Articles fetched more than
+# ARTICLE_RETENTION_DAYS ago lose their text, and are deleted unless a digest
+# lists them.
+ARTICLE_CONTENT_COMPRESSION = os.getenv('ARTICLE_CONTENT_COMPRESSION', 'zlib')
+ARTICLE_RETENTION_DAYS = int(os.getenv('ARTICLE_RETENTION_DAYS', 30))
+
+# Article text extraction engine: 'lxml' (fast) or 'bs4' (BeautifulSoup).
+ARTICLE_EXTRACTOR = os.getenv('ARTICLE_EXTRACTOR', 'lxml')
+
+# Scraped article content is cached so each URL is fetched once per day;
+# failures are cached for a shorter time before being retried.
+SCRAPE_CACHE_TTL = int(os.getenv('SCRAPE_CACHE_TTL', 24 * 60 * 60))
+SCRAPE_CACHE_FAILURE_TTL = int(os.getenv('SCRAPE_CACHE_FAILURE_TTL', 60 * 60))
+
+# Scraper politeness. Each worker fetches at most SCRAPE_MAX_PER_HOST pages
+# from one host at a time, and all workers together send a host at most one
+# request per SCRAPE_HOST_INTERVAL seconds (or its robots.txt crawl delay,
+# capped at SCRAPE_MAX_CRAWL_DELAY). The pacing state lives in the cache, so
+# it is only shared across workers when CACHE_URL is set. robots.txt files
+# are cached for ROBOTS_CACHE_TTL seconds.
+SCRAPE_MAX_PER_HOST = int(os.getenv('SCRAPE_MAX_PER_HOST', 4))
+SCRAPE_HOST_INTERVAL = float(os.getenv('SCRAPE_HOST_INTERVAL', 0.25))
+SCRAPE_MAX_CRAWL_DELAY = float(os.getenv('SCRAPE_MAX_CRAWL_DELAY', 10))
+SCRAPE_RESPECT_ROBOTS = os.getenv('SCRAPE_RESPECT_ROBOTS', 'True').lower() == 'true'
+ROBOTS_CACHE_TTL = int(os.getenv('ROBOTS_CACHE_TTL', 24 * 60 * 60))
+
+# Digest runs are created this many minutes before the user's 8am window
+# opens, and searched and scraped right away, so that only summarizing and
+# emailing are left when it opens. 0 disables pre-warming.
+DIGEST_PREWARM_MINUTES = int(os.getenv('DIGEST_PREWARM_MINUTES', 60))
+
+# News search providers, queried concurrently for each term, in priority
+# order: 'newsapi' (needs NEWSAPI_KEY), 'rss' (articles from polled feeds
+# that matched the term) and 'fixture' (canned articles from
+# NEWS_FIXTURE_FILE linking to NEWS_FIXTURE_BASE_URL, for development and
+# benchmarks). A provider that has not answered within its timeout (seconds)
+# is skipped for that search.
+NEWS_PROVIDERS = [name for name in os.getenv('NEWS_PROVIDERS', 'newsapi,rss').split(',') if name]
+NEWS_PROVIDER_TIMEOUTS = {
+    'newsapi': 10,
+    'rss': 10,
+    'fixture': 2,
+}
+NEWS_FIXTURE_FILE = os.getenv('NEWS_FIXTURE_FILE', str(BASE_DIR / 'src' / 'news' / 'fixtures' / 'search' / 'articles.json'))
+NEWS_FIXTURE_BASE_URL = os.getenv('NEWS_FIXTURE_BASE_URL', 'https://example.com/news')
+
+# RSS/Atom feeds (comma-separated) registered for polling every
+# FEED_POLL_MINUTES minutes; more can be added as Feed rows.
+NEWS_RSS_FEEDS = [url for url in os.getenv('NEWS_RSS_FEEDS', '').split(',') if url]
+FEED_POLL_MINUTES = int(os.getenv('FEED_POLL_MINUTES', 15))
+
+# Search results for a normalized term are shared by all users and reused
+# for this many seconds.
+SEARCH_RESULT_TTL = int(os.getenv('SEARCH_RESULT_TTL', 60 * 60))
+# Stale results are refreshed incrementally from the newest stored article,
+# less an overlap in minutes for articles indexed late, fetching at most
+# SEARCH_MAX_PAGES pages.
+SEARCH_WATERMARK_OVERLAP = int(os.getenv('SEARCH_WATERMARK_OVERLAP', 15))
+SEARCH_MAX_PAGES = int(os.getenv('SEARCH_MAX_PAGES', 5))
+
+# Digest emails are sent in batches over one backend connection. A digest
+# that fails is retried by later delivery runs, up to EMAIL_MAX_ATTEMPTS times.
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 500))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+
+# Per-stage timings and counters, kept in the cache and exported at /metrics/
+# in the Prometheus text format. When disabled, instrumentation is a no-op and
+# the endpoint returns 404. The endpoint needs no login so Prometheus can
+# scrape it; restrict access to it at the reverse proxy.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -125,6 +232,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Use Redis when CACHE_URL is set so the cache is shared across Celery workers.
+
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -162,6 +289,22 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Each stage of the digest pipeline has its own queue, so each can be given
+# a worker pool and concurrency suited to it (see the README): many threads
+# for I/O-bound search and scraping, a few processes for rate-limited LLM
+# calls, one for email. Scheduling and maintenance tasks use the default
+# 'celery' queue. Workers reserve one task at a time, so a long LLM task
+# does not hold back tasks another worker could run.
+CELERY_TASK_ROUTES = {
+    'news.tasks.refresh_search_results': {'queue': 'search'},
+    'news.tasks.search_digest_run': {'queue': 'search'},
+    'news.tasks.scrape_digest_run': {'queue': 'scrape'},
+    'news.tasks.poll_single_feed': {'queue': 'scrape'},
+    'news.tasks.summarize_digest_run': {'queue': 'llm'},
+    'news.tasks.send_digest_emails': {'queue': 'email'},
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 # Celery Beat schedule
 from celery.schedules import crontab
 CELERY_BEAT_SCHEDULE = {
@@ -169,6 +312,22 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'news.tasks.generate_daily_digest',
         'schedule': crontab(minute='*/30'),  # Every 30 minutes
     },
+    'poll-feeds': {
+        'task': 'news.tasks.poll_feeds',
+        'schedule': crontab(minute=f'*/{FEED_POLL_MINUTES}'),
+    },
+    'send-digest-emails': {
+        'task': 'news.tasks.send_digest_emails',
+        'schedule': crontab(minute='*/10'),  # Retries failed deliveries
+    },
+    'prune-article-summaries': {
+        'task': 'news.tasks.prune_article_summaries',
+        'schedule': crontab(minute=15, hour=3),  # Daily at 03:15 UTC
+    },
+    'prune-articles': {
+        'task': 'news.tasks.prune_articles',
+        'schedule': crontab(minute=45, hour=3),  # Daily at 03:45 UTC
+    },
 }
 
 
@@ -0,0 +1,132 @@
+"""Model fields for the news app."""
+
+import zlib
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed when ARTICLE_CONTENT_COMPRESSION is 'zstd'
+    zstandard = None
+
+# Each compressed value starts with a byte naming its codec, so values
+# written under different settings can be read side by side.
+ZLIB_TAG = b'z'
+ZSTD_TAG = b's'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+def compress_text(text: str) -> bytes:
+    """
+    Compress a text with the codec set in `settings.ARTICLE_CONTENT_COMPRESSION`.
+
+    Args:
+        text: The text to compress.
+
+    Returns:
+        The codec tag followed by the compressed UTF-8 text, or b'' for an
+        empty text.
+    """
+    if not text:
+        return b''
+    data = text.encode('utf-8')
+    if settings.ARTICLE_CONTENT_COMPRESSION == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("ARTICLE_CONTENT_COMPRESSION is 'zstd' but the zstandard package is not installed")
+        return ZSTD_TAG + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return ZLIB_TAG + zlib.compress(data, ZLIB_LEVEL)
+
+def decompress_text(data) -> str:
+    """
+    Decompress a value written by `compress_text`.
+
+    Text stored before compression was enabled is returned as is.
+
+    Args:
+        data: The stored value, as bytes, memoryview or str.
+
+    Returns:
+        The original text.
+    """
+    if data is None or isinstance(data, str):
+        return data
+    data = bytes(data)
+    if not data:
+        return ''
+    tag, payload = data[:1], data[1:]
+    if tag == ZSTD_TAG:
+        if zstandard is None:
+            raise RuntimeError('A zstd-compressed value was read but the zstandard package is not installed')
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    if tag == ZLIB_TAG:
+        return zlib.decompress(payload).decode('utf-8')
+    raise ValueError(f'Unknown compression tag {tag!r}')
+
+class CompressedTextAttribute(DeferredAttribute):
+    """
+    Attribute holding the stored bytes until first read, then the text.
+
+    Instances loaded from the database keep the compressed value and only
+    decompress it when the attribute is read, so rows whose text is never
+    used cost no decompression, and saving them writes the bytes back
+    unchanged.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, (bytes, memoryview)):
+            value = decompress_text(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+class CompressedTextField(models.TextField):
+    """
+    Text field stored compressed (see `compress_text`), decompressed lazily on access.
+
+    On PostgreSQL the column stays text: the database already compresses
+    large values (TOAST), and its generated full-text column needs the
+    plain text. Elsewhere the column is binary, so lookups other than exact
+    matches against '' do not work on it.
+    """
+
+    descriptor_class = CompressedTextAttribute
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return super().db_type(connection)
+        return models.BinaryField().db_type(connection)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, memoryview):
+            return bytes(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress_text(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Read the raw value, so an unread loaded value is not decompressed
+        # just to be compressed again.
+        return model_instance.__dict__.get(self.attname)
+
+    def get_prep_value(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value)
+        return super().get_prep_value(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if connection.vendor == 'postgresql':
+            return decompress_text(value)
+        if isinstance(value, str):
+            value = compress_text(value)
+        return value
@@ -0,0 +1,86 @@
+"""Management command to compare query counts of per-URL and batched article ingestion."""
+
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from news.models import Article, NewsDigest, SearchTerm
+from news.services.ingestion import existing_articles, link_articles, upsert_articles
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark transaction."""
+
+def _legacy_ingest(candidates, contents, digest):
+    """The previous per-URL get_or_create ingestion path."""
+    articles = []
+    for canonical_url, data in candidates.items():
+        url = data['url']
+        article, created = Article.objects.with_content().get_or_create(
+            url=url,
+            defaults={
+                'title': data['title'],
+                'published_at': data.get('publishedAt'),
+                'source': data['source'],
+                'content': contents.get(canonical_url) or '',
+            }
+        )
+        if not created and not article.content and contents.get(canonical_url):
+            article.content = contents[canonical_url]
+            article.save()
+        articles.append(article)
+    digest.articles.set(articles)
+
+def _batched_ingest(candidates, contents, digest):
+    """The batched ingestion path used by the digest task."""
+    existing = existing_articles(candidates)
+    link_articles(digest, upsert_articles(candidates, contents, existing))
+
+class Command(BaseCommand):
+    """Measure database round trips for article ingestion."""
+
+    help = 'Compare query counts of per-URL get_or_create and batched bulk upsert ingestion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=50, help='Search hits per run')
+        parser.add_argument('--existing', type=float, default=0.5,
+                            help='Fraction of hits already stored, half of them without content')
+
+    def handle(self, *args, **options):
+        count = options['articles']
+        stored = int(count * options['existing'])
+        candidates = {
+            f'https://bench.example.com/article/{i}': {
+                'url': f'https://bench.example.com/article/{i}',
+                'title': f'Benchmark article {i}',
+                'publishedAt': '2026-01-01T08:00:00Z',
+                'source': 'Bench',
+            }
+            for i in range(count)
+        }
+        contents = {url: f'Content of {url}' for url in candidates}
+
+        self.stdout.write(f'{count} search hits, {stored} already stored')
+        for name, ingest in (('get_or_create', _legacy_ingest), ('bulk upsert', _batched_ingest)):
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(username='ingestion-benchmark', email='bench@example.com')
+                    term = SearchTerm.objects.create(user=user, term='benchmark')
+                    digest = NewsDigest.objects.create(user=user, search_term=term, summary='')
+                    Article.objects.bulk_create([
+                        Article(url=url, canonical_url=url, title=data['title'],
+                                content='' if i % 2 else contents[url])
+                        for i, (url, data) in enumerate(list(candidates.items())[:stored])
+                    ])
+
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        ingest(candidates, contents, digest)
+                        elapsed = time.perf_counter() - start
+                    linked = digest.articles.count()
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f'{name:<14} {len(queries):>5} queries {elapsed * 1000:>8.1f}ms ({linked} articles linked)'
+            )
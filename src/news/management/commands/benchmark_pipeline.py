@@ -0,0 +1,280 @@
+"""Management command to benchmark the full digest pipeline offline, against local stand-ins."""
+
+import json
+import math
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List
+from unittest import mock
+from urllib.parse import parse_qs, quote, urlsplit
+import requests
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from newsapi import NewsApiClient
+from requests.adapters import HTTPAdapter
+from news.models import DigestRun, NewsDigest, SearchTerm, normalize_term
+from news.services import llm_providers, news_providers
+from news.services.email_delivery import deliver_digests
+from news.tasks import digest_pipeline
+
+FIXTURE_PAGES_DIR = Path(__file__).resolve().parents[2] / 'fixtures' / 'html'
+NEWSAPI_URL = 'https://newsapi.org'
+
+TERM_POOL = [
+    'ai data centers', 'power grid', 'solid-state battery', 'electric vehicles', 'open source',
+    'async orm', 'interest rates', 'central bank', 'semiconductors', 'climate policy',
+    'space launch', 'cybersecurity', 'quantum computing', 'housing market', 'renewable energy',
+    'supply chain', 'labor market', 'biotech', 'streaming services', 'public transit',
+]
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark transaction."""
+
+def _start_fixture_server(articles_per_term: int, page_latency: float, search_latency: float) -> ThreadingHTTPServer:
+    """
+    Start a local HTTP server standing in for NewsAPI and news sites.
+
+    `/v2/everything` answers like NewsAPI with `articles_per_term` results
+    per query, linking to `/articles/<query>/<n>.html`, which serves the
+    recorded pages in `news/fixtures/html/` in turn.
+
+    Args:
+        articles_per_term: Search results per query.
+        page_latency: Delay in seconds before serving an article page.
+        search_latency: Delay in seconds before answering a search.
+
+    Returns:
+        The running server; call `shutdown()` when done.
+    """
+    pages = [path.read_bytes() for path in sorted(FIXTURE_PAGES_DIR.glob('*.html'))]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/v2/everything':
+                time.sleep(search_latency)
+                self._send(200, 'application/json', self._search(parse_qs(url.query)))
+            elif url.path.startswith('/articles/'):
+                time.sleep(page_latency)
+                number = int(Path(url.path).stem or 0)
+                self._send(200, 'text/html; charset=utf-8', pages[number % len(pages)])
+            else:
+                self._send(404, 'text/plain', b'Not found')
+
+        def _search(self, params: Dict[str, List[str]]) -> bytes:
+            query = params.get('q', [''])[0]
+            page = int(params.get('page', ['1'])[0])
+            page_size = int(params.get('pageSize', ['100'])[0])
+            base = f'http://{self.headers["Host"]}/articles/{quote(query)}'
+            now = timezone.now()
+            articles = [
+                {
+                    'title': f'{query.title()} report {n}',
+                    'url': f'{base}/{n}.html',
+                    'publishedAt': (now - timedelta(minutes=5 * n)).astimezone(dt_timezone.utc)
+                    .strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'source': {'name': 'Benchmark News'},
+                }
+                for n in range(articles_per_term)
+            ]
+            body = {
+                'status': 'ok',
+                'totalResults': len(articles),
+                'articles': articles[(page - 1) * page_size:page * page_size],
+            }
+            return json.dumps(body).encode()
+
+        def _send(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class _LocalNewsAPIAdapter(HTTPAdapter):
+    """Transport adapter sending NewsAPI requests to the local fixture server."""
+
+    def __init__(self, base_url: str) -> None:
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        request.url = self.base_url + request.url[len(NEWSAPI_URL):]
+        return super().send(request, **kwargs)
+
+@contextmanager
+def stand_ins(base_url: str, llm_latency: float) -> Iterator[None]:
+    """
+    Route the pipeline's external services to local stand-ins.
+
+    Within the block, news search uses the real NewsAPI provider against
+    the fixture server, summaries come from the fake LLM provider with the
+    given latency, emails go to the locmem backend and caching uses a
+    private in-process cache. Per-host pacing is off, since every stand-in
+    page is served by the same host.
+
+    Args:
+        base_url: URL of the server started by `_start_fixture_server`.
+        llm_latency: Fake LLM latency in seconds per request.
+    """
+    session = requests.Session()
+    session.mount(NEWSAPI_URL, _LocalNewsAPIAdapter(base_url))
+    newsapi = news_providers.NewsAPIProvider()
+    newsapi.client = NewsApiClient(api_key='benchmark', session=session)
+    fake_llm = llm_providers.FakeProvider()
+    fake_llm.latency = llm_latency
+
+    saved_news, saved_llm = dict(news_providers._instances), dict(llm_providers._instances)
+    news_providers._instances['newsapi'] = newsapi
+    llm_providers._instances['fake'] = fake_llm
+    try:
+        with override_settings(
+            NEWS_PROVIDERS=['newsapi'],
+            LLM_FALLBACK_PROVIDER='',
+            SCRAPE_HOST_INTERVAL=0,
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'pipeline-benchmark'}},
+        ), mock.patch.dict(os.environ, {'DEFAULT_LLM_PROVIDER': 'fake'}):
+            yield
+    finally:
+        news_providers._instances.clear()
+        news_providers._instances.update(saved_news)
+        llm_providers._instances.clear()
+        llm_providers._instances.update(saved_llm)
+        session.close()
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+def run_pipeline_benchmark(users: int, terms: int, distinct_terms: int = 10, articles: int = 5,
+                           page_latency: float = 0.05, search_latency: float = 0.1,
+                           llm_latency: float = 0.2) -> Dict[str, float]:
+    """
+    Seed users and search terms, generate and email every digest, and roll back.
+
+    Each user's digest run is taken through the stage tasks in turn, as a
+    single worker would, so later users find articles stored by earlier
+    ones in the local index and summary cache just as in production.
+
+    Args:
+        users: Number of users to seed.
+        terms: Search terms per user, drawn in turn from `distinct_terms`
+            shared terms.
+        distinct_terms: Size of the pool of terms users choose from.
+        articles: Search results per term.
+        page_latency: Article page latency in seconds.
+        search_latency: Search endpoint latency in seconds.
+        llm_latency: LLM latency in seconds per request.
+
+    Returns:
+        Digests created, delivered and failed to send, total seconds,
+        digests created per minute, p50/p99 per-user latency in seconds,
+        database queries in total and per digest, and the process's peak
+        resident memory in MiB.
+    """
+    pool = [TERM_POOL[i % len(TERM_POOL)] + (f' {i // len(TERM_POOL)}' if i >= len(TERM_POOL) else '')
+            for i in range(distinct_terms)]
+    server = _start_fixture_server(articles, page_latency, search_latency)
+    latencies = []
+    try:
+        with stand_ins(f'http://127.0.0.1:{server.server_address[1]}', llm_latency), transaction.atomic():
+            seeded = User.objects.bulk_create([
+                User(username=f'pipeline-benchmark-{i}', email=f'bench{i}@example.com') for i in range(users)
+            ])
+            SearchTerm.objects.bulk_create([
+                SearchTerm(user=user, term=term, normalized_term=normalize_term(term))
+                for i, user in enumerate(seeded)
+                for term in (pool[(i + j) % len(pool)] for j in range(min(terms, len(pool))))
+            ])
+            runs = DigestRun.objects.bulk_create([
+                DigestRun(user=user, local_date=timezone.localdate()) for user in seeded
+            ])
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for run in runs:
+                    user_started = time.perf_counter()
+                    digest_pipeline(run.pk).apply()
+                    latencies.append(time.perf_counter() - user_started)
+                delivered = deliver_digests()
+                elapsed = time.perf_counter() - started
+            created = NewsDigest.objects.filter(user__in=seeded).count()
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        server.shutdown()
+
+    return {
+        'created': created,
+        'delivered': delivered['sent'],
+        'failed': delivered['failed'],
+        'seconds': elapsed,
+        'digests_per_minute': created / elapsed * 60 if elapsed else 0.0,
+        'p50': _percentile(latencies, 50),
+        'p99': _percentile(latencies, 99),
+        'queries': len(queries),
+        'queries_per_digest': len(queries) / created if created else 0.0,
+        # ru_maxrss is in KiB on Linux.
+        'peak_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+class Command(BaseCommand):
+    """Benchmark digest generation end to end without network access."""
+
+    help = 'Measure digest throughput, per-user latency, memory and queries against local stand-ins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Number of users to seed')
+        parser.add_argument('--terms', type=int, default=3, help='Search terms per user')
+        parser.add_argument('--distinct-terms', type=int, default=10, help='Shared pool of search terms')
+        parser.add_argument('--articles', type=int, default=5, help='Search results per term')
+        parser.add_argument('--page-latency', type=float, default=0.05, help='Article page latency in seconds')
+        parser.add_argument('--search-latency', type=float, default=0.1, help='Search latency in seconds')
+        parser.add_argument('--llm-latency', type=float, default=0.2, help='Fake LLM latency in seconds')
+
+    def handle(self, *args, **options):
+        result = run_pipeline_benchmark(
+            users=options['users'],
+            terms=options['terms'],
+            distinct_terms=options['distinct_terms'],
+            articles=options['articles'],
+            page_latency=options['page_latency'],
+            search_latency=options['search_latency'],
+            llm_latency=options['llm_latency'],
+        )
+        self.stdout.write(
+            f'{options["users"]} users x {options["terms"]} terms ({options["distinct_terms"]} distinct), '
+            f'latency: pages {options["page_latency"] * 1000:.0f}ms, search {options["search_latency"] * 1000:.0f}ms, '
+            f'LLM {options["llm_latency"] * 1000:.0f}ms'
+        )
+        self.stdout.write(
+            f'digests:    {result["created"]} created, {result["delivered"]} delivered, {result["failed"]} failed '
+            f'in {result["seconds"]:.2f}s '
+            f'({result["digests_per_minute"]:.1f}/min)'
+        )
+        self.stdout.write(f'per user:   p50 {result["p50"] * 1000:.0f}ms, p99 {result["p99"] * 1000:.0f}ms')
+        self.stdout.write(f'queries:    {result["queries"]} ({result["queries_per_digest"]:.1f} per digest)')
+        self.stdout.write(f'peak RSS:   {result["peak_memory_mb"]:.1f} MiB')
@@ -0,0 +1,132 @@
+"""Management command to benchmark the hot query patterns with and without their indexes."""
+
+import pytz
+import statistics
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from news.models import Article, NewsDigest, SearchTerm, UserProfile
+from news.tasks import DIGEST_HOUR, _due_users
+
+# Timezones assigned to the synthetic users, round robin.
+TIMEZONES = ['UTC', 'Europe/London', 'Europe/Berlin', 'America/New_York', 'America/Chicago',
+             'America/Los_Angeles', 'Asia/Tokyo', 'Asia/Kolkata', 'Australia/Sydney']
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark transaction."""
+
+class Command(BaseCommand):
+    """Seed a synthetic dataset and report EXPLAIN plans and latency of the hot queries."""
+
+    help = 'Report query plans and latency of the hot query patterns with and without their indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Synthetic users to create')
+        parser.add_argument('--digests', type=int, default=30, help='Digests per user')
+        parser.add_argument('--articles', type=int, default=50000, help='Synthetic articles to create')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per query')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._seed(options['users'], options['digests'], options['articles'])
+                queries = self._queries(user)
+                self._report('with indexes', queries, options['runs'])
+                self._drop_indexes()
+                self._report('without indexes', queries, options['runs'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, users: int, digests: int, articles: int) -> User:
+        """Create the synthetic dataset and return one of its users."""
+        start = time.perf_counter()
+        now = timezone.now()
+        created = User.objects.bulk_create(
+            [User(username=f'query-benchmark-{i}', email=f'bench{i}@example.com') for i in range(users)],
+            batch_size=1000,
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, timezone=TIMEZONES[i % len(TIMEZONES)]) for i, user in enumerate(created)],
+            batch_size=1000,
+        )
+        terms = SearchTerm.objects.bulk_create(
+            [SearchTerm(user=user, term='benchmark', normalized_term='benchmark') for user in created],
+            batch_size=1000,
+        )
+        # Digests are interleaved across users, as the daily schedule creates them;
+        # all but the newest day have been sent.
+        NewsDigest.objects.bulk_create(
+            [
+                NewsDigest(user=term.user, search_term=term, summary='Benchmark digest', excerpt='Benchmark digest',
+                           created_at=now - timedelta(days=day),
+                           sent_at=None if day == 0 else now - timedelta(days=day))
+                for day in range(digests - 1, -1, -1)
+                for term in terms
+            ],
+            batch_size=1000,
+        )
+        Article.objects.bulk_create(
+            [
+                Article(url=f'https://bench.example.com/article/{i}',
+                        canonical_url=f'https://bench.example.com/article/{i}',
+                        title=f'Benchmark article {i}', source='Bench',
+                        published_at=now - timedelta(minutes=i), fetched_at=now - timedelta(minutes=i))
+                for i in range(articles)
+            ],
+            batch_size=1000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(
+            f'Seeded {users} users, {users * digests} digests and {articles} articles '
+            f'in {time.perf_counter() - start:.1f}s'
+        )
+        return created[len(created) // 2]
+
+    @staticmethod
+    def _queries(user: User) -> dict:
+        """Return the hot querysets, keyed by description."""
+        now = timezone.now()
+        # The start of New York's digest window, so the scheduler finds a bucket.
+        new_york = pytz.timezone('America/New_York')
+        due_at = now.astimezone(new_york).replace(hour=DIGEST_HOUR, minute=0).astimezone(pytz.utc)
+        return {
+            'dashboard: latest digests for a user': (
+                NewsDigest.objects.filter(user=user).only('id', 'created_at', 'excerpt').order_by('-created_at')[:10]
+            ),
+            'delivery: unsent digests, oldest first': (
+                NewsDigest.objects.filter(sent_at__isnull=True).order_by('created_at')[:500]
+            ),
+            'freshness: articles fetched in the last hour': (
+                Article.objects.filter(fetched_at__gte=now - timedelta(hours=1)).only('id', 'url')
+            ),
+            'scheduler: users due for a digest': _due_users(due_at).only('id'),
+        }
+
+    def _report(self, label: str, queries: dict, runs: int) -> None:
+        """Print the plan and median latency of each query."""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} =='))
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(f'\n{name}: median {statistics.median(timings) * 1000:.2f}ms')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+    @staticmethod
+    def _drop_indexes() -> None:
+        """Drop the indexes added for the hot queries; the transaction rollback restores them."""
+        # Plain DROP INDEX rather than the schema editor, which SQLite does
+        # not allow inside a transaction.
+        with connection.cursor() as cursor:
+            for model in (NewsDigest, Article, UserProfile):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            cursor.execute('ANALYZE')
@@ -0,0 +1,86 @@
+"""Management command to benchmark serial vs concurrent article scraping."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from news.services.article_scraper import ArticleScraper
+from news.services.politeness import HostScheduler
+
+STUB_PAGE = b"""<html><head><title>Stub</title><script>var x = 1;</script></head>
+<body><nav>Home | World | Tech</nav>
+<article><h1>Stub article</h1>""" + b"<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>" * 50 + b"""</article>
+</body></html>"""
+
+def _start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """
+    Start a local HTTP server that serves STUB_PAGE after `latency` seconds.
+
+    Args:
+        latency: Simulated server latency in seconds.
+
+    Returns:
+        The running server; call `shutdown()` when done.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(STUB_PAGE)))
+            self.end_headers()
+            self.wfile.write(STUB_PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class Command(BaseCommand):
+    """Benchmark ArticleScraper against a local stub HTTP server."""
+
+    help = 'Compare serial scrape_article calls with the concurrent scrape_many engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', type=int, default=40, help='Number of URLs to scrape')
+        parser.add_argument('--latency', type=float, default=0.1, help='Stub server latency in seconds')
+        parser.add_argument('--workers', type=int, default=16, help='Global concurrency limit')
+        parser.add_argument('--per-host', type=int, default=8, help='Per-host concurrency limit')
+        parser.add_argument('--host-interval', type=float, default=0,
+                            help='Minimum seconds per request to one host (politeness pacing)')
+
+    def handle(self, *args, **options):
+        server = _start_stub_server(options['latency'])
+        port = server.server_address[1]
+        # Spread URLs over two host names so the per-host limit is exercised.
+        hosts = ['127.0.0.1', 'localhost']
+        urls = [f'http://{hosts[i % 2]}:{port}/article/{i}' for i in range(options['urls'])]
+
+        try:
+            scraper = ArticleScraper()
+            scraper.scheduler = HostScheduler(scraper.session, interval=options['host_interval'])
+            start = time.perf_counter()
+            serial_ok = sum(1 for url in urls if scraper.scrape_article(url))
+            serial_time = time.perf_counter() - start
+
+            scraper = ArticleScraper(max_workers=options['workers'], max_per_host=options['per_host'])
+            scraper.scheduler = HostScheduler(scraper.session, interval=options['host_interval'])
+            start = time.perf_counter()
+            concurrent_ok = sum(1 for _, content in scraper.scrape_many(urls) if content)
+            concurrent_time = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+        self.stdout.write(f'{len(urls)} URLs, {options["latency"] * 1000:.0f}ms latency')
+        self.stdout.write(
+            f'serial:      {serial_ok} ok in {serial_time:.2f}s ({len(urls) / serial_time:.1f} pages/s)'
+        )
+        self.stdout.write(
+            f'scrape_many: {concurrent_ok} ok in {concurrent_time:.2f}s ({len(urls) / concurrent_time:.1f} pages/s)'
+        )
+        self.stdout.write(f'speedup: {serial_time / concurrent_time:.1f}x')
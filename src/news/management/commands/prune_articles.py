@@ -0,0 +1,17 @@
+"""Management command to drop the stored text of old articles."""
+
+from django.core.management.base import BaseCommand
+from news.services.ingestion import prune_old_articles
+
+class Command(BaseCommand):
+    """Apply the article retention period."""
+
+    help = 'Drop the text of articles older than the retention period and delete those no digest lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention in days (default: ARTICLE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        result = prune_old_articles(options['days'])
+        self.stdout.write(f'{result["deleted"]} articles deleted, text cleared from {result["cleared"]}')
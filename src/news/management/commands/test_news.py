@@ -2,7 +2,7 @@
 
 from django.core.management.base import BaseCommand
 from news.services.news_search import NewsSearchService
-from news.services.article_scraper import ArticleScraper
+from news.services.content_cache import ContentCache
 from news.services.llm_service import LLMService
 import os
 
@@ -27,10 +27,10 @@ class Command(BaseCommand):
             return
 
         # Test scraping
-        scraper = ArticleScraper()
+        scraped = ContentCache().get_many([article['url'] for article in articles[:3]])  # Test with first 3
         contents = []
-        for article in articles[:3]:  # Test with first 3
-            content = scraper.scrape_article(article['url'])
+        for article in articles[:3]:
+            content = scraped.get(article['url'])
             if content:
                 contents.append(content[:500])  # Limit for testing
                 self.stdout.write(f'Scraped: {article["title"]}')
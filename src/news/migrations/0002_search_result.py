@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:02
+
+import re
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def normalize_term(term):
+    # Frozen copy of news.models.normalize_term as of this migration.
+    return re.sub(r'\s+', ' ', term).strip().casefold()
+
+
+def backfill_normalized_terms(apps, schema_editor):
+    SearchTerm = apps.get_model('news', 'SearchTerm')
+    terms = list(SearchTerm.objects.all())
+    for term in terms:
+        term.normalized_term = normalize_term(term.term)
+    SearchTerm.objects.bulk_update(terms, ['normalized_term'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(help_text='Normalized search term', max_length=255, unique=True)),
+                ('results', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='normalized_term',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_normalized_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:08
+
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of news.services.url_utils as of this migration.
+TRACKING_PARAMS = re.compile(
+    r'^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|ocid|cmpid|ref|ref_src|smid|'
+    r'outputtype|amp)$',
+    re.I,
+)
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+def canonicalize_url(url):
+    parts = urlsplit(normalize_url(url))
+    host = re.sub(r'^(www|amp|m)\.', '', parts.netloc)
+    segments = [segment for segment in parts.path.split('/') if segment and segment.lower() != 'amp']
+    path = '/' + '/'.join(segments)
+    path = re.sub(r'\.amp(\.html?)?$', r'\1', path)
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit(('https', host, path, query, ''))
+
+
+def backfill_canonical_urls(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    batch = []
+    for article in Article.objects.only('id', 'url').iterator(chunk_size=1000):
+        article.canonical_url = canonicalize_url(article.url)
+        batch.append(article)
+        if len(batch) == 1000:
+            Article.objects.bulk_update(batch, ['canonical_url'])
+            batch = []
+    Article.objects.bulk_update(batch, ['canonical_url'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_article_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='canonical_url',
+            field=models.CharField(blank=True, db_index=True, help_text='URL with tracking parameters, AMP markers and scheme differences removed', max_length=2000),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier article with near-identical content, e.g. a syndicated copy', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='news.article'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='simhash',
+            field=models.BigIntegerField(blank=True, help_text='SimHash fingerprint of the content', null=True),
+        ),
+        migrations.CreateModel(
+            name='ArticleFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.IntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_bands', to='news.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'value'], name='news_articl_band_95c851_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_canonical_urls, migrations.RunPython.noop),
+    ]
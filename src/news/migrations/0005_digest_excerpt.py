@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:09
+
+from django.db import migrations, models
+
+# news.models.EXCERPT_LENGTH as of this migration.
+EXCERPT_LENGTH = 200
+
+
+def backfill_excerpts(apps, schema_editor):
+    from django.utils.text import Truncator
+    NewsDigest = apps.get_model('news', 'NewsDigest')
+    batch = []
+    for digest in NewsDigest.objects.only('id', 'summary').iterator(chunk_size=1000):
+        digest.excerpt = Truncator(digest.summary).chars(EXCERPT_LENGTH)
+        batch.append(digest)
+        if len(batch) == 1000:
+            NewsDigest.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    NewsDigest.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_article_dedup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsdigest',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, help_text='Start of the summary, shown in listings without loading the full text', max_length=200),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_digest_excerpt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['fetched_at'], name='news_article_fetched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['published_at'], name='news_article_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsdigest',
+            index=models.Index(fields=['user', '-created_at'], name='news_digest_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsdigest',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['created_at'], name='news_digest_unsent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['timezone'], name='news_profile_timezone_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsdigest',
+            name='send_attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Failed attempts to email the digest'),
+        ),
+    ]
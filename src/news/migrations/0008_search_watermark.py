@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:14
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def backfill_watermarks(apps, schema_editor):
+    SearchResult = apps.get_model('news', 'SearchResult')
+    results = list(SearchResult.objects.all())
+    for result in results:
+        published = [parse_datetime(a.get('publishedAt') or '') for a in result.results]
+        result.latest_published_at = max((p for p in published if p), default=None)
+    SearchResult.objects.bulk_update(results, ['latest_published_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_digest_send_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchresult',
+            name='latest_published_at',
+            field=models.DateTimeField(blank=True, help_text='Newest publication time among the results; later searches start from here', null=True),
+        ),
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_search_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000, unique=True)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('etag', models.CharField(blank=True, help_text='ETag of the last response, for conditional requests', max_length=255)),
+                ('last_modified', models.CharField(blank=True, help_text='Last-Modified header of the last response, for conditional requests', max_length=100)),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeedMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(help_text='Normalized search term', max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_matches', to='news.article')),
+            ],
+            options={
+                'unique_together': {('query', 'article')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:20
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from news.services.local_search import install_index
+    install_index(schema_editor.connection, rebuild=True)
+
+
+def drop_index(apps, schema_editor):
+    from news.services.local_search import remove_index
+    remove_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_feeds'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
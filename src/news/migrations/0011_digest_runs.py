@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_article_fulltext'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('local_date', models.DateField(help_text="The user's local date the digest is for")),
+                ('stage', models.CharField(choices=[('pending', 'Pending'), ('searched', 'Searched'), ('scraped', 'Scraped'), ('summarized', 'Summarized'), ('sent', 'Sent'), ('skipped', 'Skipped (nothing to summarize)')], default='pending', max_length=20)),
+                ('candidates', models.JSONField(blank=True, default=dict, help_text='Search hits by canonical URL, saved when searched')),
+                ('article_ids', models.JSONField(blank=True, default=list, help_text='Stored, de-duplicated articles, saved when scraped')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Lease of the worker processing the run', null=True)),
+                ('error', models.TextField(blank=True, help_text='Error of the last failed attempt')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('digest', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='run', to='news.newsdigest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('stage__in', ['pending', 'searched', 'scraped'])), fields=['local_date'], name='news_digestrun_unfinished_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'local_date'), name='news_digestrun_user_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_digest_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digestrun',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, help_text='When the run was last queued', null=True),
+        ),
+        migrations.AddField(
+            model_name='digestrun',
+            name='due_at',
+            field=models.DateTimeField(blank=True, help_text="Start of the user's digest window; before it, only search and scraping run (pre-warm)", null=True),
+        ),
+    ]
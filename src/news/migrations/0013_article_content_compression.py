@@ -0,0 +1,57 @@
+# Generated by Django 6.1.2 on 2026-10-17 06:39
+
+import news.fields
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def _convert_content(schema_editor, convert):
+    # PostgreSQL keeps the column as text (see CompressedTextField).
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        return
+    last_id = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute('SELECT id, content FROM news_article WHERE id > %s ORDER BY id LIMIT %s',
+                           [last_id, BATCH_SIZE])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany('UPDATE news_article SET content = %s WHERE id = %s',
+                               [(convert(content), pk) for pk, content in rows])
+            last_id = rows[-1][0]
+
+
+def compress_content(apps, schema_editor):
+    from news.fields import compress_text, decompress_text
+    _convert_content(schema_editor, lambda content: compress_text(decompress_text(content) or ''))
+
+
+def decompress_content(apps, schema_editor):
+    from news.fields import decompress_text
+    _convert_content(schema_editor, lambda content: decompress_text(content) or '')
+
+
+def rebuild_index(apps, schema_editor):
+    from news.services.local_search import install_index, remove_index
+    remove_index(schema_editor.connection)
+    install_index(schema_editor.connection, rebuild=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_digest_prewarm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='content',
+            field=news.fields.CompressedTextField(blank=True, help_text='Scraped content of the article, stored compressed'),
+        ),
+        migrations.RunPython(compress_content, decompress_content),
+        migrations.RunPython(rebuild_index, rebuild_index),
+    ]
@@ -1,7 +1,28 @@
-from django.db import models
+from datetime import timedelta
+from django.db import connection, models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.text import Truncator
 import pytz
+import re
+from typing import List, Optional
+from .fields import CompressedTextField
+from .services.url_utils import canonicalize_url
+
+# Length of NewsDigest.excerpt, matching the dashboard's former truncatechars:200.
+EXCERPT_LENGTH = 200
+
+def normalize_term(term: str) -> str:
+    """
+    Normalize a search term so equivalent spellings share one search.
+
+    Args:
+        term: The raw search term.
+
+    Returns:
+        The term case-folded with whitespace collapsed, e.g. 'ai  Chips' -> 'ai chips'.
+    """
+    return re.sub(r'\s+', ' ', term).strip().casefold()
 
 class UserProfile(models.Model):
     """User profile model to store additional user information."""
@@ -13,6 +34,30 @@ class UserProfile(models.Model):
         help_text="User's preferred timezone for scheduling digests."
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['timezone'], name='news_profile_timezone_idx')]
+
+    @classmethod
+    def timezones_in_use(cls) -> List[str]:
+        """
+        Return the distinct timezones of all profiles, in order.
+
+        The timezone index is skip-scanned, reading one entry per distinct
+        timezone rather than one per profile.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE zones(name) AS (
+                    SELECT MIN(timezone) FROM {table}
+                    UNION ALL
+                    SELECT (SELECT MIN(timezone) FROM {table} WHERE timezone > zones.name)
+                    FROM zones WHERE zones.name IS NOT NULL
+                )
+                SELECT name FROM zones WHERE name IS NOT NULL
+            """)
+            return [name for name, in cursor.fetchall()]
+
     def __str__(self) -> str:
         return f"{self.user.username}'s profile"
 
@@ -20,34 +65,289 @@ class SearchTerm(models.Model):
     """Model for user-defined search terms for news."""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     term = models.CharField(max_length=255, help_text="Search term for news, e.g., 'electric vehicle'")
+    normalized_term = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('user', 'term')
 
+    def save(self, *args, **kwargs):
+        self.normalized_term = normalize_term(self.term)
+        super().save(*args, **kwargs)
+
     def __str__(self) -> str:
         return f"{self.user.username}: {self.term}"
 
+class SearchResult(models.Model):
+    """Cached news search results for a normalized query, shared by all users."""
+    query = models.CharField(max_length=255, unique=True, help_text="Normalized search term")
+    results = models.JSONField(default=list)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    latest_published_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Newest publication time among the results; later searches start from here"
+    )
+
+    def __str__(self) -> str:
+        return f"Results for '{self.query}' at {self.fetched_at}"
+
+class ArticleQuerySet(models.QuerySet):
+    """Article queries; the text is not loaded unless asked for."""
+
+    def with_content(self) -> 'ArticleQuerySet':
+        """Load the article text as well, for code that reads it."""
+        return self.defer(None)
+
+class ArticleManager(models.Manager.from_queryset(ArticleQuerySet)):
+    """Default Article manager, deferring the text so listings load only metadata."""
+
+    def get_queryset(self) -> ArticleQuerySet:
+        return super().get_queryset().defer('content')
+
 class Article(models.Model):
     """Model for scraped news articles."""
     title = models.CharField(max_length=500)
     url = models.URLField(unique=True)
-    content = models.TextField(blank=True, help_text="Scraped content of the article")
+    content = CompressedTextField(blank=True, help_text="Scraped content of the article, stored compressed")
     published_at = models.DateTimeField(null=True, blank=True)
     source = models.CharField(max_length=255, blank=True)
     fetched_at = models.DateTimeField(default=timezone.now)
+    canonical_url = models.CharField(
+        max_length=2000, blank=True, db_index=True,
+        help_text="URL with tracking parameters, AMP markers and scheme differences removed"
+    )
+    simhash = models.BigIntegerField(null=True, blank=True, help_text="SimHash fingerprint of the content")
+    duplicate_of = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='duplicates',
+        help_text="Earlier article with near-identical content, e.g. a syndicated copy"
+    )
+
+    objects = ArticleManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fetched_at'], name='news_article_fetched_idx'),
+            models.Index(fields=['published_at'], name='news_article_published_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.canonical_url:
+            self.canonical_url = canonicalize_url(self.url)
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return self.title
 
+class ArticleFingerprint(models.Model):
+    """One 16-bit band of an article's SimHash, indexed for near-duplicate lookup."""
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='fingerprint_bands')
+    band = models.PositiveSmallIntegerField()
+    value = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'value'])]
+
+    def __str__(self) -> str:
+        return f"Band {self.band} of article {self.article_id}"
+
+class Feed(models.Model):
+    """RSS or Atom feed polled for new articles."""
+    url = models.URLField(max_length=2000, unique=True)
+    title = models.CharField(max_length=255, blank=True)
+    etag = models.CharField(max_length=255, blank=True, help_text="ETag of the last response, for conditional requests")
+    last_modified = models.CharField(
+        max_length=100, blank=True, help_text="Last-Modified header of the last response, for conditional requests"
+    )
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.title or self.url
+
+class FeedMatch(models.Model):
+    """A feed article that matches a normalized search term."""
+    query = models.CharField(max_length=255, help_text="Normalized search term")
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='feed_matches')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('query', 'article')
+
+    def __str__(self) -> str:
+        return f"'{self.query}' matches article {self.article_id}"
+
 class NewsDigest(models.Model):
     """Model for generated news digests."""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     search_term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE)
     summary = models.TextField(help_text="LLM-generated summary of the news")
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH, blank=True, editable=False,
+        help_text="Start of the summary, shown in listings without loading the full text"
+    )
     articles = models.ManyToManyField(Article, related_name='digests')
     created_at = models.DateTimeField(default=timezone.now)
     sent_at = models.DateTimeField(null=True, blank=True, help_text="When the digest was emailed")
+    send_attempts = models.PositiveSmallIntegerField(default=0, help_text="Failed attempts to email the digest")
+
+    class Meta:
+        indexes = [
+            # Dashboard: a user's latest digests.
+            models.Index(fields=['user', '-created_at'], name='news_digest_user_created_idx'),
+            # Email delivery: digests not yet sent, oldest first.
+            models.Index(fields=['created_at'], condition=models.Q(sent_at__isnull=True),
+                         name='news_digest_unsent_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.excerpt = Truncator(self.summary).chars(EXCERPT_LENGTH)
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return f"Digest for {self.user.username} on {self.created_at.date()}"
+
+class DigestRun(models.Model):
+    """
+    Ledger entry for one user's digest on one local date.
+
+    The unique (user, local_date) pair makes generation exactly-once per
+    day. Each stage stores what it produced before the run moves on, so a
+    retried run resumes at the stage that failed instead of starting over.
+    Runs created ahead of the user's window are searched and scraped early
+    and summarized once `due_at` has passed.
+    """
+    PENDING = 'pending'
+    SEARCHED = 'searched'
+    SCRAPED = 'scraped'
+    SUMMARIZED = 'summarized'
+    SENT = 'sent'
+    SKIPPED = 'skipped'
+    STAGES = [
+        (PENDING, 'Pending'),
+        (SEARCHED, 'Searched'),
+        (SCRAPED, 'Scraped'),
+        (SUMMARIZED, 'Summarized'),
+        (SENT, 'Sent'),
+        (SKIPPED, 'Skipped (nothing to summarize)'),
+    ]
+    # Stages after which the run still has work to do.
+    UNFINISHED = [PENDING, SEARCHED, SCRAPED]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='digest_runs')
+    local_date = models.DateField(help_text="The user's local date the digest is for")
+    stage = models.CharField(max_length=20, choices=STAGES, default=PENDING)
+    candidates = models.JSONField(
+        default=dict, blank=True, help_text="Search hits by canonical URL, saved when searched"
+    )
+    article_ids = models.JSONField(
+        default=list, blank=True, help_text="Stored, de-duplicated articles, saved when scraped"
+    )
+    digest = models.OneToOneField(
+        NewsDigest, on_delete=models.SET_NULL, null=True, blank=True, related_name='run'
+    )
+    due_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Start of the user's digest window; before it, only search and scraping run (pre-warm)"
+    )
+    dispatched_at = models.DateTimeField(null=True, blank=True, help_text="When the run was last queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    locked_until = models.DateTimeField(
+        null=True, blank=True, help_text="Lease of the worker processing the run"
+    )
+    error = models.TextField(blank=True, help_text="Error of the last failed attempt")
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'local_date'], name='news_digestrun_user_date_uniq'),
+        ]
+        indexes = [
+            # Scheduler: recent runs with work left.
+            models.Index(fields=['local_date'], condition=models.Q(stage__in=['pending', 'searched', 'scraped']),
+                         name='news_digestrun_unfinished_idx'),
+        ]
+
+    @classmethod
+    def claim(cls, pk: int, lease_seconds: int, max_attempts: int,
+              count_attempt: bool = True) -> Optional['DigestRun']:
+        """
+        Take the lease on an unfinished run, unless another worker holds it.
+
+        Args:
+            pk: Primary key of the run.
+            lease_seconds: How long the lease lasts; a worker that dies
+                releases the run when it expires.
+            max_attempts: Runs already attempted this many times are not claimed.
+            count_attempt: Count the claim as an attempt; pre-warm claims,
+                which leave the run unfinished on purpose, do not.
+
+        Returns:
+            The claimed run, or None.
+        """
+        now = timezone.now()
+        fields = {'locked_until': now + timedelta(seconds=lease_seconds), 'updated_at': now}
+        if count_attempt:
+            fields['attempts'] = models.F('attempts') + 1
+        claimed = (
+            cls.objects.filter(pk=pk, stage__in=cls.UNFINISHED, attempts__lt=max_attempts)
+            .filter(models.Q(locked_until__isnull=True) | models.Q(locked_until__lt=now))
+            .update(**fields)
+        )
+        return cls.objects.select_related('user').get(pk=pk) if claimed else None
+
+    def checkpoint(self, stage: str, **fields) -> bool:
+        """
+        Record that a stage finished, with what it produced.
+
+        The update only applies if the stored run is still at the stage this
+        instance was loaded at, so two workers cannot both advance it.
+
+        Args:
+            stage: The stage reached.
+            **fields: Stage output to save, e.g. candidates=... or digest=...
+
+        Returns:
+            True if the run was advanced.
+        """
+        now = timezone.now()
+        advanced = (
+            DigestRun.objects.filter(pk=self.pk, stage=self.stage)
+            .update(stage=stage, updated_at=now, **fields)
+        )
+        if advanced:
+            self.stage = stage
+            self.updated_at = now
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(advanced)
+
+    def release(self, error: str = '') -> None:
+        """
+        Give up the lease, recording the error if the attempt failed.
+
+        The run is no longer queued either, so the next scheduler tick
+        dispatches it again.
+        """
+        self.locked_until = None
+        self.dispatched_at = None
+        self.error = error
+        self.updated_at = timezone.now()
+        self.save(update_fields=['locked_until', 'dispatched_at', 'error', 'updated_at'])
+
+    def __str__(self) -> str:
+        return f"Digest run for {self.user.username} on {self.local_date}: {self.stage}"
+
+class ArticleSummary(models.Model):
+    """LLM summary of a single article's content, shared by every digest that includes it."""
+    content_hash = models.CharField(max_length=64, help_text="SHA-256 of the summarized article text")
+    provider = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    prompt_version = models.PositiveIntegerField()
+    summary = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'provider', 'model', 'prompt_version')
+
+    def __str__(self) -> str:
+        return f"{self.provider}/{self.model} summary of {self.content_hash[:12]}"
@@ -1,74 +1,223 @@
-"""Article scraping service using BeautifulSoup."""
+"""Article scraping service with pluggable HTML content extraction."""
 
+import re
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
-from typing import Optional
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import urljoin, urlsplit
+from . import metrics
+from .extractors import BeautifulSoupExtractor, ContentExtractor, get_extractor
+from .politeness import USER_AGENT, HostScheduler
+
+# Per-request timeout in seconds.
+REQUEST_TIMEOUT = 10
+
+# Downloads are truncated at this size; article text is near the top of the
+# page, and unbounded bodies would otherwise be held fully in memory.
+MAX_CONTENT_BYTES = 2 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Statuses meaning the host is overloaded or rate limiting us.
+BACK_OFF_STATUS_CODES = {429, 503}
+
+# Responses with a declared content type outside this set are not parsed.
+HTML_CONTENT_TYPE = re.compile(r'^\s*(text/html|application/xhtml\+xml|text/xml|application/xml)\b', re.I)
 
 class ArticleScraper:
     """Service for scraping article content from URLs."""
 
-    def __init__(self) -> None:
+    def __init__(self, max_workers: int = 16, max_per_host: Optional[int] = None,
+                 extractor: Optional[ContentExtractor] = None,
+                 scheduler: Optional[HostScheduler] = None) -> None:
+        """
+        Args:
+            max_workers: Upper bound on concurrent fetches in `scrape_many`.
+            max_per_host: Upper bound on concurrent fetches to a single host;
+                defaults to `settings.SCRAPE_MAX_PER_HOST`.
+            extractor: Content extraction engine; defaults to `settings.ARTICLE_EXTRACTOR`.
+            scheduler: Per-host pacing and robots.txt rules; defaults to a
+                `HostScheduler` configured from settings.
+        """
+        self.extractor = extractor or get_extractor()
+        self.fallback_extractor = BeautifulSoupExtractor()
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host or settings.SCRAPE_MAX_PER_HOST
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        # Keep one keep-alive pool per host, sized to the per-host limit so
+        # concurrent fetches reuse connections instead of discarding them.
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=self.max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.scheduler = scheduler or HostScheduler(self.session)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_slots_lock = threading.Lock()
 
-    def scrape_article(self, url: str) -> Optional[str]:
+    def scrape_article(self, url: str, timeout: float = REQUEST_TIMEOUT,
+                       skipped: Optional[Set[str]] = None) -> Optional[str]:
         """
         Scrape the main content of an article from the given URL.
 
+        The request waits for the host's turn (see `HostScheduler`), and
+        URLs disallowed by robots.txt are not fetched. Fetching robots.txt
+        counts against the time budget.
+
         Args:
             url: The URL of the article to scrape.
+            timeout: Time budget in seconds, including any wait for the
+                host's turn.
+            skipped: If given, the URL is added to it when it was not
+                fetched because robots.txt or the host's turn would come
+                too late.
 
         Returns:
             The extracted text content, or None if scraping fails.
         """
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+        host = urlsplit(url).netloc.lower()
+        expires_at = time.monotonic() + timeout
+        content = None
+        allowed = self.scheduler.allowed(url, expires_at)
+        if allowed is None:
+            print(f"Skipping {url}: no robots.txt for {host} within {timeout:g}s")
+            if skipped is not None:
+                skipped.add(url)
+        elif not allowed:
+            print(f"Skipping {url}: disallowed by robots.txt")
+        elif not self.scheduler.wait_turn(url, expires_at):
+            print(f"Skipping {url}: no turn for {host} within {timeout:g}s")
+            if skipped is not None:
+                skipped.add(url)
+        else:
+            with metrics.timer('news_scrape_seconds', host=host):
+                content = self._scrape(url, expires_at - time.monotonic())
+        if content is None:
+            metrics.increment('news_scrape_failures_total', host=host)
+        return content
 
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
+    def _scrape(self, url: str, timeout: float) -> Optional[str]:
+        """Download and extract an article, returning None on any failure."""
+        try:
+            html = self._download(url, timeout)
+            if html is None:
+                return None
 
-            # Try to find main content
-            content = self._extract_content(soup)
+            content = self.extractor.extract(html)
+            if not content and not isinstance(self.extractor, BeautifulSoupExtractor):
+                content = self.fallback_extractor.extract(html)
             return content.strip() if content else None
         except Exception as e:
             print(f"Error scraping {url}: {e}")
             return None
 
-    def _extract_content(self, soup: BeautifulSoup) -> Optional[str]:
+    def _download(self, url: str, timeout: float) -> Optional[bytes]:
         """
-        Extract main content from BeautifulSoup object.
+        Stream an HTML page, aborting early on non-HTML content types.
 
         Args:
-            soup: Parsed HTML.
+            url: The URL to fetch.
+            timeout: Request timeout in seconds.
 
         Returns:
-            Extracted text content.
+            At most MAX_CONTENT_BYTES of the response body, or None if the
+            response is not HTML.
+        """
+        with self.session.get(url, timeout=timeout, stream=True) as response:
+            if response.status_code in BACK_OFF_STATUS_CODES:
+                self.scheduler.back_off(url, response.headers.get('Retry-After'))
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and not HTML_CONTENT_TYPE.match(content_type):
+                print(f"Skipping {url}: unsupported content type {content_type}")
+                return None
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_CONTENT_BYTES:
+                    break
+            metrics.increment('news_scrape_bytes_total', size, host=urlsplit(url).netloc.lower())
+            return b''.join(chunks)[:MAX_CONTENT_BYTES]
+
+    def scrape_many(self, urls: Iterable[str], deadline: Optional[float] = None,
+                    skipped: Optional[Set[str]] = None) -> Iterator[Tuple[str, Optional[str]]]:
         """
-        # Common selectors for article content
-        selectors = [
-            'article',
-            '[class*="content"]',
-            '[class*="article"]',
-            '[class*="post"]',
-            'main',
-            '.entry-content',
-            '#content',
-        ]
-
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                return element.get_text(separator=' ', strip=True)
-
-        # Fallback: get all paragraphs
-        paragraphs = soup.find_all('p')
-        if paragraphs:
-            return ' '.join(p.get_text(strip=True) for p in paragraphs)
-
-        return None
\ No newline at end of file
+        Scrape several URLs concurrently, yielding results as they complete.
+
+        Concurrency is bounded globally by `max_workers` and per host by
+        `max_per_host`, and requests to each host are paced by the
+        scheduler. Duplicate URLs are fetched once.
+
+        Args:
+            urls: The URLs to scrape.
+            deadline: Total time budget in seconds for the whole batch. URLs
+                not finished when it expires are yielded with None content.
+            skipped: If given, URLs yielded with None content because the
+                deadline expired, rather than because scraping failed, are
+                added to it.
+
+        Returns:
+            Iterator of (url, content) pairs in completion order; content is
+            None if scraping failed or the deadline expired.
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return
+
+        expires_at = time.monotonic() + deadline if deadline is not None else None
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_urls)))
+        futures = {
+            executor.submit(self._scrape_with_host_slot, url, expires_at, skipped): url
+            for url in unique_urls
+        }
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                pending.discard(future)
+                yield futures[future], future.result()
+        except TimeoutError:
+            print(f"Scrape deadline of {deadline}s expired with {len(pending)} URLs pending")
+            for future in pending:
+                if skipped is not None:
+                    skipped.add(futures[future])
+                yield futures[future], None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scrape_with_host_slot(self, url: str, expires_at: Optional[float],
+                               skipped: Optional[Set[str]] = None) -> Optional[str]:
+        """
+        Scrape a URL once a concurrency slot for its host is free.
+
+        Args:
+            url: The URL to scrape.
+            expires_at: Monotonic time after which the fetch is abandoned.
+            skipped: Set collecting URLs abandoned for lack of time.
+
+        Returns:
+            The extracted text content, or None.
+        """
+        slot = self._host_slot(urlsplit(url).netloc.lower())
+        with slot:
+            timeout = REQUEST_TIMEOUT
+            if expires_at is not None:
+                timeout = min(timeout, expires_at - time.monotonic())
+                if timeout <= 0:
+                    if skipped is not None:
+                        skipped.add(url)
+                    return None
+            return self.scrape_article(url, timeout=timeout, skipped=skipped)
+
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        """Return the semaphore limiting concurrent fetches to `host`."""
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_per_host)
+                self._host_slots[host] = slot
+            return slot
@@ -0,0 +1,147 @@
+"""Shared cache in front of ArticleScraper, backed by the Django cache."""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from typing import Dict, Iterable, Optional
+from .article_scraper import ArticleScraper
+from .url_utils import normalize_url
+
+# Stored in place of content when a scrape failed, so failures are cached too.
+FAILED = ''
+
+# How long a worker waits for another worker that is already fetching a URL.
+LOCK_TIMEOUT = 60
+LOCK_POLL_INTERVAL = 0.5
+
+class ContentCache:
+    """Fetch article content through a shared cache so each URL is scraped once."""
+
+    def __init__(self, scraper: Optional[ArticleScraper] = None) -> None:
+        self.scraper = scraper or ArticleScraper()
+        self.ttl = settings.SCRAPE_CACHE_TTL
+        self.failure_ttl = settings.SCRAPE_CACHE_FAILURE_TTL
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        Return the content of a single article, scraping it on a cache miss.
+
+        Args:
+            url: The article URL.
+
+        Returns:
+            The extracted text content, or None if scraping failed.
+        """
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls: Iterable[str], deadline: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Return the content of several articles, scraping only cache misses.
+
+        Misses are fetched concurrently with `ArticleScraper.scrape_many`. A
+        short-lived lock per URL stops several workers from fetching the same
+        article at once; workers that lose the lock wait for the winner's
+        result instead. URLs left unfetched when the deadline expires are
+        returned as None but not cached, so a later call fetches them.
+
+        Args:
+            urls: The article URLs.
+            deadline: Total time budget in seconds for scraping misses and
+                waiting for other workers.
+
+        Returns:
+            Mapping of each requested URL to its content, or None on failure.
+        """
+        expires_at = time.monotonic() + deadline if deadline is not None else None
+        keys = {url: self._key(url) for url in urls}
+        cached = cache.get_many(set(keys.values()))
+
+        results = {}
+        to_fetch = []
+        waiting = {}
+        for url, key in keys.items():
+            if key in cached:
+                results[url] = cached[key] or None
+            elif cache.add(f'{key}:lock', 1, timeout=LOCK_TIMEOUT):
+                to_fetch.append(url)
+            else:
+                waiting[url] = key
+
+        try:
+            results.update(self._fetch({url: keys[url] for url in to_fetch}, deadline))
+        finally:
+            cache.delete_many([f'{keys[url]}:lock' for url in to_fetch])
+
+        if waiting:
+            results.update(self._wait_for(waiting, expires_at))
+        return results
+
+    def _wait_for(self, waiting: Dict[str, str], expires_at: Optional[float]) -> Dict[str, Optional[str]]:
+        """
+        Wait for URLs being fetched by another worker, scraping any that time out.
+
+        Args:
+            waiting: Mapping of URL to cache key.
+            expires_at: Monotonic time at which the caller's deadline
+                expires, if any.
+
+        Returns:
+            Mapping of URL to content, or None on failure.
+        """
+        results = {}
+        wait_until = time.monotonic() + LOCK_TIMEOUT
+        if expires_at is not None:
+            wait_until = min(wait_until, expires_at)
+        while waiting and time.monotonic() < wait_until:
+            time.sleep(max(min(LOCK_POLL_INTERVAL, wait_until - time.monotonic()), 0))
+            found = cache.get_many(list(waiting.values()))
+            for url, key in list(waiting.items()):
+                if key in found:
+                    results[url] = found[key] or None
+                    del waiting[url]
+
+        if not waiting:
+            return results
+        remaining = expires_at - time.monotonic() if expires_at is not None else None
+        if remaining is not None and remaining <= 0:
+            results.update({url: None for url in waiting})
+            return results
+        results.update(self._fetch(waiting, remaining))
+        return results
+
+    def _fetch(self, urls: Dict[str, str], deadline: Optional[float]) -> Dict[str, Optional[str]]:
+        """
+        Scrape URLs and cache the results, except for URLs the deadline cut off.
+
+        Args:
+            urls: Mapping of URL to cache key.
+            deadline: Time budget in seconds for the scrape.
+
+        Returns:
+            Mapping of URL to content, or None on failure.
+        """
+        results = {}
+        fetched = {}
+        skipped = set()
+        for url, content in self.scraper.scrape_many(urls, deadline=deadline, skipped=skipped):
+            results[url] = content
+            if url not in skipped:
+                fetched[urls[url]] = content
+        self._store(fetched)
+        return results
+
+    def _store(self, fetched: Dict[str, Optional[str]]) -> None:
+        """Cache fetched content, using a shorter TTL for failures."""
+        successes = {key: content for key, content in fetched.items() if content}
+        failures = {key: FAILED for key, content in fetched.items() if not content}
+        if successes:
+            cache.set_many(successes, timeout=self.ttl)
+        if failures:
+            cache.set_many(failures, timeout=self.failure_ttl)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        """Build the cache key for a URL."""
+        digest = hashlib.sha256(normalize_url(url).encode()).hexdigest()
+        return f'article-content:{digest}'
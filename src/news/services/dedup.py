@@ -0,0 +1,139 @@
+"""Near-duplicate detection for article content using SimHash."""
+
+import hashlib
+import re
+from django.db.models import Q
+from typing import Dict, List, Optional
+from ..models import Article, ArticleFingerprint
+
+# Two articles whose fingerprints differ in at most this many bits are
+# treated as the same story (e.g. a wire report syndicated by several sites).
+MAX_HAMMING_DISTANCE = 3
+
+# The 64-bit fingerprint is split into this many bands for indexing. By the
+# pigeonhole principle, fingerprints within MAX_HAMMING_DISTANCE bits agree
+# exactly on at least one band whenever BANDS > MAX_HAMMING_DISTANCE.
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+SHINGLE_SIZE = 3
+WORD_PATTERN = re.compile(r'\w+')
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Compute a 64-bit SimHash over word shingles of a text.
+
+    Args:
+        text: Article content.
+
+    Returns:
+        The fingerprint as a signed 64-bit integer (to fit a BigIntegerField),
+        or None if the text is too short to fingerprint.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return None
+
+    weights = [0] * 64
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = ' '.join(words[i:i + SHINGLE_SIZE])
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    fingerprint = sum(1 << bit for bit in range(64) if weights[bit] > 0)
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    """Return the number of differing bits between two 64-bit fingerprints."""
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+def bands(fingerprint: int) -> List[int]:
+    """Split a fingerprint into BANDS unsigned BAND_BITS-bit values."""
+    unsigned = fingerprint & ((1 << 64) - 1)
+    mask = (1 << BAND_BITS) - 1
+    return [(unsigned >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+def mark_near_duplicates(articles: List[Article]) -> List[Article]:
+    """
+    Fingerprint new content and collapse near-duplicate articles.
+
+    Articles with content but no fingerprint are fingerprinted and indexed.
+    Each one is compared against the index and against earlier articles in
+    the same batch; a match is recorded in `duplicate_of` and the original
+    article is returned in its place.
+
+    Args:
+        articles: Saved articles, e.g. one user's ingestion batch.
+
+    Returns:
+        The articles with duplicates replaced by their originals and
+        repeated entries removed, in first-seen order.
+    """
+    unfingerprinted = [a for a in articles if a.content and a.simhash is None and not a.duplicate_of_id]
+    for article in unfingerprinted:
+        article.simhash = simhash(article.content)
+    unfingerprinted = [a for a in unfingerprinted if a.simhash is not None]
+
+    originals = _find_originals(unfingerprinted)
+    seen: Dict[int, Article] = {}
+    for article in unfingerprinted:
+        if article.pk in originals:
+            continue
+        for other in seen.values():
+            if hamming_distance(article.simhash, other.simhash) <= MAX_HAMMING_DISTANCE:
+                originals[article.pk] = other
+                break
+        else:
+            seen[article.pk] = article
+
+    for article in unfingerprinted:
+        original = originals.get(article.pk)
+        article.duplicate_of = original
+    if unfingerprinted:
+        Article.objects.bulk_update(unfingerprinted, ['simhash', 'duplicate_of'])
+        ArticleFingerprint.objects.bulk_create([
+            ArticleFingerprint(article=article, band=band, value=value)
+            for article in seen.values()
+            for band, value in enumerate(bands(article.simhash))
+        ])
+
+    result: Dict[int, Article] = {}
+    for article in articles:
+        if article.duplicate_of_id and article.pk not in originals:
+            original = article.duplicate_of
+        else:
+            original = originals.get(article.pk, article)
+        result.setdefault(original.pk, original)
+    return list(result.values())
+
+def _find_originals(articles: List[Article]) -> Dict[int, Article]:
+    """
+    Look up indexed articles whose fingerprints are near those of `articles`.
+
+    Args:
+        articles: Fingerprinted articles not yet in the index.
+
+    Returns:
+        Mapping of article pk to the earlier article it duplicates.
+    """
+    if not articles:
+        return {}
+
+    condition = Q()
+    for article in articles:
+        for band, value in enumerate(bands(article.simhash)):
+            condition |= Q(fingerprint_bands__band=band, fingerprint_bands__value=value)
+    batch_ids = [article.pk for article in articles]
+    candidates = list(
+        Article.objects.with_content().filter(condition).exclude(pk__in=batch_ids).distinct()
+        .only('id', 'url', 'title', 'content', 'simhash', 'published_at', 'source')
+    )
+
+    originals = {}
+    for article in articles:
+        for candidate in candidates:
+            if hamming_distance(article.simhash, candidate.simhash) <= MAX_HAMMING_DISTANCE:
+                originals[article.pk] = candidate
+                break
+    return originals
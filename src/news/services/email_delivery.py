@@ -0,0 +1,174 @@
+"""Batched delivery of digest emails."""
+
+import os
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Prefetch, QuerySet
+from django.utils import timezone
+from typing import Dict, List, Optional, Tuple
+from ..models import Article, DigestRun, NewsDigest
+from . import metrics
+
+# Held while a delivery run is in progress, so overlapping runs (the beat
+# schedule and the end of a generation chord) never send a digest twice.
+DELIVERY_LOCK_KEY = 'digest-delivery:lock'
+DELIVERY_LOCK_TIMEOUT = 30 * 60
+
+# Set once the warning about a per-process cache has been printed.
+_warned_unshared_cache = False
+
+def render_digest_email(digest: NewsDigest) -> EmailMessage:
+    """
+    Build the email for a digest.
+
+    Args:
+        digest: The digest, with `user` and `articles` already loaded.
+
+    Returns:
+        The unsent message.
+    """
+    subject = f"Daily News Digest for {digest.created_at.date()}"
+    message = f"""
+    Your daily news digest:
+
+    {digest.summary}
+
+    Articles:
+    {chr(10).join([f"- {a.title}: {a.url}" for a in digest.articles.all()])}
+    """
+    return EmailMessage(
+        subject,
+        message,
+        os.getenv('EMAIL_HOST_USER', 'noreply@example.com'),
+        [digest.user.email],
+    )
+
+def unsent_digests(max_attempts: Optional[int] = None) -> QuerySet:
+    """
+    Select the digests still waiting to be emailed.
+
+    Args:
+        max_attempts: Skip digests that already failed this many times.
+            Defaults to `settings.EMAIL_MAX_ATTEMPTS`.
+
+    Returns:
+        The digests, oldest first, with their user and articles prefetched.
+    """
+    if max_attempts is None:
+        max_attempts = settings.EMAIL_MAX_ATTEMPTS
+    return (
+        NewsDigest.objects.filter(sent_at__isnull=True, send_attempts__lt=max_attempts)
+        .select_related('user')
+        .prefetch_related(Prefetch('articles', queryset=Article.objects.only('id', 'title', 'url')))
+        .order_by('pk')
+    )
+
+def deliver_digests(batch_size: Optional[int] = None, max_attempts: Optional[int] = None,
+                    connection=None) -> Dict[str, int]:
+    """
+    Email every unsent digest over a single backend connection.
+
+    Digests are loaded and marked in batches of `batch_size`, so each batch
+    costs a constant number of queries. Messages are handed to the open
+    connection one at a time, which lets a failure be pinned to its digest:
+    sent digests get `sent_at` (and their DigestRun the 'sent' stage) in one
+    update each per batch, failed ones have `send_attempts` incremented and
+    are retried by the next run until they reach `max_attempts`.
+
+    Args:
+        batch_size: Digests per batch. Defaults to `settings.EMAIL_BATCH_SIZE`.
+        max_attempts: Attempts per digest. Defaults to `settings.EMAIL_MAX_ATTEMPTS`.
+        connection: Email backend connection to use instead of the default.
+
+    Returns:
+        Counts of 'sent' and 'failed' digests.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    counts = {'sent': 0, 'failed': 0}
+    _warn_if_cache_is_not_shared()
+    if not cache.add(DELIVERY_LOCK_KEY, True, DELIVERY_LOCK_TIMEOUT):
+        return counts
+
+    try:
+        connection = connection or get_connection(fail_silently=False)
+        with metrics.stage('email'), connection:
+            last_pk = 0
+            while True:
+                digests = list(unsent_digests(max_attempts).filter(pk__gt=last_pk)[:batch_size])
+                if not digests:
+                    break
+                last_pk = digests[-1].pk
+
+                sent, failed = _send_batch(connection, digests)
+                with transaction.atomic():
+                    NewsDigest.objects.filter(pk__in=sent, sent_at__isnull=True).update(sent_at=timezone.now())
+                    DigestRun.objects.filter(digest__in=sent).update(stage=DigestRun.SENT, updated_at=timezone.now())
+                    if failed:
+                        NewsDigest.objects.filter(pk__in=failed).update(send_attempts=F('send_attempts') + 1)
+                counts['sent'] += len(sent)
+                counts['failed'] += len(failed)
+    finally:
+        cache.delete(DELIVERY_LOCK_KEY)
+    return counts
+
+def _warn_if_cache_is_not_shared() -> None:
+    """
+    Warn once per process when the delivery lock cannot be seen by other workers.
+
+    The lock lives in the default cache. A local-memory (or dummy) cache is
+    private to each process, so prefork workers would each take their own
+    lock and could email the same digests; CACHE_URL must point them at a
+    shared cache.
+    """
+    global _warned_unshared_cache
+    if _warned_unshared_cache or not isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return
+    _warned_unshared_cache = True
+    print("Email delivery warning: the default cache is local to this process, so the "
+          "delivery lock is not shared between workers; set CACHE_URL to a shared cache")
+
+def _send_batch(connection, digests: List[NewsDigest]) -> Tuple[List[int], List[int]]:
+    """
+    Send one message per digest over an open connection.
+
+    After a failed message the connection is reopened; if that fails too,
+    the rest of the batch counts as failed, so the caller can still record
+    the digests already sent.
+
+    Args:
+        connection: Open email backend connection.
+        digests: Digests to send.
+
+    Returns:
+        Primary keys of the sent digests and of the failed digests.
+    """
+    sent, failed = [], []
+    for index, digest in enumerate(digests):
+        if not digest.user.email:
+            failed.append(digest.pk)
+            continue
+        try:
+            with metrics.timer('news_email_seconds'):
+                delivered = connection.send_messages([render_digest_email(digest)])
+            if delivered:
+                sent.append(digest.pk)
+            else:
+                failed.append(digest.pk)
+        except Exception as e:
+            print(f"Email error (digest {digest.pk}): {e}")
+            failed.append(digest.pk)
+            # The connection may be unusable after an error; reconnect.
+            try:
+                connection.close()
+                connection.open()
+            except Exception as e:
+                print(f"Email error (reconnecting): {e}")
+                failed.extend(remaining.pk for remaining in digests[index + 1:])
+                break
+    metrics.increment('news_emails_total', len(sent), outcome='sent')
+    metrics.increment('news_emails_total', len(failed), outcome='failed')
+    return sent, failed
@@ -0,0 +1,170 @@
+"""Pluggable engines for extracting the main text from an article's HTML."""
+
+import re
+from bs4 import BeautifulSoup
+from django.conf import settings
+from typing import Dict, Optional, Type
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # pragma: no cover - lxml is a declared dependency
+    lxml_html = None
+
+class ContentExtractor:
+    """Base class for content extraction engines."""
+
+    name = ''
+
+    def extract(self, html: bytes) -> Optional[str]:
+        """
+        Extract the main text content from an HTML document.
+
+        Args:
+            html: Raw HTML bytes.
+
+        Returns:
+            Extracted text content, or None if nothing useful was found.
+        """
+        raise NotImplementedError
+
+class BeautifulSoupExtractor(ContentExtractor):
+    """Selector-based extraction using BeautifulSoup's pure-Python parser."""
+
+    name = 'bs4'
+
+    def extract(self, html: bytes) -> Optional[str]:
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.extract()
+
+        return self._extract_content(soup)
+
+    def _extract_content(self, soup: BeautifulSoup) -> Optional[str]:
+        """
+        Extract main content from BeautifulSoup object.
+
+        Args:
+            soup: Parsed HTML.
+
+        Returns:
+            Extracted text content.
+        """
+        # Common selectors for article content
+        selectors = [
+            'article',
+            '[class*="content"]',
+            '[class*="article"]',
+            '[class*="post"]',
+            'main',
+            '.entry-content',
+            '#content',
+        ]
+
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element:
+                return element.get_text(separator=' ', strip=True)
+
+        # Fallback: get all paragraphs
+        paragraphs = soup.find_all('p')
+        if paragraphs:
+            return ' '.join(p.get_text(strip=True) for p in paragraphs)
+
+        return None
+
+class LxmlExtractor(ContentExtractor):
+    """
+    Single-pass block scoring on top of lxml's C parser.
+
+    Every paragraph contributes a score to its parent and, at half weight, to
+    its grandparent; the highest-scoring block, weighted by its tag and
+    class/id hints, is taken as the article body. This replaces the repeated
+    full-tree CSS selector walks of the BeautifulSoup engine.
+    """
+
+    name = 'lxml'
+
+    # Elements that never contain article text.
+    STRIP_TAGS = ('script', 'style', 'noscript', 'nav', 'footer', 'aside', 'form', 'iframe')
+    POSITIVE_HINTS = re.compile(r'article|content|entry|post|story|body|text', re.I)
+    NEGATIVE_HINTS = re.compile(r'comment|sidebar|footer|menu|share|social|related|promo|advert|subscribe|newsletter', re.I)
+    # Paragraphs shorter than this are usually captions, bylines or buttons.
+    MIN_PARAGRAPH_LENGTH = 25
+
+    def extract(self, html: bytes) -> Optional[str]:
+        try:
+            doc = lxml_html.document_fromstring(html)
+        except (etree.ParserError, ValueError):
+            return None
+        etree.strip_elements(doc, *self.STRIP_TAGS, etree.Comment, with_tail=False)
+
+        scores: Dict[etree._Element, float] = {}
+        paragraphs = []
+        for paragraph in doc.iter('p'):
+            text = ' '.join(paragraph.text_content().split())
+            if len(text) < self.MIN_PARAGRAPH_LENGTH:
+                continue
+            paragraphs.append(text)
+            score = 1 + text.count(',') + min(len(text) // 100, 3)
+            parent = paragraph.getparent()
+            if parent is None:
+                continue
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+        if not scores:
+            return ' '.join(paragraphs) or None
+
+        best = max(scores, key=lambda element: scores[element] * self._weight(element))
+        for element in best.xpath('.//*[@class or @id]'):
+            if self.NEGATIVE_HINTS.search(self._hints(element)):
+                element.drop_tree()
+        text = ' '.join(part.strip() for part in best.itertext() if part.strip())
+        return text or None
+
+    def _weight(self, element: 'etree._Element') -> float:
+        """Weight a candidate block by its tag name and class/id hints."""
+        weight = 1.0
+        if element.tag in ('article', 'main'):
+            weight *= 1.5
+        hints = self._hints(element)
+        if self.POSITIVE_HINTS.search(hints):
+            weight *= 1.25
+        if self.NEGATIVE_HINTS.search(hints):
+            weight *= 0.2
+        return weight
+
+    @staticmethod
+    def _hints(element: 'etree._Element') -> str:
+        """Return an element's class and id attributes as one string."""
+        return f"{element.get('class', '')} {element.get('id', '')}"
+
+EXTRACTORS: Dict[str, Type[ContentExtractor]] = {
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+}
+if lxml_html is not None:
+    EXTRACTORS[LxmlExtractor.name] = LxmlExtractor
+
+def get_extractor(name: Optional[str] = None) -> ContentExtractor:
+    """
+    Return an extraction engine by name.
+
+    Falls back to the BeautifulSoup engine if lxml is requested but not
+    installed.
+
+    Args:
+        name: Engine name ('lxml' or 'bs4'); defaults to `settings.ARTICLE_EXTRACTOR`.
+
+    Returns:
+        An extractor instance.
+    """
+    name = name or settings.ARTICLE_EXTRACTOR
+    if name == LxmlExtractor.name and name not in EXTRACTORS:
+        name = BeautifulSoupExtractor.name
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unsupported extractor: {name}")
+    return EXTRACTORS[name]()
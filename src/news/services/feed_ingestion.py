@@ -0,0 +1,174 @@
+"""Polling of registered RSS/Atom feeds into Article rows matched to search terms."""
+
+import re
+import requests
+from collections import defaultdict
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from typing import Dict, Iterable, List, Optional, Set
+from ..models import Feed, FeedMatch, SearchTerm
+from .feeds import iter_feed
+from .ingestion import existing_articles, upsert_articles
+from .politeness import USER_AGENT
+from .url_utils import canonicalize_url
+
+FEED_TIMEOUT = 15
+MAX_FEED_BYTES = 10 * 1024 * 1024
+
+# Entries are stored and matched this many at a time while the feed streams in.
+FEED_BATCH_SIZE = 200
+
+# Older entries (feeds often keep weeks of items) are not ingested.
+FEED_ENTRY_MAX_AGE = timedelta(days=2)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Shared by all polls in a process, so connections to feed hosts are kept
+# alive between polls instead of opening a new pool for each one.
+_session = requests.Session()
+
+class TermIndex:
+    """
+    Inverted index from words to the normalized search terms containing them.
+
+    An entry matches a term when it contains every word of the term, so
+    matching costs one dictionary lookup per distinct word of the entry
+    instead of one comparison per term.
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self.term_words: Dict[str, Set[str]] = {}
+        self.index: Dict[str, Set[str]] = defaultdict(set)
+        for term in terms:
+            words = set(WORD_PATTERN.findall(term.casefold()))
+            if not words:
+                continue
+            self.term_words[term] = words
+            for word in words:
+                self.index[word].add(term)
+
+    @classmethod
+    def from_search_terms(cls) -> 'TermIndex':
+        """Build the index over every user's normalized search terms."""
+        return cls(SearchTerm.objects.values_list('normalized_term', flat=True).distinct())
+
+    def match(self, text: str) -> List[str]:
+        """
+        Return the terms all of whose words appear in a text.
+
+        Args:
+            text: Entry title and description.
+
+        Returns:
+            The matching normalized terms.
+        """
+        hits: Dict[str, int] = defaultdict(int)
+        for word in set(WORD_PATTERN.findall(text.casefold())):
+            for term in self.index.get(word, ()):
+                hits[term] += 1
+        return [term for term, count in hits.items() if count == len(self.term_words[term])]
+
+def register_feeds(urls: Iterable[str]) -> None:
+    """
+    Make sure a Feed row exists for each URL.
+
+    Args:
+        urls: Feed URLs, e.g. `settings.NEWS_RSS_FEEDS`.
+    """
+    Feed.objects.bulk_create([Feed(url=url) for url in urls], ignore_conflicts=True)
+
+def poll_feed(feed: Feed, index: TermIndex, session: Optional[requests.Session] = None) -> int:
+    """
+    Fetch a feed if it changed, store its recent entries and match them.
+
+    The request carries the ETag and Last-Modified validators of the last
+    response, so an unchanged feed costs a 304 and no parsing. The body is
+    streamed into the parser and entries are stored `FEED_BATCH_SIZE` at a
+    time, so memory use does not grow with the feed size.
+
+    Args:
+        feed: The feed to poll.
+        index: Index of the search terms to match entries against.
+        session: HTTP session to use; defaults to one shared by the process.
+
+    Returns:
+        The number of entries stored.
+    """
+    session = session or _session
+    headers = {'User-Agent': USER_AGENT}
+    if feed.etag:
+        headers['If-None-Match'] = feed.etag
+    if feed.last_modified:
+        headers['If-Modified-Since'] = feed.last_modified
+
+    stored = 0
+    with session.get(feed.url, headers=headers, timeout=FEED_TIMEOUT, stream=True) as response:
+        if response.status_code != 304:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            batch = []
+            for entry in iter_feed(_LimitedReader(response.raw, MAX_FEED_BYTES)):
+                feed.title = feed.title or entry['source'][:255]
+                batch.append(entry)
+                if len(batch) >= FEED_BATCH_SIZE:
+                    stored += store_entries(batch, index)
+                    batch = []
+            stored += store_entries(batch, index)
+            feed.etag = response.headers.get('ETag', '')[:255]
+            feed.last_modified = response.headers.get('Last-Modified', '')[:100]
+
+    feed.last_polled_at = timezone.now()
+    feed.save(update_fields=['title', 'etag', 'last_modified', 'last_polled_at'])
+    return stored
+
+def store_entries(entries: List[Dict], index: TermIndex) -> int:
+    """
+    Store recent feed entries as articles and record the terms they match.
+
+    Args:
+        entries: Entries as yielded by `iter_feed`.
+        index: Index of the search terms to match entries against.
+
+    Returns:
+        The number of entries stored.
+    """
+    now = timezone.now()
+    candidates: Dict[str, Dict] = {}
+    for entry in entries:
+        published = parse_datetime(entry['publishedAt'] or '')
+        if published and published < now - FEED_ENTRY_MAX_AGE:
+            continue
+        if not published:
+            entry['publishedAt'] = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+        candidates.setdefault(canonicalize_url(entry['url']), entry)
+    if not candidates:
+        return 0
+
+    articles = upsert_articles(candidates, {}, existing_articles(candidates))
+    by_url = {article.canonical_url: article for article in articles}
+    FeedMatch.objects.bulk_create(
+        [
+            FeedMatch(query=term, article=by_url[url])
+            for url, entry in candidates.items() if url in by_url
+            for term in index.match(f"{entry['title']} {entry['description']}")
+        ],
+        ignore_conflicts=True,
+    )
+    return len(articles)
+
+class _LimitedReader:
+    """File-like wrapper that stops reading after `limit` bytes."""
+
+    def __init__(self, raw, limit: int) -> None:
+        self.raw = raw
+        self.remaining = limit
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.raw.read(size)
+        self.remaining -= len(data)
+        return data
@@ -0,0 +1,111 @@
+"""Streaming parser for RSS 2.0 and Atom news feeds."""
+
+import io
+import re
+from datetime import timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Dict, Iterator, List
+from django.utils.dateparse import parse_datetime
+from lxml import etree
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Elements whose end is reported by the parser: entries, and the feed title.
+ENTRY_TAGS = ('item', f'{ATOM_NS}entry')
+TITLE_TAGS = ('title', f'{ATOM_NS}title')
+FEED_TAGS = ('channel', f'{ATOM_NS}feed')
+
+def iter_feed(stream: BinaryIO) -> Iterator[Dict]:
+    """
+    Parse the entries of an RSS 2.0 or Atom feed incrementally.
+
+    Each entry is cleared from the tree once it has been converted, so
+    memory use is bounded by the size of one entry rather than the feed.
+
+    Args:
+        stream: File-like object returning the feed document.
+
+    Yields:
+        Article dictionaries with title, url, publishedAt, source and
+        description, in feed order. Entries without a link are skipped.
+    """
+    source = ''
+    parser = etree.iterparse(
+        stream, events=('end',), tag=ENTRY_TAGS + TITLE_TAGS,
+        resolve_entities=False, no_network=True, recover=True,
+    )
+    for _, element in parser:
+        if element.tag in TITLE_TAGS:
+            parent = element.getparent()
+            if parent is not None and parent.tag in FEED_TAGS:
+                source = _text(element)
+            continue
+
+        article = _atom_entry(element, source) if element.tag.startswith(ATOM_NS) else _rss_item(element, source)
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+        if article['url']:
+            yield article
+
+def parse_feed(data: bytes) -> List[Dict]:
+    """
+    Parse the entries of an RSS 2.0 or Atom feed held in memory.
+
+    Args:
+        data: The feed document.
+
+    Returns:
+        The entries, as yielded by `iter_feed`.
+    """
+    return list(iter_feed(io.BytesIO(data)))
+
+def _rss_item(item, source: str) -> Dict:
+    """Convert an RSS <item> element to an article dictionary."""
+    return {
+        'title': _text(item.find('title')),
+        'url': _text(item.find('link')),
+        'publishedAt': _format_date(_rfc822_date(_text(item.find('pubDate')))),
+        'source': source,
+        'description': _strip_tags(_text(item.find('description'))),
+    }
+
+def _atom_entry(entry, source: str) -> Dict:
+    """Convert an Atom <entry> element to an article dictionary."""
+    url = ''
+    for link in entry.iter(f'{ATOM_NS}link'):
+        if link.get('rel', 'alternate') == 'alternate':
+            url = link.get('href', '')
+            break
+    published = _text(entry.find(f'{ATOM_NS}published')) or _text(entry.find(f'{ATOM_NS}updated'))
+    return {
+        'title': _text(entry.find(f'{ATOM_NS}title')),
+        'url': url,
+        'publishedAt': _format_date(parse_datetime(published) if published else None),
+        'source': source,
+        'description': _strip_tags(_text(entry.find(f'{ATOM_NS}summary')) or _text(entry.find(f'{ATOM_NS}content'))),
+    }
+
+def _text(element) -> str:
+    """Return the stripped text of an element, or '' if it is missing."""
+    return (element.text or '').strip() if element is not None else ''
+
+def _strip_tags(html: str) -> str:
+    """Remove markup from an HTML description."""
+    return ' '.join(TAG_PATTERN.sub(' ', html).split())
+
+def _rfc822_date(value: str):
+    """Parse an RSS pubDate, or return None."""
+    try:
+        return parsedate_to_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _format_date(value) -> str:
+    """Format a datetime in NewsAPI's publishedAt format, or '' if unknown."""
+    if value is None:
+        return ''
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
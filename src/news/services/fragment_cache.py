@@ -0,0 +1,46 @@
+"""Versioned cache keys for rendered per-user page fragments."""
+
+import time
+
+from django.core.cache import cache
+
+# Rendered fragments are kept this long unless their version changes first.
+FRAGMENT_CACHE_TTL = 24 * 60 * 60
+
+def digests_version(user_id: int) -> int:
+    """
+    Return the current version of a user's cached digest fragments.
+
+    The version is part of the fragment cache key, so bumping it makes every
+    previously rendered fragment for the user unreachable.
+
+    Args:
+        user_id: Primary key of the user.
+
+    A missing version (never set, or evicted by the backend) is seeded from
+    the current time rather than 1, so it can never fall back to a number
+    whose fragments are still cached.
+
+    Returns:
+        The version number.
+    """
+    key = f'digests-version:{user_id}'
+    version = cache.get(key)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+def invalidate_digests(user_id: int) -> None:
+    """
+    Invalidate a user's cached digest fragments.
+
+    Args:
+        user_id: Primary key of the user.
+    """
+    key = f'digests-version:{user_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
@@ -0,0 +1,132 @@
+"""Batched storage of search hits as Article rows."""
+
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from typing import Dict, Iterable, List, Optional
+from ..models import Article, NewsDigest
+
+# Articles are pruned this many at a time, keeping each statement short.
+PRUNE_BATCH_SIZE = 1000
+
+def existing_articles(canonical_urls: Iterable[str]) -> Dict[str, Article]:
+    """
+    Load the stored articles for a set of canonical URLs in one query.
+
+    Args:
+        canonical_urls: Canonical article URLs (see `canonicalize_url`).
+
+    Returns:
+        Mapping of canonical URL to Article for the URLs already stored.
+    """
+    articles = Article.objects.with_content().filter(canonical_url__in=list(canonical_urls))
+    articles = articles.select_related('duplicate_of')
+    found: Dict[str, Article] = {}
+    for article in articles.order_by('pk'):
+        found.setdefault(article.canonical_url, article)
+    return found
+
+def upsert_articles(candidates: Dict[str, Dict], contents: Dict[str, Optional[str]],
+                    existing: Optional[Dict[str, Article]] = None) -> List[Article]:
+    """
+    Insert new articles and fill in missing content, in a constant number of queries.
+
+    New rows are written with a single `bulk_create` that upserts on `url`,
+    so a concurrent worker inserting the same article does not cause an
+    integrity error. Stored articles without content get it in a single
+    `bulk_update`.
+
+    Args:
+        candidates: Mapping of canonical URL to search hit (url, title,
+            publishedAt, source).
+        contents: Mapping of canonical URL to scraped content.
+        existing: Result of `existing_articles` for the candidate URLs, if
+            the caller already has it.
+
+    Returns:
+        One Article per candidate, in candidate order.
+    """
+    if existing is None:
+        existing = existing_articles(candidates)
+
+    new_articles = [
+        Article(
+            url=data['url'],
+            canonical_url=canonical_url,
+            title=(data.get('title') or '')[:500],
+            published_at=parse_datetime(data.get('publishedAt') or ''),
+            source=(data.get('source') or '')[:255],
+            content=contents.get(canonical_url) or '',
+        )
+        for canonical_url, data in candidates.items()
+        if canonical_url not in existing
+    ]
+    if new_articles:
+        created = Article.objects.bulk_create(
+            new_articles,
+            update_conflicts=True,
+            unique_fields=['url'],
+            update_fields=['title', 'source', 'published_at'],
+        )
+        existing.update({article.canonical_url: article for article in created})
+
+    missing_content = []
+    for url, article in existing.items():
+        if article.pk and not article.content and contents.get(url):
+            article.content = contents[url]
+            missing_content.append(article)
+    if missing_content:
+        Article.objects.bulk_update(missing_content, ['content'])
+
+    return [existing[url] for url in candidates if url in existing]
+
+def link_articles(digest: NewsDigest, articles: Iterable[Article]) -> None:
+    """
+    Attach articles to a newly created digest with a single insert.
+
+    Args:
+        digest: The digest.
+        articles: Saved articles to attach.
+    """
+    through = NewsDigest.articles.through
+    through.objects.bulk_create(
+        [through(newsdigest_id=digest.pk, article_id=article.pk) for article in articles],
+        ignore_conflicts=True,
+    )
+
+def prune_old_articles(max_age_days: Optional[int] = None) -> Dict[str, int]:
+    """
+    Drop the text of old articles, and old articles no digest lists.
+
+    Titles, URLs and fingerprints of articles listed in digests are kept,
+    so digest pages and near-duplicate detection keep working.
+
+    Args:
+        max_age_days: Retention in days, counted from when the article was
+            fetched; defaults to `settings.ARTICLE_RETENTION_DAYS`.
+
+    Returns:
+        Number of articles 'deleted' and of articles whose text was
+        'cleared'.
+    """
+    days = max_age_days if max_age_days is not None else settings.ARTICLE_RETENTION_DAYS
+    old = Article.objects.filter(fetched_at__lt=timezone.now() - timedelta(days=days))
+
+    deleted = 0
+    unlisted = old.filter(digests__isnull=True).values_list('pk', flat=True)
+    while True:
+        batch = list(unlisted[:PRUNE_BATCH_SIZE])
+        if not batch:
+            break
+        _, per_model = Article.objects.filter(pk__in=batch).delete()
+        deleted += per_model.get(Article._meta.label, 0)
+
+    cleared = 0
+    with_content = old.exclude(content='').values_list('pk', flat=True)
+    while True:
+        batch = list(with_content[:PRUNE_BATCH_SIZE])
+        if not batch:
+            break
+        cleared += Article.objects.filter(pk__in=batch).update(content='')
+    return {'deleted': deleted, 'cleared': cleared}
@@ -0,0 +1,188 @@
+"""LLM provider clients with rate limiting, retries and timeouts."""
+
+import os
+import random
+import re
+import threading
+import time
+from django.conf import settings
+from typing import Dict, Optional, Type
+from .rate_limit import TokenBucket
+from .tokens import count_tokens
+
+# HTTP status codes worth retrying: rate limited, server errors, overloaded.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504, 529}
+
+class LLMProvider:
+    """
+    Base class for a completion provider.
+
+    Subclasses implement `_call`; `complete` wraps it with per-provider
+    request and token rate limits and exponential-backoff retries.
+    """
+
+    name = ''
+    default_model = ''
+    api_key_env = ''
+
+    def __init__(self, api_key: str = '', model: Optional[str] = None) -> None:
+        self.api_key = api_key
+        self.model = model or self.default_model
+        self.timeout = settings.LLM_REQUEST_TIMEOUT
+        self.max_retries = settings.LLM_MAX_RETRIES
+        limits = settings.LLM_RATE_LIMITS.get(self.name, {})
+        self.request_bucket = TokenBucket(limits['rpm']) if limits.get('rpm') else None
+        self.token_bucket = TokenBucket(limits['tpm']) if limits.get('tpm') else None
+
+    def complete(self, prompt: str, max_tokens: int) -> str:
+        """
+        Generate a completion, retrying transient failures.
+
+        Args:
+            prompt: The prompt text.
+            max_tokens: Output token limit.
+
+        Returns:
+            The response text.
+
+        Raises:
+            Exception: The provider's error once retries are exhausted, or
+                immediately for non-retryable errors.
+        """
+        attempt = 0
+        while True:
+            if self.request_bucket:
+                self.request_bucket.acquire()
+            if self.token_bucket:
+                self.token_bucket.acquire(count_tokens(prompt) + max_tokens)
+            try:
+                return self._call(prompt, max_tokens)
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+            delay = settings.LLM_RETRY_BASE_DELAY * 2 ** attempt
+            time.sleep(delay + random.uniform(0, delay))
+            attempt += 1
+
+    def _call(self, prompt: str, max_tokens: int) -> str:
+        """Make a single request to the provider."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Return True for rate limits, server errors, timeouts and dropped connections."""
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS_CODES
+        return bool(re.search(r'Timeout|Connection|Unavailable|ResourceExhausted', type(error).__name__))
+
+class OpenAIProvider(LLMProvider):
+    name = 'openai'
+    default_model = 'gpt-3.5-turbo'
+    api_key_env = 'OPENAI_API_KEY'
+
+    def __init__(self, api_key: str = '', model: Optional[str] = None) -> None:
+        from openai import OpenAI
+        super().__init__(api_key, model)
+        # Retries are handled in complete(), so the SDK's own are disabled.
+        self.client = OpenAI(api_key=api_key, timeout=self.timeout, max_retries=0)
+
+    def _call(self, prompt: str, max_tokens: int) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+class AnthropicProvider(LLMProvider):
+    name = 'anthropic'
+    default_model = 'claude-3-haiku-20240307'
+    api_key_env = 'ANTHROPIC_API_KEY'
+
+    def __init__(self, api_key: str = '', model: Optional[str] = None) -> None:
+        from anthropic import Anthropic
+        super().__init__(api_key, model)
+        self.client = Anthropic(api_key=api_key, timeout=self.timeout, max_retries=0)
+
+    def _call(self, prompt: str, max_tokens: int) -> str:
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[{'role': 'user', 'content': prompt}]
+        )
+        return response.content[0].text
+
+class GoogleProvider(LLMProvider):
+    name = 'google'
+    default_model = 'gemini-1.5-flash'
+    api_key_env = 'GOOGLE_API_KEY'
+
+    def __init__(self, api_key: str = '', model: Optional[str] = None) -> None:
+        from google.generativeai import GenerativeModel, configure as configure_gemini
+        super().__init__(api_key, model)
+        configure_gemini(api_key=api_key)
+        self.client = GenerativeModel(self.model)
+
+    def _call(self, prompt: str, max_tokens: int) -> str:
+        response = self.client.generate_content(
+            prompt,
+            generation_config={'max_output_tokens': max_tokens},
+            request_options={'timeout': self.timeout},
+        )
+        return response.text
+
+class FakeProvider(LLMProvider):
+    """
+    Offline provider for development and load testing.
+
+    Sleeps for `LLM_FAKE_LATENCY` seconds and returns the first words of the
+    prompt's last paragraph, so no network access or API key is needed.
+    """
+
+    name = 'fake'
+    default_model = 'fake-1'
+
+    def __init__(self, api_key: str = '', model: Optional[str] = None) -> None:
+        super().__init__(api_key, model)
+        self.latency = settings.LLM_FAKE_LATENCY
+
+    def _call(self, prompt: str, max_tokens: int) -> str:
+        time.sleep(self.latency)
+        words = prompt.strip().split('\n\n')[-1].split()
+        return 'Summary: ' + ' '.join(words[:min(max_tokens, 40)])
+
+PROVIDERS: Dict[str, Type[LLMProvider]] = {
+    provider.name: provider
+    for provider in (OpenAIProvider, AnthropicProvider, GoogleProvider, FakeProvider)
+}
+
+# Providers are created once per worker process and shared by all threads,
+# so HTTP connection pools and rate limit buckets are reused across calls.
+_instances: Dict[str, Optional[LLMProvider]] = {}
+_instances_lock = threading.Lock()
+
+def get_provider(name: str) -> Optional[LLMProvider]:
+    """
+    Return the shared provider instance for `name`.
+
+    Args:
+        name: Provider name ('openai', 'anthropic', 'google' or 'fake').
+
+    Returns:
+        The provider, or None if its API key is not configured.
+
+    Raises:
+        ValueError: If the provider name is unknown.
+    """
+    if name not in PROVIDERS:
+        raise ValueError(f"Unsupported provider: {name}")
+    with _instances_lock:
+        if name not in _instances:
+            provider_class = PROVIDERS[name]
+            api_key = os.getenv(provider_class.api_key_env, '') if provider_class.api_key_env else ''
+            if provider_class.api_key_env and not api_key:
+                _instances[name] = None
+            else:
+                _instances[name] = provider_class(api_key=api_key)
+        return _instances[name]
@@ -1,41 +1,46 @@
 """LLM service for summarizing news articles."""
 
-import os
-from typing import List, Optional
-from openai import OpenAI
-from anthropic import Anthropic
-from google.generativeai import GenerativeModel, configure as configure_gemini
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+from django.conf import settings
+from . import metrics
+from .llm_providers import LLMProvider, PROVIDERS, get_provider
+from .tokens import count_tokens, pack_into_groups, truncate_to_tokens
+
+# Shared by all LLMService instances in a process to run hedged requests.
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-hedge')
+
+# Bump whenever the per-article prompt changes, so cached per-article
+# summaries produced by the old prompt are no longer reused.
+ARTICLE_PROMPT_VERSION = 1
+
+# Output token limits for the final digest and for per-article summaries.
+DIGEST_MAX_TOKENS = 500
+ARTICLE_SUMMARY_MAX_TOKENS = 150
 
 class LLMService:
     """Service for generating summaries using various LLM providers."""
 
     def __init__(self, provider: str = 'openai') -> None:
         self.provider = provider
-        self.client = None
-        self._initialize_client()
-
-    def _initialize_client(self) -> None:
-        """Initialize the LLM client based on provider."""
-        if self.provider == 'openai':
-            api_key = os.getenv('OPENAI_API_KEY')
-            if api_key:
-                self.client = OpenAI(api_key=api_key)
-        elif self.provider == 'anthropic':
-            api_key = os.getenv('ANTHROPIC_API_KEY')
-            if api_key:
-                self.client = Anthropic(api_key=api_key)
-        elif self.provider == 'google':
-            api_key = os.getenv('GOOGLE_API_KEY')
-            if api_key:
-                configure_gemini(api_key=api_key)
-                self.client = GenerativeModel('gemini-1.5-flash')
-        else:
-            raise ValueError(f"Unsupported provider: {self.provider}")
+        self.client = get_provider(provider)
+        self.model = self.client.model if self.client else PROVIDERS[provider].default_model
+        fallback = settings.LLM_FALLBACK_PROVIDER
+        self.fallback = get_provider(fallback) if fallback and fallback != provider else None
+        self.hedge_after = settings.LLM_HEDGE_AFTER
+        self.max_prompt_tokens = settings.LLM_MAX_PROMPT_TOKENS
+        self.article_token_budget = settings.LLM_ARTICLE_TOKEN_BUDGET
+        self.map_workers = settings.LLM_MAP_WORKERS
 
     def summarize_articles(self, articles: List[str], query: str) -> Optional[str]:
         """
         Summarize a list of article contents into a digest.
 
+        Each article is truncated to `article_token_budget`. If the articles
+        then fit in `max_prompt_tokens` they are summarized in one call;
+        otherwise each article is summarized separately in parallel ("map")
+        and the partial summaries are combined in a final call ("reduce").
+
         Args:
             articles: List of article text contents.
             query: The search query/topic.
@@ -46,8 +51,114 @@ class LLMService:
         if not self.client:
             return None
 
+        articles = [self.prepare_article(a) for a in articles if a.strip()]
+        if not articles:
+            return None
+
+        if sum(count_tokens(a) for a in articles) <= self._digest_budget(query):
+            return self._complete(self._digest_prompt(articles, query), DIGEST_MAX_TOKENS)
+
+        summaries = [summary for summary in self.summarize_each(articles) if summary]
+        return self.combine_summaries(summaries, query)
+
+    def prepare_article(self, article: str) -> str:
+        """
+        Trim an article to the per-article token budget.
+
+        Args:
+            article: Article text content.
+
+        Returns:
+            The text that is actually sent to the provider.
+        """
+        return truncate_to_tokens(article.strip(), self.article_token_budget)
+
+    def summarize_each(self, articles: List[str]) -> List[Optional[str]]:
+        """
+        Summarize articles individually and concurrently.
+
+        The prompt does not depend on the user's query, so results can be
+        shared between every digest that includes the same article.
+
+        Args:
+            articles: Article texts, already passed through `prepare_article`.
+
+        Returns:
+            One summary per article, in order; None where the call failed.
+        """
+        return [summary for summary, _ in self.summarize_each_with_providers(articles)]
+
+    def summarize_each_with_providers(self, articles: List[str]) -> List[Tuple[Optional[str], Optional[LLMProvider]]]:
+        """
+        Summarize articles like `summarize_each`, also telling which provider answered.
+
+        Args:
+            articles: Article texts, already passed through `prepare_article`.
+
+        Returns:
+            One (summary, provider) pair per article, in order; (None, None)
+            where the call failed.
+        """
+        if not self.client:
+            return [(None, None)] * len(articles)
+        prompts = [self._article_prompt(a) for a in articles]
+        with ThreadPoolExecutor(max_workers=self.map_workers) as executor:
+            return list(executor.map(lambda prompt: self._answer(prompt, ARTICLE_SUMMARY_MAX_TOKENS), prompts))
+
+    def combine_summaries(self, summaries: List[str], query: str) -> Optional[str]:
+        """
+        Combine per-article summaries into a digest.
+
+        Summaries that do not fit in one prompt are first collapsed in groups.
+
+        Args:
+            summaries: Per-article summaries.
+            query: The search query/topic.
+
+        Returns:
+            Summarized digest text, or None if summarization fails.
+        """
+        if not self.client or not summaries:
+            return None
+
+        budget = self._digest_budget(query)
+        while len(summaries) > 1 and sum(count_tokens(s) for s in summaries) > budget:
+            groups = pack_into_groups(summaries, budget)
+            if len(groups) == len(summaries):
+                summaries = [truncate_to_tokens(s, budget // len(summaries)) for s in summaries]
+                break
+            summaries = [
+                summary for summary in self._map(
+                    [self._digest_prompt(group, query) for group in groups], DIGEST_MAX_TOKENS
+                ) if summary
+            ]
+        if not summaries:
+            return None
+        return self._complete(self._digest_prompt(summaries, query), DIGEST_MAX_TOKENS)
+
+    def _map(self, prompts: List[str], max_tokens: int) -> List[Optional[str]]:
+        """
+        Run several prompts concurrently.
+
+        Args:
+            prompts: The prompts to run.
+            max_tokens: Output token limit for each call.
+
+        Returns:
+            One response per prompt, in order; None where the call failed.
+        """
+        with ThreadPoolExecutor(max_workers=self.map_workers) as executor:
+            return list(executor.map(lambda prompt: self._complete(prompt, max_tokens), prompts))
+
+    def _digest_budget(self, query: str) -> int:
+        """Return the tokens left for article text in a digest prompt."""
+        return self.max_prompt_tokens - count_tokens(self._digest_prompt([], query))
+
+    @staticmethod
+    def _digest_prompt(articles: List[str], query: str) -> str:
+        """Build the prompt that turns article texts or summaries into a digest."""
         combined_text = '\n\n'.join(articles)
-        prompt = f"""
+        return f"""
         Summarize the following news articles about "{query}" into a concise, easy-to-read digest.
         Focus on key facts, trends, and insights. Keep it under 500 words.
 
@@ -55,26 +166,82 @@ class LLMService:
         {combined_text}
         """
 
+    @staticmethod
+    def _article_prompt(article: str) -> str:
+        """Build the prompt that summarizes a single article."""
+        return f"""
+        Summarize the following news article in a few sentences.
+        Keep only key facts, figures, and names.
+
+        Article:
+        {article}
+        """
+
+    def _complete(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """
+        Send a single prompt to the configured provider.
+
+        Args:
+            prompt: The prompt text.
+            max_tokens: Output token limit.
+
+        Returns:
+            The response text, or None if the call fails.
+        """
+        return self._answer(prompt, max_tokens)[0]
+
+    def _answer(self, prompt: str, max_tokens: int) -> Tuple[Optional[str], Optional[LLMProvider]]:
+        """
+        Send a single prompt, to the fallback provider too if needed.
+
+        If `LLM_HEDGE_AFTER` is set and the primary provider has not answered
+        within that many seconds, the same prompt is also sent to the fallback
+        provider and whichever answers first wins. Without hedging, the
+        fallback is only tried once the primary has failed.
+
+        Args:
+            prompt: The prompt text.
+            max_tokens: Output token limit.
+
+        Returns:
+            The response text and the provider that gave it, or (None, None)
+            if the call fails.
+        """
+        providers = [self.client] + ([self.fallback] if self.fallback else [])
+        if len(providers) == 1 or not self.hedge_after:
+            for provider in providers:
+                response = self._call(provider, prompt, max_tokens)
+                if response:
+                    return response, provider
+            return None, None
+
+        primary = _hedge_executor.submit(self._call, self.client, prompt, max_tokens)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done and primary.result():
+            return primary.result(), self.client
+
+        fallback = _hedge_executor.submit(self._call, self.fallback, prompt, max_tokens)
+        sources = {fallback: self.fallback, primary: self.client}
+        pending = {fallback} if done else {fallback, primary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result():
+                    return future.result(), sources[future]
+        return None, None
+
+    @staticmethod
+    def _call(provider: LLMProvider, prompt: str, max_tokens: int) -> Optional[str]:
+        """Call one provider, returning None instead of raising."""
         try:
-            if self.provider == 'openai':
-                response = self.client.chat.completions.create(
-                    model='gpt-3.5-turbo',
-                    messages=[{'role': 'user', 'content': prompt}],
-                    max_tokens=500
-                )
-                return response.choices[0].message.content
-            elif self.provider == 'anthropic':
-                response = self.client.messages.create(
-                    model='claude-3-haiku-20240307',
-                    max_tokens=500,
-                    messages=[{'role': 'user', 'content': prompt}]
-                )
-                return response.content[0].text
-            elif self.provider == 'google':
-                response = self.client.generate_content(prompt)
-                return response.text
+            with metrics.timer('news_llm_seconds', provider=provider.name):
+                response = provider.complete(prompt, max_tokens)
         except Exception as e:
-            print(f"LLM error: {e}")
+            print(f"LLM error ({provider.name}): {e}")
+            metrics.increment('news_llm_failures_total', provider=provider.name)
             return None
-
-        return None
\ No newline at end of file
+        if settings.METRICS_ENABLED:
+            metrics.increment('news_llm_tokens_total', count_tokens(prompt), provider=provider.name, direction='in')
+            metrics.increment('news_llm_tokens_total', count_tokens(response or ''), provider=provider.name,
+                              direction='out')
+        return response
@@ -0,0 +1,170 @@
+"""Full-text search over stored articles, without external search calls."""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection
+from django.db.models import Q
+from typing import Dict, List
+from ..fields import decompress_text
+from ..models import Article
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# SQL function decompressing Article.content, registered on every SQLite
+# connection (see `register_functions`).
+SQLITE_DECOMPRESS_FUNCTION = 'news_decompress'
+
+# SQLite: an FTS5 index over news_article that stores no text of its own
+# ("contentless") and is kept in sync by triggers, which hand it the
+# decompressed content.
+SQLITE_INDEX_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS news_article_fts USING fts5(
+        title, content, content='', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS news_article_fts_insert AFTER INSERT ON news_article BEGIN
+        INSERT INTO news_article_fts(rowid, title, content)
+        VALUES (new.id, new.title, {SQLITE_DECOMPRESS_FUNCTION}(new.content));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS news_article_fts_delete AFTER DELETE ON news_article BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, {SQLITE_DECOMPRESS_FUNCTION}(old.content));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS news_article_fts_update AFTER UPDATE OF title, content ON news_article BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, {SQLITE_DECOMPRESS_FUNCTION}(old.content));
+        INSERT INTO news_article_fts(rowid, title, content)
+        VALUES (new.id, new.title, {SQLITE_DECOMPRESS_FUNCTION}(new.content));
+    END""",
+]
+
+SQLITE_REBUILD_SQL = [
+    "INSERT INTO news_article_fts(news_article_fts) VALUES ('delete-all')",
+    f"""INSERT INTO news_article_fts(rowid, title, content)
+        SELECT id, title, {SQLITE_DECOMPRESS_FUNCTION}(content) FROM news_article""",
+]
+
+# PostgreSQL: a generated tsvector column, maintained by the database on
+# every write, with a GIN index. Title matches weigh more than content ones.
+POSTGRES_INDEX_SQL = [
+    """ALTER TABLE news_article ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS news_article_search_idx ON news_article USING GIN (search_vector)",
+]
+
+def register_functions(using_connection) -> None:
+    """
+    Register the SQL functions the SQLite index triggers call.
+
+    Runs for every new database connection, as SQLite functions are
+    per-connection.
+
+    Args:
+        using_connection: A newly opened database connection.
+    """
+    if using_connection.vendor == 'sqlite':
+        using_connection.connection.create_function(
+            SQLITE_DECOMPRESS_FUNCTION, 1, decompress_text, deterministic=True
+        )
+
+def install_index(using_connection=None, rebuild: bool = False) -> None:
+    """
+    Create the full-text index and its maintenance triggers if missing.
+
+    Safe to run repeatedly. It runs after every `migrate`, because SQLite
+    table rebuilds performed by later migrations drop the triggers.
+
+    Args:
+        using_connection: Database connection; defaults to the default one.
+        rebuild: Re-index every stored article (SQLite only; the Postgres
+            column is always computed from the current row).
+    """
+    using_connection = using_connection or connection
+    if using_connection.vendor == 'sqlite':
+        statements = SQLITE_INDEX_SQL + (SQLITE_REBUILD_SQL if rebuild else [])
+    elif using_connection.vendor == 'postgresql':
+        statements = POSTGRES_INDEX_SQL
+    else:
+        return
+    with using_connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+def remove_index(using_connection=None) -> None:
+    """Drop the full-text index created by `install_index`."""
+    using_connection = using_connection or connection
+    if using_connection.vendor == 'sqlite':
+        statements = [
+            'DROP TRIGGER IF EXISTS news_article_fts_insert',
+            'DROP TRIGGER IF EXISTS news_article_fts_delete',
+            'DROP TRIGGER IF EXISTS news_article_fts_update',
+            'DROP TABLE IF EXISTS news_article_fts',
+        ]
+    elif using_connection.vendor == 'postgresql':
+        statements = [
+            'DROP INDEX IF EXISTS news_article_search_idx',
+            'ALTER TABLE news_article DROP COLUMN IF EXISTS search_vector',
+        ]
+    else:
+        return
+    with using_connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+def search_local(term: str, since: datetime, limit: int = 20) -> List[Dict]:
+    """
+    Find stored articles about a term, best matches first.
+
+    Near-duplicate copies (see `mark_near_duplicates`) are left out.
+
+    Args:
+        term: Search term; every word must occur in the title or content
+            (only the title on databases other than SQLite and PostgreSQL).
+        since: Earliest publication time.
+        limit: Maximum number of articles.
+
+    Returns:
+        Article dictionaries with title, url, publishedAt and source, as
+        returned by `NewsSearchService.search_articles`.
+    """
+    words = WORD_PATTERN.findall(term.casefold())
+    if not words:
+        return []
+
+    since_value = connection.ops.adapt_datetimefield_value(since)
+    if connection.vendor == 'sqlite':
+        ids = _query_ids("""
+            SELECT a.id FROM news_article_fts f JOIN news_article a ON a.id = f.rowid
+            WHERE news_article_fts MATCH %s AND a.published_at >= %s AND a.duplicate_of_id IS NULL
+            ORDER BY bm25(news_article_fts, 5.0, 1.0) LIMIT %s
+        """, [' '.join(f'"{word}"' for word in words), since_value, limit])
+    elif connection.vendor == 'postgresql':
+        ids = _query_ids("""
+            SELECT id FROM news_article
+            WHERE search_vector @@ plainto_tsquery('english', %s) AND published_at >= %s AND duplicate_of_id IS NULL
+            ORDER BY ts_rank(search_vector, plainto_tsquery('english', %s)) DESC LIMIT %s
+        """, [' '.join(words), since_value, ' '.join(words), limit])
+    else:
+        # Content is stored compressed, so only titles can be matched here.
+        condition = Q(published_at__gte=since, duplicate_of__isnull=True)
+        for word in words:
+            condition &= Q(title__icontains=word)
+        ids = list(Article.objects.filter(condition).order_by('-published_at').values_list('pk', flat=True)[:limit])
+
+    articles = Article.objects.only('title', 'url', 'published_at', 'source').in_bulk(ids)
+    return [
+        {
+            'title': article.title,
+            'url': article.url,
+            'publishedAt': article.published_at.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'source': article.source,
+        }
+        for article in (articles[pk] for pk in ids if pk in articles)
+    ]
+
+def _query_ids(sql: str, params: List) -> List[int]:
+    """Run a raw query returning article ids in its first column."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,197 @@
+"""Pipeline metrics shared by all processes through the Django cache, in Prometheus format."""
+
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from typing import Dict, Iterator, List
+
+# Metric name -> (Prometheus type, help text). Summaries are stored as a
+# count and a sum of microseconds, so every value can use the cache's
+# atomic integer increment.
+METRICS = {
+    'news_stage_seconds': ('summary', 'Time spent in each digest pipeline stage'),
+    'news_stage_queries_total': ('counter', 'Database queries run in each digest pipeline stage'),
+    'news_search_seconds': ('summary', 'Search latency per provider'),
+    'news_search_failures_total': ('counter', 'Failed or timed out searches per provider'),
+    'news_scrape_seconds': ('summary', 'Article download and extraction latency per host'),
+    'news_scrape_bytes_total': ('counter', 'Bytes downloaded per host'),
+    'news_scrape_failures_total': ('counter', 'Failed article scrapes per host'),
+    'news_llm_seconds': ('summary', 'LLM request latency per provider'),
+    'news_llm_tokens_total': ('counter', 'Estimated LLM tokens per provider and direction'),
+    'news_llm_failures_total': ('counter', 'Failed LLM requests per provider'),
+    'news_email_seconds': ('summary', 'Time to send one digest email'),
+    'news_emails_total': ('counter', 'Digest emails per outcome'),
+}
+
+SERIES_KEY = 'metrics:series'
+VALUE_KEY_PREFIX = 'metrics:value:'
+MICROSECONDS = 1000000
+
+# Stage timings of the task running in this thread, see `collect`.
+_collected = threading.local()
+
+def increment(name: str, amount: int = 1, **labels: str) -> None:
+    """
+    Add to a counter.
+
+    Args:
+        name: Metric name from METRICS.
+        amount: Amount to add.
+        **labels: Label values, e.g. host='example.com'.
+    """
+    if not settings.METRICS_ENABLED or not amount:
+        return
+    _add(name, _series(name, labels), int(amount))
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    """
+    Record one duration in a summary.
+
+    Args:
+        name: Metric name from METRICS.
+        seconds: The duration.
+        **labels: Label values.
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    _add(name, _series(f'{name}_count', labels), 1)
+    _add(name, _series(f'{name}_sum', labels), int(seconds * MICROSECONDS))
+
+@contextmanager
+def timer(name: str, **labels: str) -> Iterator[None]:
+    """Record the duration of the enclosed block in a summary."""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Record the duration and database query count of a pipeline stage.
+
+    The figures are also added to the stages being collected for the
+    current task, if any (see `collect`).
+
+    Args:
+        name: Stage name, e.g. 'search' or 'summarize'.
+    """
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_queries):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('news_stage_seconds', elapsed, stage=name)
+        increment('news_stage_queries_total', queries, stage=name)
+        stages = getattr(_collected, 'stages', None)
+        if stages is not None:
+            stages[name] = {'seconds': round(elapsed, 4), 'queries': queries}
+
+@contextmanager
+def collect() -> Iterator[Dict[str, Dict]]:
+    """
+    Collect the stages run by the enclosed block, e.g. for a task event.
+
+    Yields:
+        Mapping of stage name to its 'seconds' and 'queries', filled in as
+        stages finish. It stays empty while metrics are disabled.
+    """
+    stages: Dict[str, Dict] = {}
+    _collected.stages = stages
+    try:
+        yield stages
+    finally:
+        _collected.stages = None
+
+def render() -> str:
+    """
+    Render every recorded metric in the Prometheus text exposition format.
+
+    Returns:
+        The metrics document, including the per-article summary cache
+        counters.
+    """
+    from .summary_cache import ArticleSummaryCache
+
+    series = cache.get(SERIES_KEY) or []
+    values = cache.get_many([VALUE_KEY_PREFIX + line for _, line in series])
+    lines: List[str] = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for metric, line in sorted(series):
+            value = values.get(VALUE_KEY_PREFIX + line)
+            if metric != name or value is None:
+                continue
+            if line.split('{')[0].endswith('_sum'):
+                value = value / MICROSECONDS
+            lines.append(f'{line} {value}')
+
+    stats = ArticleSummaryCache.stats()
+    lines += [
+        '# HELP news_article_summary_cache_lookups_total Per-article summary lookups by result',
+        '# TYPE news_article_summary_cache_lookups_total counter',
+        f'news_article_summary_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+        f'news_article_summary_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+        '# HELP news_article_summary_cache_hit_ratio Share of per-article summaries served from the cache',
+        '# TYPE news_article_summary_cache_hit_ratio gauge',
+        f'news_article_summary_cache_hit_ratio {stats["hit_rate"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+def _series(name: str, labels: Dict[str, str]) -> str:
+    """Format a series as it appears in the exposition format, e.g. 'x_total{host="a"}'."""
+    if not labels:
+        return name
+    pairs = ','.join(f'{key}="{_escape(str(value))}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{pairs}}}'
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _add(metric: str, line: str, amount: int) -> None:
+    """Atomically add to a series, registering it the first time it is seen."""
+    key = VALUE_KEY_PREFIX + line
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if cache.add(key, amount, timeout=None):
+            _register(metric, line)
+        else:
+            cache.incr(key, amount)
+
+def _register(metric: str, line: str, attempts: int = 3) -> None:
+    """
+    Add a series to the shared list of series to export.
+
+    The cache has no atomic list append, so the write is read back and
+    retried if a concurrent registration overwrote it.
+    """
+    entry = [metric, line]
+    for _ in range(attempts):
+        series = cache.get(SERIES_KEY) or []
+        if entry in series:
+            return
+        cache.set(SERIES_KEY, series + [entry], timeout=None)
+        if entry in (cache.get(SERIES_KEY) or []):
+            return
@@ -0,0 +1,209 @@
+"""News search providers: NewsAPI, RSS/Atom feeds and local fixtures."""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from typing import Dict, List, Optional, Set, Tuple, Type
+from ..models import Article
+
+# NewsAPI's maximum page size.
+NEWSAPI_PAGE_SIZE = 100
+
+class NewsProvider:
+    """
+    Base class for a source of news search results.
+
+    Subclasses implement `search`, which may raise; the search service runs
+    providers concurrently and treats an error or timeout as no results.
+    """
+
+    name = ''
+
+    def __init__(self) -> None:
+        self.timeout = settings.NEWS_PROVIDER_TIMEOUTS.get(self.name, 10)
+
+    @property
+    def configured(self) -> bool:
+        """Return True if the provider has what it needs to run."""
+        return True
+
+    def search(self, query: str, since: datetime, seen_urls: Set[str]) -> Tuple[List[Dict], bool]:
+        """
+        Find articles about a query.
+
+        Args:
+            query: Normalized search term.
+            since: Earliest publication time.
+            seen_urls: URLs already fetched, which need not be returned.
+
+        Returns:
+            Article dictionaries with title, url, publishedAt and source, and
+            whether the results were truncated, leaving out older articles
+            published since `since`.
+        """
+        raise NotImplementedError
+
+class NewsAPIProvider(NewsProvider):
+    """
+    Search results from NewsAPI's 'everything' endpoint.
+
+    Only configured when the NEWSAPI_KEY environment variable is set.
+    """
+
+    name = 'newsapi'
+
+    def __init__(self) -> None:
+        from newsapi import NewsApiClient
+        super().__init__()
+        self.api_key = os.getenv('NEWSAPI_KEY', '')
+        self.client = NewsApiClient(api_key=self.api_key) if self.api_key else None
+
+    @property
+    def configured(self) -> bool:
+        return self.client is not None
+
+    def search(self, query: str, since: datetime, seen_urls: Set[str]) -> Tuple[List[Dict], bool]:
+        """
+        Page through results published since `since`, to the minute.
+
+        Results come newest first, so once a page contains an already seen
+        URL the following pages hold nothing new and are not requested.
+        Results left after `SEARCH_MAX_PAGES` pages are not requested either,
+        and the search is reported as truncated.
+        """
+        from_param = since.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:00')
+        articles = []
+        for page in range(1, settings.SEARCH_MAX_PAGES + 1):
+            response = self.client.get_everything(
+                q=query,
+                language='en',
+                sort_by='publishedAt',
+                from_param=from_param,
+                page=page,
+                page_size=NEWSAPI_PAGE_SIZE,
+            )
+            items = response.get('articles', [])
+            reached_seen = False
+            for item in items:
+                if item.get('url', '') in seen_urls:
+                    reached_seen = True
+                    continue
+                articles.append({
+                    'title': item.get('title', ''),
+                    'url': item.get('url', ''),
+                    'publishedAt': item.get('publishedAt', ''),
+                    'source': item.get('source', {}).get('name', ''),
+                })
+            if reached_seen or len(items) < NEWSAPI_PAGE_SIZE or page * NEWSAPI_PAGE_SIZE >= response.get('totalResults', 0):
+                return articles, False
+        return articles, True
+
+class RSSProvider(NewsProvider):
+    """
+    Articles from registered feeds that matched the query during ingestion.
+
+    Feeds are polled and matched against every search term in the
+    background (see `feed_ingestion`), so searching is a database lookup.
+    """
+
+    name = 'rss'
+
+    def search(self, query: str, since: datetime, seen_urls: Set[str]) -> Tuple[List[Dict], bool]:
+        articles = (
+            Article.objects.filter(feed_matches__query=query, published_at__gte=since)
+            .only('title', 'url', 'published_at', 'source')
+            .order_by('-published_at')
+        )
+        return [
+            {
+                'title': article.title,
+                'url': article.url,
+                'publishedAt': article.published_at.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'source': article.source,
+            }
+            for article in articles if article.url not in seen_urls
+        ], False
+
+class FixtureProvider(NewsProvider):
+    """
+    Canned articles for development, tests and benchmarks.
+
+    Reads `NEWS_FIXTURE_FILE`, a JSON list of articles with title, path,
+    source, description and minutesAgo; URLs are `NEWS_FIXTURE_BASE_URL`
+    plus the path, and publication times are relative to now.
+    """
+
+    name = 'fixture'
+
+    def __init__(self) -> None:
+        super().__init__()
+        with open(settings.NEWS_FIXTURE_FILE) as f:
+            self.articles = json.load(f)
+        self.base_url = settings.NEWS_FIXTURE_BASE_URL.rstrip('/')
+
+    def search(self, query: str, since: datetime, seen_urls: Set[str]) -> Tuple[List[Dict], bool]:
+        now = timezone.now()
+        results = []
+        for article in self.articles:
+            entry = {
+                'title': article['title'],
+                'url': self.base_url + article['path'],
+                'publishedAt': (now - timedelta(minutes=article['minutesAgo'])).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'source': article['source'],
+                'description': article['description'],
+            }
+            if entry['url'] not in seen_urls and _is_recent(entry, since) and _matches(entry, query):
+                results.append(_without_description(entry))
+        return results, False
+
+def _matches(entry: Dict, query: str) -> bool:
+    """Return True if every word of the query appears in the entry's title or description."""
+    text = f"{entry['title']} {entry.get('description', '')}".casefold()
+    return all(word in text for word in query.casefold().split())
+
+def _is_recent(entry: Dict, since: datetime) -> bool:
+    """Return True if the entry was published at or after `since`, or has no date."""
+    published = parse_datetime(entry.get('publishedAt') or '')
+    return published is None or published >= since
+
+def _without_description(entry: Dict) -> Dict:
+    """Drop the description used for matching from a result."""
+    return {key: entry[key] for key in ('title', 'url', 'publishedAt', 'source')}
+
+PROVIDERS: Dict[str, Type[NewsProvider]] = {
+    provider.name: provider
+    for provider in (NewsAPIProvider, RSSProvider, FixtureProvider)
+}
+
+# Providers are created once per worker process and shared by all threads.
+_instances: Dict[str, NewsProvider] = {}
+_instances_lock = threading.Lock()
+
+def get_news_providers(names: Optional[List[str]] = None) -> List[NewsProvider]:
+    """
+    Return the shared, configured provider instances, in priority order.
+
+    Args:
+        names: Provider names; defaults to `settings.NEWS_PROVIDERS`.
+
+    Returns:
+        The providers that are configured (e.g. NewsAPI only with a key).
+
+    Raises:
+        ValueError: If a provider name is unknown.
+    """
+    providers = []
+    for name in names if names is not None else settings.NEWS_PROVIDERS:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unsupported news provider: {name}")
+        with _instances_lock:
+            if name not in _instances:
+                _instances[name] = PROVIDERS[name]()
+            provider = _instances[name]
+        if provider.configured:
+            providers.append(provider)
+    return providers
@@ -1,69 +1,195 @@
-"""News search service using NewsAPI with fallback to general web search."""
+"""News search service that queries several news providers concurrently."""
 
-import os
 import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from newsapi import NewsApiClient
-from ..models import Article
+from typing import List, Dict, Optional, Set, Tuple
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..models import Article, SearchResult, normalize_term
+from . import metrics
+from .news_providers import NewsProvider, get_news_providers
+from .url_utils import canonicalize_url
+
+# Shared by all NewsSearchService instances in a process to query providers
+# concurrently. A provider that overruns its timeout keeps its thread until
+# its own request times out, but no longer delays the search.
+_search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='news-search')
 
 class NewsSearchService:
     """Service for searching news articles."""
 
-    def __init__(self) -> None:
-        self.newsapi_key = os.getenv('NEWSAPI_KEY', '')
-        self.newsapi = NewsApiClient(api_key=self.newsapi_key) if self.newsapi_key else None
+    def __init__(self, providers: Optional[List[NewsProvider]] = None) -> None:
+        self.providers = get_news_providers() if providers is None else providers
 
-    def search_articles(self, query: str, days: int = 1) -> List[Dict]:
+    def search_articles(self, query: str, days: int = 1, since: Optional[datetime] = None,
+                        seen_urls: Optional[Set[str]] = None) -> List[Dict]:
         """
         Search for recent news articles based on query.
 
         Args:
             query: Search term for news.
             days: Number of days back to search.
+            since: Only return articles published after this time (to the
+                minute), instead of the last `days` days.
+            seen_urls: URLs already fetched; they are skipped and paging
+                stops once they are reached.
 
         Returns:
-            List of article dictionaries with title, url, publishedAt, source.
+            List of article dictionaries with title, url, publishedAt, source,
+            newest first.
         """
-        if self.newsapi:
-            try:
-                # Use NewsAPI
-                from_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-                response = self.newsapi.get_everything(
-                    q=query,
-                    language='en',
-                    sort_by='publishedAt',
-                    from_param=from_date
-                )
-                articles = []
-                for item in response.get('articles', []):
-                    articles.append({
-                        'title': item.get('title', ''),
-                        'url': item.get('url', ''),
-                        'publishedAt': item.get('publishedAt', ''),
-                        'source': item.get('source', {}).get('name', ''),
-                    })
-                return articles
-            except Exception as e:
-                print(f"NewsAPI error: {e}")
-                # Fallback to general search
+        articles, _, _ = self._search(query, since or timezone.now() - timedelta(days=days), seen_urls or set())
+        return articles
+
+    def search_articles_cached(self, query: str) -> List[Dict]:
+        """
+        Search for articles, reusing results stored for the normalized query.
+
+        Users following equivalent terms ("AI", " ai ") share a single
+        `SearchResult` row, so each distinct query is searched at most once
+        per `SEARCH_RESULT_TTL` seconds.
+
+        Once stale, the row is refreshed incrementally: only articles
+        published after its watermark (less `SEARCH_WATERMARK_OVERLAP` minutes,
+        for articles indexed late) are requested, paging stops at the first
+        page that reaches already stored URLs, and the new articles are merged
+        with the stored ones from the last day.
+
+        Args:
+            query: Search term for news.
+
+        Returns:
+            List of article dictionaries, as returned by `search_articles`.
+        """
+        normalized = normalize_term(query)
+        now = timezone.now()
+        cached = SearchResult.objects.filter(query=normalized).first()
+        if cached and cached.fetched_at >= now - timedelta(seconds=settings.SEARCH_RESULT_TTL):
+            return cached.results
+
+        window_start = now - timedelta(days=1)
+        previous = cached.results if cached else []
+        previous_watermark = cached.latest_published_at if cached else None
+        since = window_start
+        if previous_watermark:
+            overlap = timedelta(minutes=settings.SEARCH_WATERMARK_OVERLAP)
+            since = max(since, previous_watermark - overlap)
+
+        new_articles, failed, truncated = self._search(normalized, since, {a['url'] for a in previous})
+        if self.providers and len(failed) == len(self.providers):
+            # Keep the stored results and watermark; the next call retries.
+            return previous
 
-        # Fallback: Simple web search (placeholder, as full implementation requires API)
-        # For demo, return empty or mock
-        return self._fallback_search(query)
+        articles = merge_results([new_articles, [
+            a for a in previous
+            if (_published_at(a) or window_start) >= window_start
+        ]])
+        # If a provider failed, or stopped paging before reaching the old
+        # watermark, some of its articles since the watermark are still
+        # missing, so the watermark only advances after a complete search.
+        watermark = previous_watermark
+        if not failed and not truncated:
+            published = [p for p in map(_published_at, new_articles) if p]
+            watermark = max(published + ([previous_watermark] if previous_watermark else []), default=None)
+        SearchResult.objects.update_or_create(
+            query=normalized,
+            defaults={'results': articles, 'fetched_at': now, 'latest_published_at': watermark},
+        )
+        return articles
 
-    def _fallback_search(self, query: str) -> List[Dict]:
+    def _search(self, query: str, since: datetime,
+                seen_urls: Set[str]) -> Tuple[List[Dict], List[str], List[str]]:
         """
-        Fallback search using general web search.
+        Query every provider concurrently and merge their results.
 
-        Note: This is a placeholder. In production, use SerpAPI or similar.
+        Each provider gets its own timeout, counted from the start of the
+        search, so the search takes at most as long as the largest timeout.
+
+        Args:
+            query: Search term for news.
+            since: Earliest publication time.
+            seen_urls: URLs already fetched.
+
+        Returns:
+            The merged articles, the names of the providers that failed or
+            timed out, and the names of those whose results were truncated.
         """
-        # Mock response
-        return [
-            {
-                'title': f"Sample article about {query}",
-                'url': f"https://example.com/{query.replace(' ', '-')}",
-                'publishedAt': '2023-01-01T00:00:00Z',
-                'source': 'Example News',
-            }
-        ]
\ No newline at end of file
+        started = time.monotonic()
+        futures = [
+            (provider, _search_executor.submit(_run_provider, provider, query, since, seen_urls))
+            for provider in self.providers
+        ]
+        results, failed, truncated = [], [], []
+        for provider, future in futures:
+            try:
+                articles, was_truncated = future.result(timeout=max(0, started + provider.timeout - time.monotonic()))
+                results.append(articles)
+                if was_truncated:
+                    truncated.append(provider.name)
+            except FutureTimeoutError:
+                print(f"News provider timeout ({provider.name})")
+                metrics.increment('news_search_failures_total', provider=provider.name)
+                failed.append(provider.name)
+            except Exception as e:
+                print(f"News provider error ({provider.name}): {e}")
+                metrics.increment('news_search_failures_total', provider=provider.name)
+                failed.append(provider.name)
+        return merge_results(results), failed, truncated
+
+def _run_provider(provider: NewsProvider, query: str, since: datetime,
+                  seen_urls: Set[str]) -> Tuple[List[Dict], bool]:
+    """
+    Run one provider's search, recording its latency.
+
+    This runs on a `_search_executor` thread. Django opens a database
+    connection per thread and only closes those of request and task
+    threads, so the connections a provider opened here (e.g. the RSS
+    provider's query) are closed before the thread goes back to the pool.
+    """
+    try:
+        with metrics.timer('news_search_seconds', provider=provider.name):
+            return provider.search(query, since, seen_urls)
+    finally:
+        connections.close_all()
+
+def merge_results(results: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge article lists from several providers.
+
+    Articles are deduplicated by canonical URL, keeping the entry from the
+    earliest list and filling in fields it lacks from later ones. They are
+    ranked newest first (to the minute); within the same minute, articles
+    reported by more providers, then by earlier providers, come first.
+
+    Args:
+        results: Article lists, in provider priority order.
+
+    Returns:
+        The merged, ranked articles.
+    """
+    merged: Dict[str, Dict] = {}
+    ranks: Dict[str, List[int]] = {}
+    for priority, articles in enumerate(results):
+        for article in articles:
+            if not article.get('url'):
+                continue
+            key = canonicalize_url(article['url'])
+            if key not in merged:
+                merged[key] = dict(article)
+                ranks[key] = [0, -priority]
+            else:
+                for field, value in article.items():
+                    if value and not merged[key].get(field):
+                        merged[key][field] = value
+            ranks[key][0] += 1
+
+    order = sorted(merged, key=lambda key: ((merged[key].get('publishedAt') or '')[:16], *ranks[key]), reverse=True)
+    return [merged[key] for key in order]
+
+def _published_at(article: Dict) -> Optional[datetime]:
+    """Parse an article's publishedAt timestamp, or return None."""
+    return parse_datetime(article.get('publishedAt') or '')
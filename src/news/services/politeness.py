@@ -0,0 +1,243 @@
+"""Per-host request pacing and robots.txt rules for the article scraper, shared across workers."""
+
+import math
+import threading
+import time
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+# Name matched against User-agent lines in robots.txt, and the User-Agent
+# header sent with our requests, so sites can tell which rules apply to us.
+ROBOTS_AGENT = 'DailyNewsBot'
+USER_AGENT = f'Mozilla/5.0 (compatible; {ROBOTS_AGENT}/1.0)'
+ROBOTS_TIMEOUT = 5
+
+# robots.txt that could not be fetched (network or server error) is treated
+# as allowing everything, and fetched again after this many seconds.
+ROBOTS_FAILURE_TTL = 10 * 60
+
+# Longest back-off honored from a Retry-After header, in seconds.
+MAX_RETRY_AFTER = 10 * 60
+
+class RobotsCache:
+    """
+    robots.txt rules per site, cached in-process and in the shared cache.
+
+    Each site's robots.txt is fetched at most once per `ROBOTS_CACHE_TTL`
+    across all workers; within a process, concurrent lookups for the same
+    site wait for a single fetch.
+    """
+
+    def __init__(self, session: requests.Session) -> None:
+        self.session = session
+        self._parsers: Dict[str, RobotFileParser] = {}
+        self._lock = threading.Lock()
+        self._site_locks: Dict[str, threading.Lock] = {}
+
+    def allowed(self, url: str, expires_at: Optional[float] = None) -> Optional[bool]:
+        """
+        Return True if robots.txt lets us fetch `url`.
+
+        Args:
+            url: The URL about to be fetched.
+            expires_at: Monotonic time by which a robots.txt not yet cached
+                must be fetched.
+
+        Returns:
+            Whether the URL may be fetched, or None if the site's robots.txt
+            could not be fetched before `expires_at`.
+        """
+        parser = self._parser(url, expires_at)
+        return None if parser is None else parser.can_fetch(ROBOTS_AGENT, url)
+
+    def crawl_delay(self, url: str) -> float:
+        """
+        Return the delay robots.txt asks for between requests to the site.
+
+        Both Crawl-delay and Request-rate are honored, whichever is slower.
+
+        Args:
+            url: Any URL on the site.
+
+        Returns:
+            The delay in seconds, or 0 if none is set.
+        """
+        parser = self._parser(url)
+        if parser is None:
+            return 0.0
+        delay = float(parser.crawl_delay(ROBOTS_AGENT) or 0)
+        rate = parser.request_rate(ROBOTS_AGENT)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        return delay
+
+    def _parser(self, url: str, expires_at: Optional[float] = None) -> Optional[RobotFileParser]:
+        """
+        Return the parsed robots.txt of the site serving `url`.
+
+        Returns None, caching nothing, if it is not cached and could not be
+        fetched before `expires_at`.
+        """
+        parts = urlsplit(url)
+        site = f'{parts.scheme}://{parts.netloc.lower()}'
+        with self._lock:
+            parser = self._parsers.get(site)
+            if parser is not None:
+                return parser
+            site_lock = self._site_locks.setdefault(site, threading.Lock())
+
+        with site_lock:
+            with self._lock:
+                if site in self._parsers:
+                    return self._parsers[site]
+            key = f'robots:{site}'
+            rules = cache.get(key)
+            if rules is None:
+                rules, ttl = self._fetch(site, expires_at)
+                if rules is None:
+                    return None
+                cache.set(key, rules, ttl)
+            parser = RobotFileParser(f'{site}/robots.txt')
+            if rules == 'disallow':
+                parser.disallow_all = True
+            else:
+                parser.parse(rules.splitlines())
+            with self._lock:
+                self._parsers[site] = parser
+            return parser
+
+    def _fetch(self, site: str, expires_at: Optional[float] = None):
+        """
+        Download a site's robots.txt, within `ROBOTS_TIMEOUT` and by `expires_at`.
+
+        Returns:
+            The file's text, or 'disallow' if access to it is refused, and
+            how long to cache the result for. Missing or unreachable files
+            allow everything. A fetch cut short by `expires_at` says nothing
+            about the site and returns None.
+        """
+        timeout = ROBOTS_TIMEOUT
+        if expires_at is not None:
+            timeout = min(timeout, expires_at - time.monotonic())
+            if timeout <= 0:
+                return None, 0
+        try:
+            response = self.session.get(f'{site}/robots.txt', timeout=timeout)
+        except requests.Timeout as e:
+            if timeout < ROBOTS_TIMEOUT:
+                return None, 0
+            print(f"robots.txt error ({site}): {e}")
+            return '', ROBOTS_FAILURE_TTL
+        except requests.RequestException as e:
+            print(f"robots.txt error ({site}): {e}")
+            return '', ROBOTS_FAILURE_TTL
+        if response.status_code in (401, 403):
+            return 'disallow', settings.ROBOTS_CACHE_TTL
+        if response.status_code >= 500:
+            return '', ROBOTS_FAILURE_TTL
+        if response.status_code >= 400:
+            return '', settings.ROBOTS_CACHE_TTL
+        return response.text, settings.ROBOTS_CACHE_TTL
+
+class HostScheduler:
+    """
+    Paces fetches per host across every process sharing the Django cache.
+
+    Time is split into windows of the host's interval (the larger of
+    `SCRAPE_HOST_INTERVAL` and the robots.txt crawl delay, capped at
+    `SCRAPE_MAX_CRAWL_DELAY`), and each window admits one request: the
+    first caller to add the window's cache key. With Redis as the cache
+    this acts as a token bucket of one request per interval shared by all
+    Celery workers; other callers sleep until the next window.
+
+    A 429 or 503 response backs the host off for its Retry-After period.
+    """
+
+    def __init__(self, session: requests.Session, interval: Optional[float] = None,
+                 respect_robots: Optional[bool] = None) -> None:
+        """
+        Args:
+            session: HTTP session used to fetch robots.txt.
+            interval: Minimum seconds per request to a host; defaults to
+                `settings.SCRAPE_HOST_INTERVAL`.
+            respect_robots: Obey robots.txt; defaults to
+                `settings.SCRAPE_RESPECT_ROBOTS`.
+        """
+        self.interval = settings.SCRAPE_HOST_INTERVAL if interval is None else interval
+        self.respect_robots = settings.SCRAPE_RESPECT_ROBOTS if respect_robots is None else respect_robots
+        self.max_crawl_delay = settings.SCRAPE_MAX_CRAWL_DELAY
+        self.robots = RobotsCache(session)
+
+    def allowed(self, url: str, expires_at: Optional[float] = None) -> Optional[bool]:
+        """
+        Return True unless robots.txt forbids fetching `url`.
+
+        Returns None if the site's robots.txt could not be fetched before
+        `expires_at` (see `RobotsCache.allowed`).
+        """
+        return True if not self.respect_robots else self.robots.allowed(url, expires_at)
+
+    def wait_turn(self, url: str, expires_at: float) -> bool:
+        """
+        Block until a request to the host of `url` may be sent.
+
+        Args:
+            url: The URL about to be fetched.
+            expires_at: Monotonic time after which to give up waiting.
+
+        Returns:
+            True if the request may go ahead, False if its turn would come
+            after `expires_at`.
+        """
+        host = urlsplit(url).netloc.lower()
+        interval = self.interval
+        if self.respect_robots:
+            interval = max(interval, min(self.robots.crawl_delay(url), self.max_crawl_delay))
+
+        while True:
+            now = time.time()
+            wait = (cache.get(f'politeness:backoff:{host}') or 0) - now
+            if wait <= 0:
+                if interval <= 0:
+                    return True
+                window = int(now / interval)
+                if cache.add(f'politeness:{host}:{window}', True, timeout=math.ceil(interval) + 1):
+                    return True
+                wait = (window + 1) * interval - now
+            if time.monotonic() + wait > expires_at:
+                return False
+            time.sleep(wait)
+
+    def back_off(self, url: str, retry_after: Optional[str]) -> None:
+        """
+        Pause requests to the host of `url` after it reported overload.
+
+        Args:
+            url: The URL that got a 429 or 503 response.
+            retry_after: The response's Retry-After header, in seconds or
+                as an HTTP date; without one, the host is paused for one
+                `SCRAPE_MAX_CRAWL_DELAY`.
+        """
+        delay = _retry_after_seconds(retry_after)
+        if delay is None:
+            delay = self.max_crawl_delay
+        delay = min(delay, MAX_RETRY_AFTER)
+        if delay > 0:
+            host = urlsplit(url).netloc.lower()
+            cache.set(f'politeness:backoff:{host}', time.time() + delay, math.ceil(delay))
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header into seconds from now, or None."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value.strip())
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,188 @@
+"""Local relevance ranking of a digest's candidate articles before summarization."""
+
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+from typing import Dict, List, Optional, Set, Tuple
+from ..models import Article
+from .dedup import hamming_distance
+from .tokens import count_tokens
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Okapi BM25 parameters; title words count TITLE_WEIGHT times.
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3
+
+# An article's score mixes its relevance (BM25, scaled to the best
+# candidate's) and its recency, which halves every RECENCY_HALF_LIFE_HOURS.
+RELEVANCE_WEIGHT = 0.8
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_HOURS = 24
+
+# Each article already picked from the same source, or for the same search
+# term, multiplies a candidate's score by these factors, so the digest
+# covers every term and several outlets.
+SOURCE_PENALTY = 0.7
+TERM_PENALTY = 0.6
+
+# Candidates closer than this to a picked article are left out as the same
+# story: SimHash fingerprints within this many bits, or titles sharing this
+# share of their words. This is looser than the duplicate detection at
+# ingestion, which only collapses near-identical copies.
+NEAR_DUPLICATE_BITS = 8
+NEAR_DUPLICATE_TITLE_OVERLAP = 0.6
+
+def select_articles(articles: List[Article], terms: List[str], max_articles: int,
+                    token_budget: Optional[int] = None, now: Optional[datetime] = None,
+                    max_per_term: Optional[int] = None) -> List[Article]:
+    """
+    Pick the articles to summarize for a digest, best first.
+
+    Candidates are scored against each search term with BM25 over their
+    title and content, the best term counting, and boosted by recency.
+    Articles are then picked greedily: the best remaining score after the
+    source and term penalties, skipping near-duplicates of picked articles,
+    articles whose best term already has `max_per_term` picks and articles
+    whose text no longer fits the token budget.
+
+    Args:
+        articles: Candidate articles, with content loaded.
+        terms: The user's search terms.
+        max_articles: Maximum number of articles to pick.
+        token_budget: Maximum total tokens of article text sent to the LLM,
+            counting each article as its text up to
+            `LLM_ARTICLE_TOKEN_BUDGET`; defaults to
+            `settings.DIGEST_ARTICLE_TOKEN_BUDGET`.
+        now: Reference time for recency; defaults to now.
+        max_per_term: Maximum number of articles picked for the same search
+            term, or None for no limit besides `max_articles`.
+
+    Returns:
+        The picked articles, in order of selection.
+    """
+    articles = [article for article in articles if article.content]
+    if not articles or max_articles <= 0:
+        return []
+    token_budget = settings.DIGEST_ARTICLE_TOKEN_BUDGET if token_budget is None else token_budget
+    now = now or timezone.now()
+
+    documents = [
+        _frequencies(article.title, TITLE_WEIGHT) + _frequencies(article.content) for article in articles
+    ]
+    queries = [query for query in (set(_frequencies(term)) for term in terms) if query]
+    relevance, best_terms = _bm25(documents, queries)
+    top = max(relevance) or 1.0
+    scores = [
+        RELEVANCE_WEIGHT * score / top + RECENCY_WEIGHT * _recency(article, now)
+        for article, score in zip(articles, relevance)
+    ]
+    costs = [min(count_tokens(article.content), settings.LLM_ARTICLE_TOKEN_BUDGET) for article in articles]
+    titles = [set(_frequencies(article.title)) for article in articles]
+
+    picked: List[int] = []
+    per_source: Counter = Counter()
+    per_term: Counter = Counter()
+    # Penalties only lower scores, so the scan for the best candidate stops
+    # at the first unpenalized score that cannot beat the best one found.
+    remaining = sorted(range(len(articles)), key=lambda i: -scores[i])
+    while remaining and len(picked) < max_articles:
+        best, best_score = remaining[0], -1.0
+        for i in remaining:
+            if scores[i] <= best_score:
+                break
+            score = (scores[i] * SOURCE_PENALTY ** per_source[articles[i].source]
+                     * TERM_PENALTY ** per_term[best_terms[i]])
+            if score > best_score:
+                best, best_score = i, score
+        remaining.remove(best)
+        if max_per_term is not None and per_term[best_terms[best]] >= max_per_term:
+            continue
+        if costs[best] > token_budget:
+            continue
+        if any(_same_story(articles[best], titles[best], articles[i], titles[i]) for i in picked):
+            continue
+        picked.append(best)
+        token_budget -= costs[best]
+        per_source[articles[best].source] += 1
+        per_term[best_terms[best]] += 1
+    return [articles[i] for i in picked]
+
+def _frequencies(text: str, weight: int = 1) -> Counter:
+    """
+    Count the words of a text, case-folded and with plural 's' endings removed.
+
+    Args:
+        text: The text.
+        weight: Count each occurrence this many times.
+
+    Returns:
+        Mapping of word to its number of occurrences times `weight`.
+    """
+    counts: Counter = Counter()
+    # Endings are stripped once per distinct word rather than per occurrence.
+    for word, count in Counter(WORD_PATTERN.findall(text.casefold())).items():
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        counts[word] += count * weight
+    return counts
+
+def _bm25(documents: List[Counter], queries: List[Set[str]]) -> Tuple[List[float], List[int]]:
+    """
+    Score documents against queries with Okapi BM25.
+
+    Document frequencies are taken over the candidate documents
+    themselves. Only the query words are looked up in each document's word
+    counts, so scoring costs one dictionary lookup per document and query
+    word.
+
+    Args:
+        documents: Word counts of each document (see `_frequencies`).
+        queries: Words of each query.
+
+    Returns:
+        Each document's best score over the queries, and the index of the
+        query that gave it.
+    """
+    lengths = [sum(tf.values()) for tf in documents]
+    average_length = sum(lengths) / len(lengths) or 1.0
+    query_words: Set[str] = {word for query in queries for word in query}
+    document_counts = {word: sum(1 for tf in documents if word in tf) for word in query_words}
+    idf: Dict[str, float] = {
+        word: math.log(1 + (len(documents) - count + 0.5) / (count + 0.5))
+        for word, count in document_counts.items()
+    }
+
+    best_scores, best_queries = [], []
+    for tf, length in zip(documents, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores = [
+            sum(idf[word] * tf[word] * (BM25_K1 + 1) / (tf[word] + norm) for word in query if word in tf)
+            for query in queries
+        ] or [0.0]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        best_scores.append(scores[best])
+        best_queries.append(best)
+    return best_scores, best_queries
+
+def _recency(article: Article, now: datetime) -> float:
+    """Return 1 for an article published now, halving every RECENCY_HALF_LIFE_HOURS."""
+    published = article.published_at or article.fetched_at
+    if not published:
+        return 0.0
+    age_hours = max((now - published).total_seconds() / 3600, 0.0)
+    return 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+
+def _same_story(article: Article, title: Set[str], other: Article, other_title: Set[str]) -> bool:
+    """Return True if two articles look like reports of the same story."""
+    if article.simhash is not None and other.simhash is not None:
+        if hamming_distance(article.simhash, other.simhash) <= NEAR_DUPLICATE_BITS:
+            return True
+    if title and other_title:
+        overlap = len(title & other_title) / len(title | other_title)
+        return overlap >= NEAR_DUPLICATE_TITLE_OVERLAP
+    return False
@@ -0,0 +1,45 @@
+"""Rate limiting primitives shared by outbound service clients."""
+
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    `acquire` blocks until enough tokens are available, so callers are paced
+    rather than rejected.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        """
+        Args:
+            per_minute: Bucket capacity and refill rate per minute.
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> None:
+        """
+        Take `amount` tokens, waiting for the bucket to refill if necessary.
+
+        Requests larger than the capacity are clamped to it so they can
+        eventually proceed.
+
+        Args:
+            amount: Number of tokens to take.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,156 @@
+"""Per-article summary store, shared across users and digests."""
+
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.db.models import Q
+from typing import Dict, List, Optional, Tuple
+from ..models import ArticleSummary
+from .llm_service import ARTICLE_PROMPT_VERSION, LLMService
+
+HITS_KEY = 'article-summary:hits'
+MISSES_KEY = 'article-summary:misses'
+
+class ArticleSummaryCache:
+    """
+    Look up per-article summaries before asking the LLM for them.
+
+    Summaries are keyed by a hash of the article text together with the
+    provider, model and prompt version, so an article is summarized once no
+    matter how many users' digests include it. A summary is stored under
+    the provider that wrote it, which is the fallback provider when the
+    primary one failed; lookups accept either, preferring the primary.
+    Lookups go through the Django cache first and the `ArticleSummary`
+    table second.
+    """
+
+    def __init__(self, llm_service: LLMService) -> None:
+        self.llm_service = llm_service
+        self.ttl = settings.ARTICLE_SUMMARY_CACHE_TTL
+        # (provider, model) pairs whose summaries are used, best first.
+        self.sources: List[Tuple[str, str]] = [(llm_service.provider, llm_service.model)]
+        if llm_service.fallback:
+            self.sources.append((llm_service.fallback.name, llm_service.fallback.model))
+
+    def summarize(self, articles: List[str]) -> List[Optional[str]]:
+        """
+        Return a summary for each article, generating only the missing ones.
+
+        Args:
+            articles: Article text contents.
+
+        Returns:
+            One summary per article, in order; None where generation failed.
+        """
+        texts = [self.llm_service.prepare_article(article) for article in articles]
+        hashes = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        unique_hashes = list(dict.fromkeys(hashes))
+
+        found: Dict[str, str] = {}
+        cached = cache.get_many([self._key(h, *source) for h in unique_hashes for source in self.sources])
+        for content_hash in unique_hashes:
+            for source in self.sources:
+                key = self._key(content_hash, *source)
+                if key in cached:
+                    found[content_hash] = cached[key]
+                    break
+
+        missing = [content_hash for content_hash in unique_hashes if content_hash not in found]
+        if missing:
+            from_sources = Q()
+            for provider, model in self.sources:
+                from_sources |= Q(provider=provider, model=model)
+            rows = ArticleSummary.objects.filter(
+                from_sources, content_hash__in=missing, prompt_version=ARTICLE_PROMPT_VERSION,
+            ).values_list('content_hash', 'provider', 'model', 'summary')
+            stored: Dict[str, Tuple[Tuple[str, str], str]] = {}
+            for content_hash, provider, model, summary in rows:
+                source = (provider, model)
+                best = stored.get(content_hash)
+                if best is None or self.sources.index(source) < self.sources.index(best[0]):
+                    stored[content_hash] = (source, summary)
+            found.update({h: summary for h, (_, summary) in stored.items()})
+            cache.set_many({self._key(h, *source): summary for h, (source, summary) in stored.items()},
+                           timeout=self.ttl)
+
+        hits = sum(1 for content_hash in hashes if content_hash in found)
+        self._count(HITS_KEY, hits)
+        self._count(MISSES_KEY, len(hashes) - hits)
+
+        to_generate = {h: text for h, text in zip(hashes, texts) if h not in found}
+        if to_generate:
+            answers = self.llm_service.summarize_each_with_providers(list(to_generate.values()))
+            generated = {
+                h: (summary, provider)
+                for h, (summary, provider) in zip(to_generate, answers) if summary
+            }
+            ArticleSummary.objects.bulk_create(
+                [
+                    ArticleSummary(
+                        content_hash=h,
+                        provider=provider.name,
+                        model=provider.model,
+                        prompt_version=ARTICLE_PROMPT_VERSION,
+                        summary=summary,
+                    )
+                    for h, (summary, provider) in generated.items()
+                ],
+                ignore_conflicts=True,
+            )
+            cache.set_many(
+                {self._key(h, provider.name, provider.model): summary
+                 for h, (summary, provider) in generated.items()},
+                timeout=self.ttl,
+            )
+            found.update({h: summary for h, (summary, _) in generated.items()})
+
+        return [found.get(content_hash) for content_hash in hashes]
+
+    @staticmethod
+    def _key(content_hash: str, provider: str, model: str) -> str:
+        """Build the cache key for a content hash summarized by a provider and model."""
+        return f'article-summary:{provider}:{model}:{ARTICLE_PROMPT_VERSION}:{content_hash}'
+
+    @staticmethod
+    def _count(key: str, amount: int) -> None:
+        """Add to a shared counter, creating it if needed."""
+        if not amount:
+            return
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add() and incr(); losing one sample is fine.
+            pass
+
+    @staticmethod
+    def stats() -> Dict[str, float]:
+        """
+        Return the shared hit/miss counters for monitoring.
+
+        Returns:
+            Dictionary with 'hits', 'misses' and 'hit_rate'.
+        """
+        counts = cache.get_many([HITS_KEY, MISSES_KEY])
+        hits = counts.get(HITS_KEY, 0)
+        misses = counts.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+    @staticmethod
+    def prune(max_age_days: Optional[int] = None) -> int:
+        """
+        Delete stored summaries older than the retention period.
+
+        Args:
+            max_age_days: Retention in days; defaults to `settings.ARTICLE_SUMMARY_RETENTION_DAYS`.
+
+        Returns:
+            Number of summaries deleted.
+        """
+        days = max_age_days if max_age_days is not None else settings.ARTICLE_SUMMARY_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = ArticleSummary.objects.filter(created_at__lt=cutoff).delete()
+        return deleted
@@ -0,0 +1,64 @@
+"""Local, provider-independent token counting for prompt budgeting."""
+
+import re
+from typing import List
+
+# Words, numbers and individual punctuation marks. Subword tokenizers used by
+# the supported providers produce roughly one token per match for English
+# news text, which is close enough for budgeting and needs no network call.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        Approximate token count.
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate a text to at most `max_tokens` tokens.
+
+    Args:
+        text: The text to truncate.
+        max_tokens: Token budget.
+
+    Returns:
+        The original text if it fits, otherwise its longest prefix that does.
+    """
+    for index, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        if index == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+def pack_into_groups(texts: List[str], max_tokens: int) -> List[List[str]]:
+    """
+    Greedily pack texts, in order, into groups that each fit a token budget.
+
+    A single text larger than the budget gets a group of its own.
+
+    Args:
+        texts: The texts to pack.
+        max_tokens: Token budget per group.
+
+    Returns:
+        List of groups of texts.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,60 @@
+"""Helpers for normalizing article URLs."""
+
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings compare equal.
+
+    Lowercases the scheme and host, drops default ports and the fragment,
+    and strips a trailing slash from the path.
+
+    Args:
+        url: The URL to normalize.
+
+    Returns:
+        The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+# Query parameters that only track where a click came from.
+TRACKING_PARAMS = re.compile(
+    r'^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|ocid|cmpid|ref|ref_src|smid|'
+    r'outputtype|amp)$',
+    re.I,
+)
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce an article URL to a canonical form shared by its common variants.
+
+    On top of `normalize_url` this treats http and https as the same, drops a
+    leading 'www.', 'amp.' or mobile 'm.' from the host, removes AMP path
+    segments and tracking query parameters, and sorts the remaining query
+    parameters. The result is used to recognise a story we already have; it
+    is not necessarily a fetchable URL.
+
+    Args:
+        url: The URL to canonicalize.
+
+    Returns:
+        The canonical URL.
+    """
+    parts = urlsplit(normalize_url(url))
+    host = re.sub(r'^(www|amp|m)\.', '', parts.netloc)
+    segments = [segment for segment in parts.path.split('/') if segment and segment.lower() != 'amp']
+    path = '/' + '/'.join(segments)
+    path = re.sub(r'\.amp(\.html?)?$', r'\1', path)
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit(('https', host, path, query, ''))
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import NewsDigest, UserProfile
+from .services.fragment_cache import invalidate_digests
+from .services.local_search import install_index, register_functions
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -12,4 +16,26 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """Save the UserProfile when the User is saved."""
-    instance.userprofile.save()
\ No newline at end of file
+    instance.userprofile.save()
+
+@receiver(post_save, sender=NewsDigest)
+def invalidate_digest_fragments(sender, instance, created, **kwargs):
+    """
+    Drop the user's cached digest fragments once a new digest is committed.
+
+    Invalidating before the commit would let a concurrent page render cache
+    the old list again, which would then stay stale for the fragment TTL.
+    """
+    if created:
+        transaction.on_commit(lambda: invalidate_digests(instance.user_id))
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    """Register the SQL functions used by the full-text index triggers."""
+    register_functions(connection)
+
+@receiver(post_migrate)
+def ensure_article_search_index(sender, using, **kwargs):
+    """Restore the full-text index triggers, which SQLite table rebuilds drop."""
+    if sender.name == 'news':
+        install_index(connections[using])
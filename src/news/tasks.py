@@ -1,117 +1,510 @@
 """Celery tasks for news digest generation."""
 
-from celery import shared_task
+from celery import chain, chord, group, shared_task
+from celery.canvas import Signature
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, QuerySet
 from django.utils import timezone
-from .models import SearchTerm, Article, NewsDigest
+from .models import Article, DigestRun, Feed, SearchTerm, NewsDigest, UserProfile
+from .services import metrics
+from .services.local_search import search_local
 from .services.news_search import NewsSearchService
-from .services.article_scraper import ArticleScraper
+from .services.ranking import select_articles
+from .services.content_cache import ContentCache
+from .services.dedup import mark_near_duplicates
+from .services.email_delivery import deliver_digests
+from .services.feed_ingestion import TermIndex, poll_feed, register_feeds
+from .services.ingestion import existing_articles, link_articles, prune_old_articles, upsert_articles
 from .services.llm_service import LLMService
+from .services.summary_cache import ArticleSummaryCache
+from .services.url_utils import canonicalize_url
 import os
+import pytz
+
+# Local time from which digests are generated, and for how many hours a
+# user stays due. Scheduler ticks inside the window that find no DigestRun
+# for the user's local date start one, so a delayed or missed tick is caught
+# up by a later one and the ledger keeps it to one digest per day.
+DIGEST_HOUR = 8
+DIGEST_WINDOW_HOURS = 4
+
+# A worker holds a digest run for this many seconds; if it dies, the run is
+# resumed by a later tick once the lease expires. Runs are given up after
+# DIGEST_MAX_ATTEMPTS attempts.
+DIGEST_RUN_LEASE = 15 * 60
+DIGEST_MAX_ATTEMPTS = 3
+
+# A queued run that has not finished is queued again after this many
+# seconds, in case its task was lost; the lease stops duplicate work.
+DIGEST_REDISPATCH_AFTER = 60 * 60
+
+# Total time budget in seconds for scraping one user's articles.
+SCRAPE_DEADLINE = 120
+
+# Hard time limits in seconds of the per-stage digest tasks, replacing the
+# global CELERY_TASK_TIME_LIMIT for them.
+SEARCH_TIME_LIMIT = 5 * 60
+SCRAPE_TIME_LIMIT = SCRAPE_DEADLINE + 60
+SUMMARIZE_TIME_LIMIT = 10 * 60
+
+# Search results per term that are scraped and ranked, and articles per
+# term (at most) that the ranking keeps for the digest.
+CANDIDATES_PER_TERM = 10
+ARTICLES_PER_TERM = 5
+
+def _open_windows(now_utc: datetime, lead_minutes: int = 0) -> Dict[date, List[str]]:
+    """
+    Return the timezone names whose local digest window is currently open.
+
+    This iterates over the fixed set of timezone names rather than over users,
+    so the cost of a scheduler tick does not grow with the user base.
+
+    Args:
+        now_utc: The current time, timezone-aware.
+        lead_minutes: Also include timezones whose window opens within
+            this many minutes.
+
+    Returns:
+        Mapping of local date to the timezone names where the local time
+        is between DIGEST_HOUR (less the lead) and DIGEST_HOUR +
+        DIGEST_WINDOW_HOURS on that date.
+    """
+    start = DIGEST_HOUR * 60 - lead_minutes
+    end = (DIGEST_HOUR + DIGEST_WINDOW_HOURS) * 60
+    windows: Dict[date, List[str]] = {}
+    for tz_name in pytz.all_timezones:
+        now_local = now_utc.astimezone(pytz.timezone(tz_name))
+        if start <= now_local.hour * 60 + now_local.minute < end:
+            windows.setdefault(now_local.date(), []).append(tz_name)
+    return windows
+
+def _window_start(local_date: date, tz_name: str) -> datetime:
+    """Return when the digest window of a timezone opens on a local date."""
+    tz = pytz.timezone(tz_name)
+    return tz.localize(datetime.combine(local_date, time(DIGEST_HOUR))).astimezone(pytz.utc)
+
+def _due_users(now_utc: datetime, local_date: Optional[date] = None,
+               windows: Optional[Dict[date, List[str]]] = None) -> QuerySet:
+    """
+    Select the users whose digest window is open and who have no run for the day, in one query.
+
+    Users are found through their profile's timezone, which is indexed, so
+    a tick only reads the profiles in open windows. Only timezones some
+    profile uses are looked up: the planner estimates a lookup by the
+    average number of profiles per timezone, and would rather scan the
+    table than look up every timezone name of an open window. Every user
+    has a profile: one is created with the user, and migration 0014 added
+    those missing.
+
+    Args:
+        now_utc: The current time, timezone-aware.
+        local_date: Only consider timezones where it is this date.
+        windows: Timezones to consider by local date; defaults to the open
+            windows (see `_open_windows`).
+
+    Returns:
+        QuerySet of due users.
+    """
+    in_use = set(UserProfile.timezones_in_use())
+    condition = Q(pk__in=[])
+    for day, tz_names in (windows if windows is not None else _open_windows(now_utc)).items():
+        tz_names = [tz_name for tz_name in tz_names if tz_name in in_use]
+        if (local_date is not None and day != local_date) or not tz_names:
+            continue
+        # A correlated NOT EXISTS looks up each profile's run by the unique
+        # (user, local_date) index instead of reading all of the day's runs.
+        condition |= (Q(timezone__in=tz_names)
+                      & ~Exists(DigestRun.objects.filter(user_id=OuterRef('user_id'), local_date=day)))
+    return User.objects.filter(pk__in=UserProfile.objects.filter(condition).values('user_id'))
+
+def _create_runs(now_utc: datetime) -> None:
+    """
+    Create the day's digest run of each user whose window is open or opens within the pre-warm lead time.
+
+    Args:
+        now_utc: The current time, timezone-aware.
+    """
+    windows = _open_windows(now_utc, settings.DIGEST_PREWARM_MINUTES)
+    for local_date in windows:
+        users = _due_users(now_utc, local_date, windows).values_list('pk', 'userprofile__timezone')
+        window_starts: Dict[str, datetime] = {}
+        runs = []
+        for user_id, tz_name in users.iterator():
+            if tz_name not in window_starts:
+                window_starts[tz_name] = _window_start(local_date, tz_name)
+            runs.append(DigestRun(user_id=user_id, local_date=local_date, due_at=window_starts[tz_name]))
+        DigestRun.objects.bulk_create(runs, batch_size=1000, ignore_conflicts=True)
+
+def _runs_to_process(now_utc: datetime) -> QuerySet:
+    """
+    Select recent runs with work that can be done now and that no worker holds.
+
+    Pre-warmed runs are selected for searching and scraping, and again once
+    they are due, for summarizing. Runs already queued are only selected
+    again after DIGEST_REDISPATCH_AFTER seconds, unless a worker released
+    them in the meantime.
+
+    Args:
+        now_utc: The current time, timezone-aware.
+
+    Returns:
+        QuerySet of digest runs.
+    """
+    is_due = Q(due_at__isnull=True) | Q(due_at__lte=now_utc)
+    return (
+        DigestRun.objects.filter(
+            stage__in=DigestRun.UNFINISHED,
+            local_date__gte=(now_utc - timedelta(days=1)).date(),
+            attempts__lt=DIGEST_MAX_ATTEMPTS,
+        )
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now_utc))
+        .filter(is_due | Q(stage__in=[DigestRun.PENDING, DigestRun.SEARCHED]))
+        .filter(
+            Q(dispatched_at__isnull=True)
+            | Q(dispatched_at__lt=now_utc - timedelta(seconds=DIGEST_REDISPATCH_AFTER))
+            # Pre-warmed before its window opened, and due now.
+            | (is_due & Q(dispatched_at__lt=F('due_at')))
+        )
+    )
 
 @shared_task
 def generate_daily_digest():
-    """Generate daily news digests for all users at their local 8am."""
-    from .models import UserProfile
-    import pytz
-    from datetime import datetime
-
-    now_utc = timezone.now()
-    users = User.objects.all()
-    for user in users:
-        try:
-            profile = user.userprofile
-            user_tz = pytz.timezone(profile.timezone)
-            now_user = now_utc.astimezone(user_tz)
-            if now_user.hour == 8 and now_user.minute < 30:  # Run once per day around 8am
-                _generate_user_digest(user)
-        except UserProfile.DoesNotExist:
-            # Default to UTC 8am
-            if now_utc.hour == 8 and now_utc.minute < 30:
-                _generate_user_digest(user)
-
-def _generate_user_digest(user: User) -> None:
-    """
-    Generate digest for a specific user.
+    """
+    Start digest runs for due users and dispatch every run with work left.
+
+    Runs are created with the (user, local date) unique constraint, so
+    overlapping or retried ticks cannot start a second run for the same day.
+    Users whose window opens within DIGEST_PREWARM_MINUTES get their run
+    early, and it is searched and scraped right away, so that at delivery
+    time only summarizing and sending remain and the network-heavy work is
+    spread ahead of the busy window.
+
+    Each distinct normalized search term of the runs still to be searched is
+    searched once first; the per-run tasks then read the shared results.
+    """
+    now = timezone.now()
+    _create_runs(now)
+
+    runs = _runs_to_process(now)
+    selected = list(runs.values_list('pk', 'due_at'))
+    if not selected:
+        return 0
+    run_ids = [run_id for run_id, _ in selected]
+    queries = list(
+        SearchTerm.objects.filter(user__digest_runs__in=runs.filter(stage=DigestRun.PENDING))
+        .values_list('normalized_term', flat=True)
+        .distinct()
+    )
+    DigestRun.objects.filter(pk__in=run_ids).update(dispatched_at=now)
+
+    due_ids = [run_id for run_id, due_at in selected if due_at is None or due_at <= now]
+    prewarm_ids = [run_id for run_id, due_at in selected if due_at is not None and due_at > now]
+    searches = [refresh_search_results.si(query) for query in queries]
+    if searches:
+        chord(searches)(dispatch_user_digests.si(due_ids, prewarm_ids))
+    else:
+        dispatch_user_digests.delay(due_ids, prewarm_ids)
+    return len(run_ids)
+
+@shared_task
+def refresh_search_results(query: str) -> None:
+    """
+    Run the search for a normalized term and store the shared results.
+
+    Terms the local full-text index already covers are not searched.
+    Errors are logged rather than raised: this task heads the chord that
+    dispatches the digest runs, which would otherwise never run, and each
+    run's search stage searches again anyway.
 
     Args:
-        user: The user to generate digest for.
+        query: Normalized search term.
+    """
+    try:
+        _find_articles(query)
+    except Exception as e:
+        print(f"Search refresh error ('{query}'): {e}")
+
+@shared_task
+def dispatch_user_digests(run_ids: List[int], prewarm_ids: Optional[List[int]] = None) -> None:
+    """
+    Fan out one digest pipeline per run, then email the new digests in one batch.
+
+    Args:
+        run_ids: Primary keys of the due digest runs to process.
+        prewarm_ids: Primary keys of runs not due yet, which are only
+            searched and scraped.
+    """
+    if prewarm_ids:
+        group(digest_pipeline(run_id, prewarm=True) for run_id in prewarm_ids).apply_async()
+    if run_ids:
+        chord(digest_pipeline(run_id) for run_id in run_ids)(send_digest_emails.si())
+
+def digest_pipeline(run_id: int, prewarm: bool = False) -> Signature:
+    """
+    Build the chain of stage tasks that carries a digest run to its digest.
+
+    Each stage runs on its own queue (see CELERY_TASK_ROUTES) and passes
+    the run id on to the next one, or None once there is nothing left to do.
+
+    Args:
+        run_id: Primary key of the digest run.
+        prewarm: Stop after scraping, leaving the run for summarizing once
+            it is due.
+
+    Returns:
+        The chain: search, scrape, then summarize.
+    """
+    if prewarm:
+        return chain(search_digest_run.si(run_id, prewarm=True), scrape_digest_run.s(prewarm=True))
+    return chain(search_digest_run.si(run_id), scrape_digest_run.s(), summarize_digest_run.s())
+
+@shared_task(bind=True, time_limit=SEARCH_TIME_LIMIT)
+def search_digest_run(self, run_id: int, prewarm: bool = False) -> Optional[int]:
     """
-    search_terms = SearchTerm.objects.filter(user=user)
+    Take the lease on a digest run and find the articles for its search terms.
+
+    A run held by another worker, finished or out of attempts is left
+    alone, which ends the chain. A resumed run skips the stages it has
+    already checkpointed.
+
+    Args:
+        run_id: Primary key of the digest run.
+        prewarm: The chain stops after scraping; the claim does not count
+            as one of the run's attempts.
+
+    Returns:
+        The run id for the next stage, or None.
+    """
+    run = DigestRun.claim(run_id, DIGEST_RUN_LEASE, DIGEST_MAX_ATTEMPTS, count_attempt=not prewarm)
+    if run is None:
+        return None
+    return _run_stage(self, run, DigestRun.PENDING, _search_stage)
+
+@shared_task(bind=True, time_limit=SCRAPE_TIME_LIMIT)
+def scrape_digest_run(self, run_id: Optional[int], prewarm: bool = False) -> Optional[int]:
+    """
+    Scrape and store the articles a digest run found.
+
+    Args:
+        run_id: Primary key of the digest run, or None if an earlier
+            stage ended the chain.
+        prewarm: This is the last stage of a pre-warm chain; the lease is
+            released once the run is scraped, so the chain started when the
+            run is due can claim it right away.
+
+    Returns:
+        The run id for the next stage, or None.
+    """
+    run = DigestRun.objects.select_related('user').filter(pk=run_id).first() if run_id else None
+    if run is None:
+        return None
+    next_run_id = _run_stage(self, run, DigestRun.SEARCHED, _scrape_stage)
+    if prewarm and run.stage == DigestRun.SCRAPED:
+        run.release()
+    return next_run_id
+
+@shared_task(bind=True, time_limit=SUMMARIZE_TIME_LIMIT)
+def summarize_digest_run(self, run_id: Optional[int]) -> Optional[int]:
+    """
+    Summarize a digest run's articles into its digest.
+
+    Args:
+        run_id: Primary key of the digest run, or None if an earlier
+            stage ended the chain.
+
+    Returns:
+        None; this is the last stage.
+    """
+    run = DigestRun.objects.select_related('user').filter(pk=run_id).first() if run_id else None
+    if run is not None:
+        _run_stage(self, run, DigestRun.SCRAPED, _summarize_stage)
+    return None
+
+def _run_stage(task, run: DigestRun, stage: str, work: Callable[[DigestRun], None]) -> Optional[int]:
+    """
+    Run one pipeline stage of a digest run, if the run is at that stage.
+
+    Errors are recorded on the run and its lease released rather than
+    raised, so the other digests of the batch are still emailed; the next
+    scheduler tick resumes the run from its last checkpoint. A run that
+    finishes is never claimed again, so its lease is left to expire.
+
+    With METRICS_ENABLED, the duration and query count of the stage are
+    also sent as a 'task-stages' event for Celery monitors.
+
+    Args:
+        task: The bound stage task.
+        run: The claimed run.
+        stage: The stage the run must be at for `work` to apply.
+        work: Function doing the stage's work and checkpointing the run.
+
+    Returns:
+        The run id if the run still has work to do, otherwise None.
+    """
+    if run.stage == stage:
+        with metrics.collect() as stages:
+            try:
+                work(run)
+            except Exception as e:
+                print(f"Digest run error (run {run.pk}, stage {run.stage}): {e}")
+                run.release(error=str(e))
+                return None
+        if stages:
+            task.send_event('task-stages', stages=stages)
+    return run.pk if run.stage in DigestRun.UNFINISHED else None
+
+@shared_task
+def poll_feeds() -> None:
+    """Register the configured feeds and fan out one polling task per feed."""
+    register_feeds(settings.NEWS_RSS_FEEDS)
+    group(poll_single_feed.s(feed_id) for feed_id in Feed.objects.values_list('pk', flat=True)).apply_async()
+
+@shared_task
+def poll_single_feed(feed_id: int) -> int:
+    """
+    Poll one feed and match its new entries against all search terms.
+
+    Args:
+        feed_id: Primary key of the feed.
+    """
+    feed = Feed.objects.filter(pk=feed_id).first()
+    if feed is None:
+        return 0
+    try:
+        return poll_feed(feed, TermIndex.from_search_terms())
+    except Exception as e:
+        print(f"Feed error ({feed.url}): {e}")
+        return 0
+
+@shared_task(bind=True)
+def send_digest_emails(self) -> dict:
+    """Email all unsent digests, retrying earlier failures."""
+    with metrics.collect() as stages:
+        outcome = deliver_digests()
+    if stages:
+        self.send_event('task-stages', stages=stages)
+    return outcome
+
+@shared_task
+def prune_article_summaries() -> int:
+    """Delete per-article summaries older than the retention period."""
+    return ArticleSummaryCache.prune()
+
+@shared_task
+def prune_articles() -> Dict[str, int]:
+    """Drop the text of articles older than the retention period, and delete those no digest lists."""
+    return prune_old_articles()
+
+def _find_articles(query: str) -> List[Dict]:
+    """
+    Find recent articles for a search term, searching externally only if needed.
+
+    Stored articles from the last day are looked up in the local full-text
+    index first; the external providers are only asked when fewer than
+    `CANDIDATES_PER_TERM` are found.
+
+    Args:
+        query: Search term.
+
+    Returns:
+        Article dictionaries: the local matches, best first, then the
+        external results.
+    """
+    with metrics.timer('news_search_seconds', provider='local'):
+        local = search_local(query, since=timezone.now() - timedelta(days=1), limit=CANDIDATES_PER_TERM)
+    if len(local) >= CANDIDATES_PER_TERM:
+        return local
+    seen = {canonicalize_url(article['url']) for article in local}
+    external = NewsSearchService().search_articles_cached(query)
+    return local + [article for article in external if canonicalize_url(article['url']) not in seen]
+
+def _lease_end() -> datetime:
+    """Return when a lease taken or renewed now expires."""
+    return timezone.now() + timedelta(seconds=DIGEST_RUN_LEASE)
+
+def _search_stage(run: DigestRun) -> None:
+    """Find the articles for a run's search terms and checkpoint them."""
+    search_terms = SearchTerm.objects.filter(user=run.user)
     if not search_terms:
+        run.checkpoint(DigestRun.SKIPPED)
         return
 
-    all_articles = []
-    for term in search_terms:
-        # Search for articles
-        search_service = NewsSearchService()
-        articles_data = search_service.search_articles(term.term)
-
-        # Scrape content
-        scraper = ArticleScraper()
-        for article_data in articles_data[:5]:  # Limit to 5 per term
-            url = article_data['url']
-            # Check if article already exists
-            article, created = Article.objects.get_or_create(
-                url=url,
-                defaults={
-                    'title': article_data['title'],
-                    'published_at': article_data.get('publishedAt'),
-                    'source': article_data['source'],
-                    'content': scraper.scrape_article(url) or '',
-                }
-            )
-            if created or not article.content:
-                article.content = scraper.scrape_article(url) or ''
-                article.save()
-            all_articles.append(article)
-
-    if not all_articles:
-        return
+    candidates = {}
+    with metrics.stage('search'):
+        for term in search_terms:
+            articles_data = _find_articles(term.term)
+            for article_data in articles_data[:CANDIDATES_PER_TERM]:
+                # Variants of the same story (tracking parameters, AMP, http/https)
+                # share a canonical URL and are only scraped once.
+                candidates.setdefault(canonicalize_url(article_data['url']), article_data)
+    # The lease is renewed at each checkpoint, as the run may wait in the
+    # next stage's queue.
+    run.checkpoint(DigestRun.SEARCHED, candidates=candidates, locked_until=_lease_end())
 
-    # Summarize
-    llm_service = LLMService(provider=os.getenv('DEFAULT_LLM_PROVIDER', 'openai'))
-    contents = [a.content for a in all_articles if a.content]
-    if not contents:
-        return
+def _scrape_stage(run: DigestRun) -> None:
+    """Scrape, store and de-duplicate a run's articles and checkpoint their ids."""
+    candidates = run.candidates
+    # Scrape content concurrently, skipping articles we already have
+    with metrics.stage('scrape'):
+        existing = existing_articles(candidates)
+        to_scrape = {
+            canonical_url: data['url'] for canonical_url, data in candidates.items()
+            if canonical_url not in existing or not existing[canonical_url].content
+        }
+        scraped = ContentCache().get_many(list(to_scrape.values()), deadline=SCRAPE_DEADLINE)
+    contents = {canonical_url: scraped.get(url) for canonical_url, url in to_scrape.items()}
 
-    summary = llm_service.summarize_articles(contents, ', '.join([t.term for t in search_terms]))
-    if not summary:
-        return
+    with metrics.stage('store'):
+        all_articles = upsert_articles(candidates, contents, existing)
+        # Collapse syndicated copies so each story is summarized once
+        all_articles = mark_near_duplicates(all_articles)
+    run.checkpoint(DigestRun.SCRAPED, article_ids=[article.pk for article in all_articles],
+                   locked_until=_lease_end())
 
-    # Create digest
-    digest = NewsDigest.objects.create(
-        user=user,
-        search_term=search_terms.first(),  # For simplicity, link to first term
-        summary=summary,
-    )
-    digest.articles.set(all_articles)
+def _summarize_stage(run: DigestRun) -> None:
+    """
+    Rank a run's articles, summarize the best ones and save the digest.
 
-    # TODO: Send email
-    _send_digest_email(user, digest)
+    At most `ARTICLES_PER_TERM` articles per search term are summarized,
+    within `DIGEST_ARTICLE_TOKEN_BUDGET` tokens of article text; only they
+    are linked to the digest.
 
-def _send_digest_email(user: User, digest: NewsDigest) -> None:
+    Raises:
+        RuntimeError: If the LLM produced no summary, or another worker
+            already saved the run's digest.
     """
-    Send the digest email to the user.
+    articles = Article.objects.with_content().in_bulk(run.article_ids)
+    all_articles = [articles[pk] for pk in run.article_ids if pk in articles]
+    search_terms = list(SearchTerm.objects.filter(user=run.user))
+    with metrics.stage('rank'):
+        all_articles = select_articles(
+            all_articles, [t.term for t in search_terms], max_articles=ARTICLES_PER_TERM * max(len(search_terms), 1),
+            max_per_term=ARTICLES_PER_TERM,
+        )
+    contents = [a.content for a in all_articles]
+    if not contents or not search_terms:
+        run.checkpoint(DigestRun.SKIPPED)
+        return
 
-    Args:
-        user: The user to send to.
-        digest: The digest to send.
-    """
-    from django.core.mail import send_mail
-    subject = f"Daily News Digest for {digest.created_at.date()}"
-    message = f"""
-    Your daily news digest:
-
-    {digest.summary}
-
-    Articles:
-    {chr(10).join([f"- {a.title}: {a.url}" for a in digest.articles.all()])}
-    """
-    send_mail(
-        subject,
-        message,
-        os.getenv('EMAIL_HOST_USER', 'noreply@example.com'),
-        [user.email],
-        fail_silently=True,
-    )
\ No newline at end of file
+    llm_service = LLMService(provider=os.getenv('DEFAULT_LLM_PROVIDER', 'openai'))
+    with metrics.stage('summarize'):
+        article_summaries = [s for s in ArticleSummaryCache(llm_service).summarize(contents) if s]
+        summary = llm_service.combine_summaries(article_summaries, ', '.join([t.term for t in search_terms]))
+    if not summary:
+        raise RuntimeError('The LLM returned no summary')
+
+    # Create the digest and record it in the same transaction, so a retry
+    # or a duplicate chain can never create a second one
+    with metrics.stage('save'), transaction.atomic():
+        digest = NewsDigest.objects.create(
+            user=run.user,
+            search_term=search_terms[0],  # For simplicity, link to first term
+            summary=summary,
+        )
+        link_articles(digest, all_articles)
+        if not run.checkpoint(DigestRun.SUMMARIZED, digest=digest):
+            raise RuntimeError('The run was already summarized')
@@ -1,3 +1,904 @@
-from django.test import TestCase
+import io
+import requests
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional
+from unittest import mock
+from urllib.parse import urlsplit
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .management.commands.benchmark_pipeline import run_pipeline_benchmark
+from .models import Article, ArticleSummary, DigestRun, Feed, FeedMatch, NewsDigest, SearchResult, SearchTerm, UserProfile
+from .services import metrics
+from .services.article_scraper import ArticleScraper
+from .services.content_cache import ContentCache
+from .services.dedup import hamming_distance, mark_near_duplicates, simhash
+from .services.email_delivery import DELIVERY_LOCK_KEY, deliver_digests
+from .services.extractors import get_extractor
+from .services.feed_ingestion import TermIndex, poll_feed
+from .services.feeds import iter_feed
+from .services.ingestion import existing_articles, prune_old_articles, upsert_articles
+from .services.llm_providers import FakeProvider, LLMProvider
+from .services.llm_service import LLMService
+from .services.local_search import search_local
+from .services.news_providers import NewsProvider
+from .services.news_search import NewsSearchService
+from .services.politeness import ROBOTS_AGENT, HostScheduler, RobotsCache
+from .services.rate_limit import TokenBucket
+from .services.ranking import select_articles
+from .services.summary_cache import ArticleSummaryCache
+from .services.tokens import count_tokens
+from .services.url_utils import canonicalize_url
+from .tasks import _create_runs, _due_users, _runs_to_process, digest_pipeline, refresh_search_results
 
-# Create your tests here.
+class FailingEmailBackend(EmailBackend):
+    """Locmem backend that rejects messages to addresses starting with 'bounce'."""
+
+    def send_messages(self, messages):
+        if any(message.to[0].startswith('bounce') for message in messages):
+            raise ConnectionError('Recipient rejected')
+        return super().send_messages(messages)
+
+class UnreachableEmailBackend(FailingEmailBackend):
+    """Backend whose server goes away after the first rejected message."""
+
+    def send_messages(self, messages):
+        try:
+            return super().send_messages(messages)
+        except ConnectionError:
+            self.server_down = True
+            raise
+
+    def open(self):
+        if getattr(self, 'server_down', False):
+            raise ConnectionError('Connection refused')
+        return super().open()
+
+class DigestViewQueryTests(TestCase):
+    """The dashboard and digest pages run a fixed number of queries."""
+
+    # Session and user lookups made by middleware, plus the
+    # view's own queries.
+    DASHBOARD_QUERIES = 4
+    DASHBOARD_CACHED_QUERIES = 3
+    DIGEST_DETAIL_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+        cls.term = SearchTerm.objects.create(user=cls.user, term='electric vehicle')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _create_digest(self, article_count: int = 0) -> NewsDigest:
+        digest = NewsDigest.objects.create(user=self.user, search_term=self.term, summary='Summary ' * 100)
+        start = Article.objects.count()
+        articles = Article.objects.bulk_create([
+            Article(title=f'Article {i}', url=f'https://example.com/{i}', content='Body ' * 1000)
+            for i in range(start, start + article_count)
+        ])
+        digest.articles.add(*articles)
+        return digest
+
+    def test_dashboard_queries_do_not_grow_with_digests(self):
+        self._create_digest()
+        with self.assertNumQueries(self.DASHBOARD_QUERIES):
+            self.client.get(reverse('dashboard'))
+
+        cache.clear()
+        for _ in range(9):
+            self._create_digest()
+        with self.assertNumQueries(self.DASHBOARD_QUERIES):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['digests']), 10)
+
+    def test_dashboard_digests_are_cached_until_a_new_digest_is_created(self):
+        self._create_digest()
+        self.client.get(reverse('dashboard'))
+        with self.assertNumQueries(self.DASHBOARD_CACHED_QUERIES):
+            self.client.get(reverse('dashboard'))
+
+        # Fragments are invalidated once the new digest is committed.
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            digest = self._create_digest()
+            self.client.get(reverse('dashboard'))
+        self.assertEqual(len(callbacks), 1)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, reverse('digest_detail', args=[digest.pk]))
+
+    def test_evicted_fragment_version_does_not_serve_stale_fragments(self):
+        self._create_digest()
+        self.client.get(reverse('dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            digest = self._create_digest()
+
+        # Losing the version key must not bring back the first rendering.
+        cache.delete(f'digests-version:{self.user.pk}')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, reverse('digest_detail', args=[digest.pk]))
+
+    def test_dashboard_shows_excerpt_not_full_summary(self):
+        digest = self._create_digest()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(digest.excerpt), 200)
+        self.assertContains(response, digest.excerpt)
+        self.assertNotContains(response, digest.summary)
+
+    def test_digest_detail_queries_do_not_grow_with_articles(self):
+        digest = self._create_digest(article_count=1)
+        with self.assertNumQueries(self.DIGEST_DETAIL_QUERIES):
+            self.client.get(reverse('digest_detail', args=[digest.pk]))
+
+        digest = self._create_digest(article_count=20)
+        with self.assertNumQueries(self.DIGEST_DETAIL_QUERIES):
+            response = self.client.get(reverse('digest_detail', args=[digest.pk]))
+        self.assertContains(response, 'Article 20')
+
+class DigestDeliveryTests(TestCase):
+    """Unsent digests are emailed in batches and marked as sent."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _create_digests(self, count: int, email: str = 'reader{}@example.com') -> list:
+        users = User.objects.bulk_create([
+            User(username=f'{email.format(i)}', email=email.format(i)) for i in range(count)
+        ])
+        terms = SearchTerm.objects.bulk_create([
+            SearchTerm(user=user, term='markets', normalized_term='markets') for user in users
+        ])
+        digests = NewsDigest.objects.bulk_create([
+            NewsDigest(user=term.user, search_term=term, summary=f'Digest {i}') for i, term in enumerate(terms)
+        ])
+        article, _ = Article.objects.get_or_create(title='Shared story', url='https://example.com/shared')
+        NewsDigest.articles.through.objects.bulk_create([
+            NewsDigest.articles.through(newsdigest_id=digest.pk, article_id=article.pk) for digest in digests
+        ])
+        return digests
+
+    def test_thousands_of_digests_are_sent_in_constant_queries_per_batch(self):
+        self._create_digests(2000)
+        # Per batch: digests with users, their articles, and the sent_at and
+        # digest run updates inside a savepoint; plus the final empty batch.
+        with self.assertNumQueries(4 * 6 + 1):
+            counts = deliver_digests(batch_size=500)
+
+        self.assertEqual(counts, {'sent': 2000, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 2000)
+        self.assertIn('Shared story: https://example.com/shared', mail.outbox[0].body)
+        self.assertFalse(NewsDigest.objects.filter(sent_at__isnull=True).exists())
+
+    def test_sent_digests_are_not_sent_again(self):
+        self._create_digests(3)
+        deliver_digests()
+        self.assertEqual(deliver_digests(), {'sent': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 3)
+
+    @mock.patch('news.services.email_delivery._warned_unshared_cache', False)
+    def test_delivery_warns_once_when_the_lock_cache_is_not_shared(self):
+        with mock.patch('builtins.print') as printed:
+            deliver_digests()
+            deliver_digests()
+        printed.assert_called_once()
+        self.assertIn('CACHE_URL', printed.call_args.args[0])
+
+    @override_settings(EMAIL_BACKEND='news.tests.FailingEmailBackend')
+    def test_failed_digests_are_retried_until_max_attempts(self):
+        self._create_digests(5)
+        bounced = self._create_digests(2, email='bounce{}@example.com')
+
+        self.assertEqual(deliver_digests(max_attempts=2), {'sent': 5, 'failed': 2})
+        self.assertEqual(deliver_digests(max_attempts=2), {'sent': 0, 'failed': 2})
+        self.assertEqual(deliver_digests(max_attempts=2), {'sent': 0, 'failed': 0})
+
+        self.assertEqual(len(mail.outbox), 5)
+        for digest in NewsDigest.objects.filter(pk__in=[d.pk for d in bounced]):
+            self.assertIsNone(digest.sent_at)
+            self.assertEqual(digest.send_attempts, 2)
+
+    @override_settings(EMAIL_BACKEND='news.tests.UnreachableEmailBackend')
+    def test_digests_sent_before_a_lost_connection_are_marked_sent(self):
+        sent = self._create_digests(2)
+        bounced = self._create_digests(1, email='bounce{}@example.com')
+        unsent = self._create_digests(2, email='later{}@example.com')
+
+        self.assertEqual(deliver_digests(), {'sent': 2, 'failed': 3})
+        self.assertEqual(NewsDigest.objects.filter(sent_at__isnull=False).count(), 2)
+        self.assertTrue(all(d.sent_at for d in NewsDigest.objects.filter(pk__in=[d.pk for d in sent])))
+        self.assertEqual(
+            NewsDigest.objects.filter(pk__in=[d.pk for d in bounced + unsent], send_attempts=1).count(), 3
+        )
+
+    def test_overlapping_runs_do_not_send(self):
+        self._create_digests(3)
+        cache.add(DELIVERY_LOCK_KEY, True)
+        self.assertEqual(deliver_digests(), {'sent': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 0)
+
+class PipelineBenchmarkTests(TestCase):
+    """The offline pipeline benchmark runs end to end within a query budget."""
+
+    # Queries per digest over a run, including seeding, search, ingestion,
+    # summary caching, digest run checkpoints (each stage task reloads its
+    # run) and delivery. Raise it only for a deliberate change.
+    QUERIES_PER_DIGEST = 30
+
+    def test_every_user_gets_a_digest_within_the_query_budget(self):
+        result = run_pipeline_benchmark(users=6, terms=2, distinct_terms=4, articles=3,
+                                        page_latency=0, search_latency=0, llm_latency=0)
+
+        self.assertEqual(result['created'], 6)
+        self.assertEqual(result['delivered'], 6)
+        self.assertEqual(result['failed'], 0)
+        self.assertGreater(result['digests_per_minute'], 0)
+        self.assertLessEqual(result['p50'], result['p99'])
+        self.assertLessEqual(result['queries_per_digest'], self.QUERIES_PER_DIGEST)
+
+    def test_benchmark_data_is_rolled_back(self):
+        run_pipeline_benchmark(users=2, terms=1, articles=1, page_latency=0, search_latency=0, llm_latency=0)
+
+        self.assertFalse(User.objects.filter(username__startswith='pipeline-benchmark').exists())
+        self.assertFalse(Article.objects.exists())
+        self.assertFalse(NewsDigest.objects.exists())
+
+class DigestRunTests(TestCase):
+    """Each user gets one digest per local date, and failed runs resume where they stopped."""
+
+    # 8:15 in UTC, inside the digest window.
+    NOW = datetime(2026, 3, 2, 8, 15, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com')
+        cls.term = SearchTerm.objects.create(user=cls.user, term='electric vehicle')
+        cls.article = Article.objects.create(title='Battery plant', url='https://example.com/battery',
+                                             content='Body ' * 100)
+
+    def _run(self, **fields) -> DigestRun:
+        return DigestRun.objects.create(user=self.user, local_date=self.NOW.date(), **fields)
+
+    def test_users_with_a_run_for_the_day_are_not_due(self):
+        self.assertIn(self.user, _due_users(self.NOW))
+        self._run()
+        self.assertNotIn(self.user, _due_users(self.NOW))
+
+    def test_only_users_in_open_windows_are_due(self):
+        tokyo = User.objects.create_user(username='tokyo', email='tokyo@example.com')
+        UserProfile.objects.filter(user=tokyo).update(timezone='Asia/Tokyo')
+        self.assertEqual(UserProfile.timezones_in_use(), ['Asia/Tokyo', 'UTC'])
+        self.assertEqual(list(_due_users(self.NOW)), [self.user])
+        # 8:15 in Tokyo.
+        self.assertEqual(list(_due_users(self.NOW.replace(hour=23))), [tokyo])
+
+    def test_due_users_are_found_through_the_timezone_index(self):
+        timezones = ['UTC', 'Europe/Berlin', 'America/New_York', 'Asia/Tokyo']
+        users = User.objects.bulk_create([User(username=f'user{i}', email=f'user{i}@example.com') for i in range(400)])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, timezone=timezones[i % len(timezones)]) for i, user in enumerate(users)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertIn('news_profile_timezone_idx', _due_users(self.NOW).explain())
+
+    def test_a_delayed_tick_still_finds_the_user_due(self):
+        self.assertIn(self.user, _due_users(self.NOW.replace(hour=10, minute=45)))
+        self.assertNotIn(self.user, _due_users(self.NOW.replace(hour=7)))
+
+    @override_settings(DIGEST_PREWARM_MINUTES=60)
+    def test_runs_are_created_ahead_of_the_window(self):
+        _create_runs(self.NOW.replace(hour=6, minute=55))
+        self.assertFalse(DigestRun.objects.exists())
+
+        _create_runs(self.NOW.replace(hour=7, minute=15))
+        run = DigestRun.objects.get()
+        self.assertEqual(run.due_at, self.NOW.replace(hour=8, minute=0))
+
+    def test_a_prewarmed_run_is_summarized_once_due(self):
+        due_at = self.NOW.replace(hour=8, minute=0)
+        early = self.NOW.replace(hour=7, minute=15)
+        run = self._run(due_at=due_at)
+        self.assertIn(run, _runs_to_process(early))
+
+        DigestRun.objects.filter(pk=run.pk).update(stage=DigestRun.SCRAPED, dispatched_at=early)
+        self.assertNotIn(run, _runs_to_process(early.replace(minute=30)))
+        self.assertIn(run, _runs_to_process(self.NOW))
+
+    @mock.patch('news.tasks._find_articles', side_effect=RuntimeError('no such table: news_article_fts'))
+    def test_a_failed_search_refresh_does_not_fail_the_task(self, find_articles):
+        self.assertTrue(refresh_search_results.apply(args=['electric vehicle']).successful())
+
+    def test_a_held_or_finished_run_is_not_claimed(self):
+        run = self._run()
+        self.assertIsNotNone(DigestRun.claim(run.pk, lease_seconds=60, max_attempts=3))
+        self.assertIsNone(DigestRun.claim(run.pk, lease_seconds=60, max_attempts=3))
+
+        DigestRun.objects.filter(pk=run.pk).update(locked_until=None, stage=DigestRun.SUMMARIZED)
+        self.assertIsNone(DigestRun.claim(run.pk, lease_seconds=60, max_attempts=3))
+
+    @mock.patch.object(ArticleSummaryCache, 'summarize', return_value=['Article summary'])
+    @mock.patch('news.tasks._find_articles')
+    def test_a_failed_summary_is_retried_without_searching_or_scraping_again(self, find_articles, summarize):
+        run = self._run(stage=DigestRun.SCRAPED, article_ids=[self.article.pk])
+
+        with mock.patch.object(LLMService, 'combine_summaries', return_value=None):
+            digest_pipeline(run.pk).apply()
+        run.refresh_from_db()
+        self.assertEqual(run.stage, DigestRun.SCRAPED)
+        self.assertEqual(run.attempts, 1)
+        self.assertIsNone(run.locked_until)
+        self.assertIn('no summary', run.error)
+        self.assertIn(run, _runs_to_process(self.NOW))
+
+        with mock.patch.object(LLMService, 'combine_summaries', return_value='Digest summary'):
+            digest_pipeline(run.pk).apply()
+            digest_pipeline(run.pk).apply()
+        run.refresh_from_db()
+        self.assertEqual(run.stage, DigestRun.SUMMARIZED)
+        self.assertEqual(list(run.digest.articles.all()), [self.article])
+        self.assertEqual(NewsDigest.objects.count(), 1)
+        find_articles.assert_not_called()
+
+    @mock.patch.object(ContentCache, 'get_many', return_value={})
+    @mock.patch('news.tasks._find_articles', return_value=[])
+    def test_prewarming_leaves_the_run_free_for_the_due_chain(self, find_articles, get_many):
+        run = self._run()
+        digest_pipeline(run.pk, prewarm=True).apply()
+        run.refresh_from_db()
+        self.assertEqual(run.stage, DigestRun.SCRAPED)
+        self.assertEqual(run.attempts, 0)
+        self.assertIsNone(run.locked_until)
+        self.assertIsNotNone(DigestRun.claim(run.pk, lease_seconds=60, max_attempts=1))
+
+    def test_delivery_marks_the_run_sent(self):
+        digest = NewsDigest.objects.create(user=self.user, search_term=self.term, summary='Digest summary')
+        run = self._run(stage=DigestRun.SUMMARIZED, digest=digest)
+        cache.clear()
+        deliver_digests()
+        run.refresh_from_db()
+        self.assertEqual(run.stage, DigestRun.SENT)
+
+class ArticleStorageTests(TestCase):
+    """Article text is stored compressed, loaded only when asked for, and pruned after the retention period."""
+
+    TEXT = 'Lithium battery plant expands production. ' * 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com')
+        cls.term = SearchTerm.objects.create(user=cls.user, term='battery')
+        cls.article = Article.objects.create(title='Battery plant', url='https://example.com/battery',
+                                             content=cls.TEXT, published_at=timezone.now())
+
+    def test_content_is_compressed_and_loaded_on_demand(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM news_article WHERE id = %s', [self.article.pk])
+            stored = cursor.fetchone()[0]
+        self.assertLess(len(stored), len(self.TEXT) / 10)
+
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertIn('content', article.get_deferred_fields())
+        self.assertEqual(Article.objects.with_content().get(pk=self.article.pk).content, self.TEXT)
+        self.assertEqual(search_local('lithium', since=timezone.now() - timedelta(days=1))[0]['url'],
+                         self.article.url)
+
+    def test_pruning_keeps_articles_listed_in_digests(self):
+        digest = NewsDigest.objects.create(user=self.user, search_term=self.term, summary='Digest summary')
+        digest.articles.add(self.article)
+        unlisted = Article.objects.create(title='Old story', url='https://example.com/old', content=self.TEXT)
+        recent = Article.objects.create(title='New story', url='https://example.com/new', content=self.TEXT)
+        Article.objects.exclude(pk=recent.pk).update(fetched_at=timezone.now() - timedelta(days=40))
+
+        self.assertEqual(prune_old_articles(max_age_days=30), {'deleted': 1, 'cleared': 1})
+        self.assertFalse(Article.objects.filter(pk=unlisted.pk).exists())
+        self.assertEqual(Article.objects.with_content().get(pk=self.article.pk).content, '')
+        self.assertEqual(Article.objects.with_content().get(pk=recent.pk).content, self.TEXT)
+        self.assertEqual(search_local('lithium', since=timezone.now() - timedelta(days=1)), [])
+
+class IngestionTests(TestCase):
+    """Search hits are stored once per canonical URL, and stored text is only ever filled in."""
+
+    URL = 'https://example.com/news/battery-plant'
+
+    def _upsert(self, url: str, content: Optional[str]) -> list:
+        canonical_url = canonicalize_url(url)
+        candidates = {canonical_url: {'url': url, 'title': 'Battery plant', 'source': 'Wire',
+                                      'publishedAt': '2026-03-02T08:00:00Z'}}
+        return upsert_articles(candidates, {canonical_url: content}, existing_articles(candidates))
+
+    def test_the_same_canonical_url_is_stored_once(self):
+        first = self._upsert(self.URL, None)
+        self.assertEqual(Article.objects.with_content().get().content, '')
+
+        second = self._upsert('http://www.example.com/news/battery-plant/?utm_source=feed', 'Scraped text')
+        self.assertEqual([a.pk for a in second], [a.pk for a in first])
+        self.assertEqual(Article.objects.with_content().get().content, 'Scraped text')
+
+        self._upsert(self.URL, 'Different text')
+        article = Article.objects.with_content().get()
+        self.assertEqual((article.url, article.content), (self.URL, 'Scraped text'))
+
+class RankingTests(TestCase):
+    """Candidates are ranked by relevance and recency, without repeating a story, within the token budget."""
+
+    NOW = datetime(2026, 3, 2, 8, 0, tzinfo=dt_timezone.utc)
+
+    def _article(self, title: str, content: str, hours_old: int = 1, source: str = 'Wire') -> Article:
+        return Article(title=title, url=f'https://example.com/{len(title)}-{hours_old}', content=content,
+                       source=source, published_at=self.NOW - timedelta(hours=hours_old))
+
+    def test_relevant_recent_articles_come_first(self):
+        battery = self._article('Battery plant opens', 'The battery plant makes electric vehicle cells. ' * 20)
+        older = self._article('Battery prices fall', 'Battery and electric vehicle prices fell. ' * 20, hours_old=72)
+        unrelated = self._article('Football final', 'The match ended in a draw. ' * 20, source='Sports')
+
+        selected = select_articles([unrelated, older, battery], ['electric vehicles'], max_articles=2, now=self.NOW)
+        self.assertEqual(selected, [battery, older])
+
+    def test_repeated_stories_and_articles_over_budget_are_skipped(self):
+        story = self._article('Battery plant opens in Ohio', 'Battery plant news. ' * 50)
+        copy = self._article('Battery plant opens in Ohio today', 'Battery plant report. ' * 50, source='Other')
+        long = self._article('Battery factory', 'Battery factory details. ' * 400, source='Long')
+        short = self._article('Battery recycling', 'Battery recycling grows. ' * 20, source='Short', hours_old=5)
+
+        selected = select_articles([story, copy, long, short], ['battery'], max_articles=5,
+                                   token_budget=300, now=self.NOW)
+        self.assertEqual(selected, [story, short])
+
+    def test_no_term_gets_more_than_its_share(self):
+        batteries = [self._article(f'Battery story {i}', f'Battery report number {i}. ' * 20, source=f'Outlet {i}')
+                     for i in range(4)]
+        football = self._article('Football final', 'The football match ended in a draw. ' * 20, hours_old=48)
+
+        selected = select_articles(batteries + [football], ['battery', 'football'], max_articles=4,
+                                   max_per_term=2, now=self.NOW)
+        self.assertEqual(len(selected), 3)
+        self.assertIn(football, selected)
+
+class ContentCacheTests(TestCase):
+    """Only real scrape failures are cached, and locks are released whatever happens."""
+
+    class Scraper:
+        """Stand-in scraper: 'slow' URLs miss the deadline, 'broken' ones fail."""
+
+        def scrape_many(self, urls, deadline=None, skipped=None):
+            for url in urls:
+                if 'slow' in url:
+                    skipped.add(url)
+                    yield url, None
+                else:
+                    yield url, None if 'broken' in url else f'Text of {url}'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_urls_cut_off_by_the_deadline_are_not_cached(self):
+        content_cache = ContentCache(scraper=self.Scraper())
+        urls = ['https://example.com/ok', 'https://example.com/broken', 'https://example.com/slow']
+        self.assertEqual(content_cache.get_many(urls, deadline=5), {
+            urls[0]: f'Text of {urls[0]}', urls[1]: None, urls[2]: None,
+        })
+        keys = [content_cache._key(url) for url in urls]
+        self.assertEqual(set(cache.get_many(keys)), set(keys[:2]))
+
+    def test_locks_are_released_when_scraping_raises(self):
+        scraper = mock.Mock()
+        scraper.scrape_many.side_effect = RuntimeError('boom')
+        content_cache = ContentCache(scraper=scraper)
+        with self.assertRaises(RuntimeError):
+            content_cache.get_many(['https://example.com/ok'])
+        self.assertIsNone(cache.get(content_cache._key('https://example.com/ok') + ':lock'))
+
+class NewsSearchTests(TestCase):
+    """Stored search results are refreshed from their watermark, which only advances after a complete search."""
+
+    class Provider(NewsProvider):
+        """Stand-in provider returning canned results."""
+
+        name = 'stub'
+
+        def __init__(self, articles, truncated=False):
+            super().__init__()
+            self.articles, self.truncated = articles, truncated
+
+        def search(self, query, since, seen_urls):
+            return [a for a in self.articles if a['url'] not in seen_urls], self.truncated
+
+    WATERMARK = datetime(2026, 3, 2, 6, 0, tzinfo=dt_timezone.utc)
+
+    def _article(self, name: str, published_at: datetime) -> dict:
+        return {'title': name, 'url': f'https://example.com/{name}',
+                'publishedAt': published_at.strftime('%Y-%m-%dT%H:%M:%SZ'), 'source': 'Wire'}
+
+    def test_a_truncated_search_does_not_move_the_watermark(self):
+        now = timezone.now()
+        stored = SearchResult.objects.create(query='markets', fetched_at=now - timedelta(days=1),
+                                             latest_published_at=self.WATERMARK)
+        newest = [self._article('newest', now)]
+
+        NewsSearchService([self.Provider(newest, truncated=True)]).search_articles_cached('Markets')
+        stored.refresh_from_db()
+        self.assertEqual(stored.latest_published_at, self.WATERMARK)
+        self.assertEqual([a['url'] for a in stored.results], ['https://example.com/newest'])
+
+        stored.fetched_at = now - timedelta(days=1)
+        stored.save()
+        NewsSearchService([self.Provider([self._article('later', now)])]).search_articles_cached('Markets')
+        stored.refresh_from_db()
+        self.assertEqual(stored.latest_published_at, now.replace(microsecond=0))
+
+    @mock.patch('news.services.news_search.connections')
+    def test_provider_threads_close_their_database_connections(self, connections):
+        NewsSearchService([self.Provider([])]).search_articles('markets')
+        connections.close_all.assert_called_once_with()
+
+class PolitenessTests(TestCase):
+    """Scraping follows robots.txt for our user agent and paces each host."""
+
+    ROBOTS = 'User-agent: DailyNewsBot\nDisallow: /private\nCrawl-delay: 3\n'
+
+    def setUp(self):
+        cache.clear()
+
+    def _session(self, status_code: int = 200, text: str = ROBOTS) -> mock.Mock:
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=status_code, text=text)
+        return session
+
+    def test_robots_rules_are_fetched_once_per_site(self):
+        session = self._session()
+        robots = RobotsCache(session)
+        self.assertTrue(robots.allowed('https://example.com/news/1'))
+        self.assertFalse(robots.allowed('https://example.com/private/1'))
+        self.assertEqual(robots.crawl_delay('https://example.com/news/2'), 3)
+        self.assertTrue(RobotsCache(session).allowed('https://example.com/news/3'))
+        session.get.assert_called_once()
+
+    def test_refused_robots_disallows_the_site(self):
+        self.assertFalse(RobotsCache(self._session(status_code=403)).allowed('https://example.com/news/1'))
+
+    def test_robots_fetch_is_bounded_by_the_deadline(self):
+        session = self._session()
+        session.get.side_effect = requests.Timeout('read timed out')
+        robots = RobotsCache(session)
+        self.assertIsNone(robots.allowed('https://example.com/news/1', expires_at=time.monotonic() + 1))
+        self.assertLessEqual(session.get.call_args.kwargs['timeout'], 1)
+        self.assertIsNone(robots.allowed('https://example.com/news/1', expires_at=time.monotonic()))
+        self.assertEqual(session.get.call_count, 1)
+        self.assertIsNone(cache.get('robots:https://example.com'))
+
+    # Well inside a 60-second window.
+    @mock.patch('time.time', return_value=60 * 1000 + 10)
+    def test_each_host_gets_one_request_per_interval(self, now):
+        scheduler = HostScheduler(mock.Mock(), interval=60, respect_robots=False)
+        self.assertTrue(scheduler.wait_turn('https://example.com/1', time.monotonic() + 1))
+        self.assertFalse(scheduler.wait_turn('https://example.com/2', time.monotonic() + 1))
+        self.assertTrue(scheduler.wait_turn('https://other.example.com/1', time.monotonic() + 1))
+
+    def test_overloaded_hosts_are_backed_off(self):
+        scheduler = HostScheduler(mock.Mock(), interval=0, respect_robots=False)
+        scheduler.back_off('https://example.com/1', '120')
+        self.assertFalse(scheduler.wait_turn('https://example.com/2', time.monotonic() + 1))
+
+    def test_scraper_identifies_itself(self):
+        scraper = ArticleScraper(scheduler=HostScheduler(mock.Mock(), respect_robots=False))
+        self.assertIn(ROBOTS_AGENT, scraper.session.headers['User-Agent'])
+
+@override_settings(LLM_FAKE_LATENCY=0, LLM_MAX_RETRIES=0, LLM_HEDGE_AFTER=0)
+class LLMServiceTests(TestCase):
+    """Summaries are made offline by fake providers, and cached under the provider that wrote them."""
+
+    class Provider(FakeProvider):
+        """Fake provider under its own name, recording its prompts and failing every call while `broken`."""
+
+        def __init__(self, name: str = 'fake', broken: bool = False) -> None:
+            self.name = name
+            super().__init__()
+            self.broken = broken
+            self.prompts = []
+
+        @property
+        def calls(self) -> int:
+            return len(self.prompts)
+
+        def _call(self, prompt: str, max_tokens: int) -> str:
+            self.prompts.append(prompt)
+            if self.broken:
+                raise ConnectionError('Connection refused')
+            return super()._call(prompt, max_tokens)
+
+    def setUp(self):
+        cache.clear()
+
+    def _service(self, primary: LLMProvider, fallback: Optional[LLMProvider] = None) -> LLMService:
+        service = LLMService('fake')
+        service.provider, service.model = primary.name, primary.model
+        service.client, service.fallback = primary, fallback
+        return service
+
+    def test_fallback_summaries_are_stored_under_the_fallback_provider(self):
+        primary, fallback = self.Provider('primary', broken=True), self.Provider('backup')
+        summaries = ArticleSummaryCache(self._service(primary, fallback)).summarize(['Battery plant opens.'])
+        self.assertEqual(summaries, ['Summary: Article: Battery plant opens.'])
+        self.assertEqual(list(ArticleSummary.objects.values_list('provider', 'model')), [('backup', 'fake-1')])
+
+        # The fallback's summary is reused while it is configured, but is
+        # never passed off as the primary provider's.
+        primary.broken = False
+        ArticleSummaryCache(self._service(primary, fallback)).summarize(['Battery plant opens.'])
+        self.assertEqual((primary.calls, fallback.calls), (1, 1))
+        cache.clear()
+        ArticleSummaryCache(self._service(primary)).summarize(['Battery plant opens.'])
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(ArticleSummary.objects.filter(provider='primary').count(), 1)
+
+    def test_articles_that_fit_are_summarized_in_one_call(self):
+        provider = self.Provider()
+        summary = self._service(provider).summarize_articles(['Battery plant opens.', 'Prices fall.'], 'battery')
+        self.assertTrue(summary)
+        self.assertEqual(provider.calls, 1)
+        self.assertIn('Prices fall.', provider.prompts[0])
+
+    @override_settings(LLM_MAX_PROMPT_TOKENS=200, LLM_ARTICLE_TOKEN_BUDGET=50)
+    def test_large_article_sets_are_mapped_and_reduced_within_the_budget(self):
+        provider = self.Provider()
+        articles = [f'Story {i} ' + 'battery plant news ' * 100 for i in range(5)]
+        summary = self._service(provider).summarize_articles(articles, 'battery')
+        self.assertTrue(summary)
+        # One summary per article, then groups of summaries, then the digest.
+        self.assertGreater(provider.calls, len(articles) + 1)
+        self.assertTrue(all(count_tokens(prompt) <= 200 for prompt in provider.prompts))
+        self.assertEqual(sum('news article in' in prompt for prompt in provider.prompts), len(articles))
+
+    def test_token_bucket_paces_callers_once_empty(self):
+        clock = [1000.0]
+        with mock.patch('news.services.rate_limit.time') as fake_time:
+            fake_time.monotonic.side_effect = lambda: clock[0]
+            fake_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+            bucket = TokenBucket(per_minute=60)
+            bucket.acquire(60)
+            fake_time.sleep.assert_not_called()
+            bucket.acquire(2)
+        self.assertAlmostEqual(clock[0], 1002.0)
+
+    @override_settings(LLM_MAX_RETRIES=2, LLM_RETRY_BASE_DELAY=1)
+    @mock.patch('news.services.llm_providers.time.sleep')
+    def test_transient_errors_are_retried_with_backoff(self, sleep):
+        provider = self.Provider(broken=True)
+        with self.assertRaises(ConnectionError):
+            provider.complete('Battery plant opens.', 10)
+        self.assertEqual(provider.calls, 3)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertTrue(1 <= delays[0] <= 2 and 2 <= delays[1] <= 4)
+
+        provider = self.Provider()
+        provider._call = mock.Mock(side_effect=ValueError('Invalid prompt'))
+        with self.assertRaises(ValueError):
+            provider.complete('Battery plant opens.', 10)
+        self.assertEqual(provider._call.call_count, 1)
+
+    @override_settings(LLM_HEDGE_AFTER=0.05)
+    def test_slow_requests_are_hedged_to_the_fallback_provider(self):
+        primary, fallback = self.Provider('primary'), self.Provider('backup')
+        primary.latency = 1
+        started = time.monotonic()
+        summary, provider = self._service(primary, fallback)._answer('Battery plant opens.', 10)
+        self.assertLess(time.monotonic() - started, primary.latency)
+        self.assertEqual((summary, provider), ('Summary: Battery plant opens.', fallback))
+
+class DeduplicationTests(TestCase):
+    """URL variants and syndicated copies of a story are recognised as one article."""
+
+    WIRE = ('The city council approved the new battery plant on Monday after a long debate about '
+            'jobs, water use and the tax breaks offered to the company behind the project. ') * 5
+
+    def test_url_variants_share_a_canonical_url(self):
+        canonical = 'https://example.com/news/battery-plant'
+        for variant in ('http://www.example.com/news/battery-plant/',
+                        'https://m.example.com/news/battery-plant?utm_source=feed',
+                        'https://amp.example.com/amp/news/battery-plant#top',
+                        'https://example.com/news/battery-plant.amp'):
+            self.assertEqual(canonicalize_url(variant), canonical)
+        self.assertEqual(canonicalize_url('https://example.com/search?q=ev&page=2&fbclid=x'),
+                         'https://example.com/search?page=2&q=ev')
+
+    def test_similar_texts_have_close_fingerprints(self):
+        edited = self.WIRE.replace('on Monday', 'on Tuesday', 1)
+        other = 'The football final ended in a draw after extra time and a long penalty shootout. ' * 5
+        self.assertLessEqual(hamming_distance(simhash(self.WIRE), simhash(edited)), 3)
+        self.assertGreater(hamming_distance(simhash(self.WIRE), simhash(other)), 3)
+        self.assertIsNone(simhash('Too short'))
+
+    def test_syndicated_copies_collapse_into_the_original(self):
+        original = Article.objects.create(title='Battery plant', url='https://example.com/a', content=self.WIRE)
+        mark_near_duplicates([original])
+
+        copy = Article.objects.create(title='Battery plant approved', url='https://example.org/b',
+                                      content=self.WIRE.replace('on Monday', 'on Tuesday', 1))
+        fresh = Article.objects.create(title='Football final', url='https://example.org/c',
+                                       content='The football final ended in a draw after extra time. ' * 5)
+        self.assertEqual([a.pk for a in mark_near_duplicates([copy, fresh, copy])], [original.pk, fresh.pk])
+        copy.refresh_from_db()
+        self.assertEqual(copy.duplicate_of_id, original.pk)
+
+class FeedTests(TestCase):
+    """Feeds are parsed as they stream in, and entries are matched against every search term."""
+
+    RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>City Wire</title>
+<item><title>Battery plant opens</title><link>https://example.com/battery</link>
+<pubDate>Mon, 02 Mar 2026 08:00:00 +0100</pubDate>
+<description>&lt;p&gt;New &lt;b&gt;electric vehicle&lt;/b&gt; cells.&lt;/p&gt;</description></item>
+<item><title>No link</title></item>
+</channel></rss>"""
+
+    ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>Atom News</title>
+<entry><title>Football final</title><link rel="alternate" href="https://example.com/final"/>
+<updated>2026-03-02T07:00:00Z</updated><summary>A draw after extra time.</summary></entry>
+</feed>"""
+
+    def test_rss_and_atom_entries_are_parsed(self):
+        self.assertEqual(list(iter_feed(io.BytesIO(self.RSS))), [{
+            'title': 'Battery plant opens', 'url': 'https://example.com/battery',
+            'publishedAt': '2026-03-02T07:00:00Z', 'source': 'City Wire',
+            'description': 'New electric vehicle cells.',
+        }])
+        self.assertEqual(list(iter_feed(io.BytesIO(self.ATOM))), [{
+            'title': 'Football final', 'url': 'https://example.com/final',
+            'publishedAt': '2026-03-02T07:00:00Z', 'source': 'Atom News',
+            'description': 'A draw after extra time.',
+        }])
+
+    def test_entries_match_terms_whose_words_they_all_contain(self):
+        index = TermIndex(['electric vehicle', 'battery', 'solar battery', ' '])
+        self.assertCountEqual(index.match('Battery plant makes Electric Vehicle cells'),
+                              ['electric vehicle', 'battery'])
+        self.assertEqual(index.match('Electric guitars'), [])
+
+    def _response(self, status_code: int, body: bytes = b'') -> mock.MagicMock:
+        response = mock.MagicMock(status_code=status_code, raw=io.BytesIO(body),
+                                  headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 02 Mar 2026 08:00:00 GMT'})
+        response.__enter__.return_value = response
+        return response
+
+    @mock.patch('news.services.feed_ingestion._session')
+    def test_polled_entries_are_stored_and_matched_until_the_feed_is_unchanged(self, session):
+        user = User.objects.create_user(username='reader', email='reader@example.com')
+        SearchTerm.objects.create(user=user, term='Electric Vehicle')
+        feed = Feed.objects.create(url='https://example.com/feed')
+        published = timezone.now().strftime('%a, %d %b %Y %H:%M:%S +0000').encode()
+        session.get.return_value = self._response(200, self.RSS.replace(b'Mon, 02 Mar 2026 08:00:00 +0100', published))
+
+        self.assertEqual(poll_feed(feed, TermIndex.from_search_terms()), 1)
+        article = Article.objects.get(url='https://example.com/battery')
+        self.assertEqual(list(FeedMatch.objects.values_list('query', 'article')), [('electric vehicle', article.pk)])
+        self.assertIn(ROBOTS_AGENT, session.get.call_args.kwargs['headers']['User-Agent'])
+
+        session.get.return_value = self._response(304)
+        with mock.patch('news.services.feed_ingestion.iter_feed') as parse:
+            self.assertEqual(poll_feed(feed, TermIndex.from_search_terms()), 0)
+        parse.assert_not_called()
+        self.assertEqual(session.get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+
+class ArticleScraperTests(TestCase):
+    """Batches are scraped concurrently within their deadline and per-host limits."""
+
+    def _scraper(self, scrape, max_per_host: int = 2) -> ArticleScraper:
+        scraper = ArticleScraper(max_workers=8, max_per_host=max_per_host,
+                                 scheduler=HostScheduler(mock.Mock(), interval=0, respect_robots=False))
+        scraper._scrape = mock.Mock(side_effect=scrape)
+        return scraper
+
+    def test_urls_pending_at_the_deadline_are_skipped(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def scrape(url, timeout):
+            if 'slow' in url:
+                release.wait(5)
+            return f'Text of {url}'
+
+        skipped = set()
+        urls = ['https://example.com/fast', 'https://example.org/slow']
+        results = dict(self._scraper(scrape).scrape_many(urls, deadline=0.2, skipped=skipped))
+        self.assertEqual(results, {urls[0]: f'Text of {urls[0]}', urls[1]: None})
+        self.assertEqual(skipped, {urls[1]})
+
+    def test_duplicate_urls_are_fetched_once(self):
+        scraper = self._scraper(lambda url, timeout: f'Text of {url}')
+        urls = ['https://example.com/a', 'https://example.com/b', 'https://example.com/a']
+        self.assertEqual(sorted(url for url, _ in scraper.scrape_many(urls)), urls[:2])
+        self.assertEqual(scraper._scrape.call_count, 2)
+
+    def test_concurrent_fetches_per_host_stay_within_the_limit(self):
+        lock = threading.Lock()
+        active, peak = Counter(), Counter()
+
+        def scrape(url, timeout):
+            host = urlsplit(url).netloc
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+            time.sleep(0.05)
+            with lock:
+                active[host] -= 1
+            return 'Text'
+
+        urls = [f'https://{host}/{i}' for host in ('example.com', 'example.org') for i in range(6)]
+        self.assertEqual(len(list(self._scraper(scrape, max_per_host=2).scrape_many(urls))), 12)
+        self.assertEqual(peak, {'example.com': 2, 'example.org': 2})
+
+class ExtractorTests(TestCase):
+    """Each engine finds the article body, and the scraper falls back to BeautifulSoup when lxml finds none."""
+
+    PAGE = b"""<html><head><title>Battery plant</title><script>track();</script></head><body>
+<nav><p>Home, World, Business, Technology and Science sections</p></nav>
+<article class="story">
+  <p>The battery plant opened on Monday, employing 2,000 people in the region.</p>
+  <p>Its cells will supply electric vehicle makers across the continent, the company said.</p>
+  <div class="comments"><p>Reader comment: this is great news for the town, really.</p></div>
+</article>
+</body></html>"""
+
+    # No paragraph is long enough to score, but the content block is there.
+    SHORT_PAGE = b"""<html><body><div class="content">Battery plant opens. <span>Jobs follow.</span></div></body></html>"""
+
+    def test_engines_find_the_article_body(self):
+        for name in ('lxml', 'bs4'):
+            with self.subTest(engine=name):
+                text = get_extractor(name).extract(self.PAGE)
+                self.assertIn('employing 2,000 people', text)
+                self.assertIn('electric vehicle makers', text)
+                self.assertNotIn('track()', text)
+                self.assertNotIn('Business, Technology', text)
+        self.assertNotIn('Reader comment', get_extractor('lxml').extract(self.PAGE))
+
+    def test_unknown_engines_are_rejected(self):
+        with self.assertRaises(ValueError):
+            get_extractor('regex')
+
+    def test_scraper_falls_back_to_beautifulsoup(self):
+        scraper = ArticleScraper(extractor=get_extractor('lxml'),
+                                 scheduler=HostScheduler(mock.Mock(), respect_robots=False))
+        self.assertIsNone(scraper.extractor.extract(self.SHORT_PAGE))
+        with mock.patch.object(scraper, '_download', return_value=self.SHORT_PAGE):
+            self.assertEqual(scraper._scrape('https://example.com/battery', timeout=5),
+                             'Battery plant opens. Jobs follow.')
+
+class MetricsTests(TestCase):
+    """Metrics recorded by any process are exported in the Prometheus text format."""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_counters_and_timers_are_exported(self):
+        metrics.increment('news_scrape_bytes_total', 1500, host='example.com')
+        metrics.increment('news_scrape_bytes_total', 500, host='example.com')
+        with mock.patch('news.services.metrics.time.perf_counter', side_effect=[10.0, 12.5]):
+            with metrics.timer('news_llm_seconds', provider='fake'):
+                pass
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE news_scrape_bytes_total counter\n', body)
+        self.assertIn('news_scrape_bytes_total{host="example.com"} 2000\n', body)
+        self.assertIn('# TYPE news_llm_seconds summary\n', body)
+        self.assertIn('news_llm_seconds_count{provider="fake"} 1\n', body)
+        self.assertIn('news_llm_seconds_sum{provider="fake"} 2.5\n', body)
+
+    def test_metrics_are_not_served_when_disabled(self):
+        metrics.increment('news_scrape_bytes_total', 1500, host='example.com')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertIsNone(cache.get(metrics.SERIES_KEY))
@@ -9,4 +9,5 @@ urlpatterns = [
     path('delete-term/<int:pk>/', views.delete_search_term, name='delete_search_term'),
     path('digest/<int:pk>/', views.digest_detail, name='digest_detail'),
     path('profile/', views.profile, name='profile'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
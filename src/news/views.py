@@ -1,18 +1,30 @@
 """Views for the news app."""
 
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
 from .models import SearchTerm, NewsDigest, UserProfile
 from .forms import SearchTermForm, UserProfileForm
+from .services import metrics as pipeline_metrics
+from .services.fragment_cache import FRAGMENT_CACHE_TTL, digests_version
 
 @login_required
 def dashboard(request):
     """User dashboard showing recent digests and search terms."""
-    digests = NewsDigest.objects.filter(user=request.user).order_by('-created_at')[:10]
-    search_terms = SearchTerm.objects.filter(user=request.user)
+    # Listing only needs the stored excerpt, never the full summary. The
+    # queryset is lazy, so it is not run when the rendered fragment is cached.
+    digests = (
+        NewsDigest.objects.filter(user=request.user)
+        .only('id', 'created_at', 'excerpt')
+        .order_by('-created_at')[:10]
+    )
+    search_terms = SearchTerm.objects.filter(user=request.user).only('id', 'term')
     return render(request, 'news/dashboard.html', {
         'digests': digests,
+        'digests_version': digests_version(request.user.pk),
+        'fragment_cache_ttl': FRAGMENT_CACHE_TTL,
         'search_terms': search_terms,
     })
 
@@ -48,7 +60,14 @@ def delete_search_term(request, pk):
 def digest_detail(request, pk):
     """View details of a specific digest."""
     digest = get_object_or_404(NewsDigest, pk=pk, user=request.user)
-    return render(request, 'news/digest_detail.html', {'digest': digest})
+    # One lazy query for all articles, skipped entirely when the rendered
+    # list is cached; article content is never loaded.
+    articles = digest.articles.only('id', 'title', 'url', 'source', 'published_at')
+    return render(request, 'news/digest_detail.html', {
+        'digest': digest,
+        'articles': articles,
+        'fragment_cache_ttl': FRAGMENT_CACHE_TTL,
+    })
 
 @login_required
 def profile(request):
@@ -66,3 +85,9 @@ def profile(request):
             initial['timezone'] = str(request.timezone)
         form = UserProfileForm(instance=profile, initial=initial)
     return render(request, 'news/profile.html', {'form': form})
+
+def metrics(request):
+    """Pipeline metrics in the Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(pipeline_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')